@@ -1,19 +1,44 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import psycopg2
 from psycopg2 import OperationalError
 import re
 from html import escape
-import random
+import secrets
 import jwt
 import hashlib
-from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from functools import wraps
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
+from config import get_config
+import app_logging
+from db import ConnectionPool, PoolTimeout, configure_pool, get_pool, stream_copy, timed_cursor_factory
+from outbox import OutboxWorkerPool
+from smtp_pool import SMTPSessionPool
+from email_templates import EmailTemplate
+from slot_index import SlotOccupancyIndex, normalize_slot
+from singleflight import SingleFlight
+from report_cache import ReportCache
+from rate_limit import RateLimiter, create_backend
+from token_cache import TokenCache, token_digest
+import rollup
+import customer_stats
+import notifications
+import metrics
+from query_trace import QueryTracer
+from profiler import RequestProfiler
+from notification_stream import NotificationBroker
+from migrations import (LATEST_VERSION as LATEST_SCHEMA_VERSION, connect as connect_database,
+                        current_version as current_schema_version, migrate)
 
 # Load environment variables
 load_dotenv()
@@ -21,15 +46,79 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+app_config = get_config()
+
+# JSON logs written off the request thread, each tagged with its request id
+app_logging.setup_logging(app_config.LOG_LEVEL)
+app_logging.init_app(app)
+logger = logging.getLogger(__name__)
+
+# Behind Railway's (or any) reverse proxy, take the client address from
+# X-Forwarded-For as set by the trusted proxies
+if app_config.TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app_config.TRUSTED_PROXY_COUNT)
+
+# Admins can profile a single request with X-Profile: 1; registered before
+# the other hooks so their cost shows up in the profile too
+request_profiler = RequestProfiler(
+    app_config.PROFILE_DIR,
+    max_concurrent=app_config.PROFILE_MAX_CONCURRENT,
+    keep=app_config.PROFILE_KEEP
+)
+if app_config.PROFILING_ENABLED:
+    request_profiler.init_app(app, lambda: is_admin_request())
+
+# Request timings and /metrics; registered first so rejected requests are
+# timed too (load_store_sizes is defined further down)
+metrics.init_app(app, lambda: load_store_sizes(), token=app_config.METRICS_TOKEN)
+
+# Every statement is recorded against its request (summed up in a
+# Server-Timing header); slow ones are logged, with EXPLAIN if enabled
+query_tracer = QueryTracer(
+    slow_ms=app_config.SLOW_QUERY_MS,
+    explain_ms=app_config.EXPLAIN_SLOW_QUERY_MS
+)
+query_tracer.init_app(app)
+
+# Public endpoints that take writes or credentials are rate limited per
+# client IP and route, before the view touches the database
+RATE_LIMITED_ENDPOINTS = {'create_reservation', 'newsletter_signup', 'get_availability', 'admin_login'}
+rate_limiter = RateLimiter(
+    create_backend(app_config.RATE_LIMIT_STORAGE_URL),
+    per_minute=app_config.RATE_LIMIT_PER_MINUTE,
+    burst=app_config.RATE_LIMIT_BURST
+)
+if app_config.RATE_LIMIT_ENABLED and app_config.ENVIRONMENT == 'production':
+    if not app_config.TRUSTED_PROXY_COUNT:
+        logger.warning('Rate limiting with TRUSTED_PROXY_COUNT=0: clients behind a proxy share one bucket')
+    if not app_config.RATE_LIMIT_STORAGE_URL:
+        logger.warning('Rate limiting without RATE_LIMIT_STORAGE_URL: each worker keeps its own buckets')
+
+@app.before_request
+def enforce_rate_limit():
+    if not app_config.RATE_LIMIT_ENABLED or request.method == 'OPTIONS':
+        return None
+    if request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    allowed, retry_after = rate_limiter.check(request.remote_addr, request.endpoint)
+    if allowed:
+        return None
+    response = jsonify({'error': 'Too many requests, please try again shortly.'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
 # Database connection details
-DB_HOST = "localhost"
-DB_NAME = "cafe_fausse_db"
-DB_USER = "postgres"
-DB_PASS = "Pass123"
+DATABASE_URL = app_config.DATABASE_URL
+DB_HOST = app_config.DB_HOST
+DB_NAME = app_config.DB_NAME
+DB_USER = app_config.DB_USER
+DB_PASS = app_config.DB_PASS
+DB_PORT = app_config.DB_PORT
 
 # Email Configuration from environment variables
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
 SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USE_TLS = app_config.SMTP_USE_TLS
 EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', EMAIL_ADDRESS)  # Admin notification email
@@ -37,160 +126,159 @@ CAFE_NAME = os.getenv('CAFE_NAME', 'Café Fausse')
 CAFE_PHONE = os.getenv('CAFE_PHONE', '(202) 555-4567')
 CAFE_ADDRESS = os.getenv('CAFE_ADDRESS', '123 Quantum Street, Digital District')
 
-# In-memory storage for admin notifications (consider Redis for production)
-recent_notifications = []
+# Reservations
+TOTAL_TABLES = app_config.TOTAL_TABLES
+
+# Booked tables per time slot, cached in memory so availability checks
+# and table picks don't need a database round trip
+slot_index = SlotOccupancyIndex(TOTAL_TABLES, ttl=app_config.SLOT_INDEX_TTL)
+
+# Table assignment: lock the slot, pick a free table (preferring the one the
+# occupancy index chose) and insert, all in a single round trip. Returns
+# (candidate table, reservation id, assigned table); a NULL candidate means the
+# slot is full, a NULL id means a concurrent insert won the race.
+SLOT_LOCK_NAMESPACE = 1
+RESERVATION_INSERT_ATTEMPTS = 3
+ASSIGN_TABLE_SQL = '''
+    SELECT pg_advisory_xact_lock(%(lock_namespace)s, %(lock_key)s);
+    WITH candidate AS (
+        SELECT t AS table_number
+        FROM generate_series(1, %(total_tables)s) AS t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM reservations r
+            WHERE r.time_slot = %(time_slot)s AND r.table_number = t
+        )
+        ORDER BY t = %(preferred_table)s DESC, random()
+        LIMIT 1
+    ), inserted AS (
+        INSERT INTO reservations (customer_id, time_slot, table_number, guests, special_requests)
+        SELECT %(customer_id)s, %(time_slot)s, table_number, %(guests)s, %(special_requests)s
+        FROM candidate
+        ON CONFLICT (time_slot, table_number) DO NOTHING
+        RETURNING id, table_number
+    )
+    SELECT (SELECT table_number FROM candidate), inserted.id, inserted.table_number
+    FROM (SELECT 1) AS one
+    LEFT JOIN inserted ON TRUE;
+'''
+
+def slot_lock_key(slot):
+    """Advisory lock key for a time slot (minutes since the epoch, fits int4)"""
+    return int((slot - datetime(1970, 1, 1)).total_seconds() // 60)
+
+def build_service_slots(first, last, interval_minutes):
+    """Times of day a table can be booked, e.g. 17:00, 17:30, ... 22:30"""
+    current = datetime.strptime(first, '%H:%M')
+    end = datetime.strptime(last, '%H:%M')
+    slots = []
+    while current <= end:
+        slots.append(current.time())
+        current += timedelta(minutes=interval_minutes)
+    return slots
+
+SERVICE_SLOTS = build_service_slots(
+    app_config.SERVICE_FIRST_SLOT,
+    app_config.SERVICE_LAST_SLOT,
+    app_config.SLOT_INTERVAL_MINUTES
+)
+
+# Authenticated SMTP sessions are kept open and shared across messages
+smtp_pool = SMTPSessionPool(
+    SMTP_SERVER,
+    SMTP_PORT,
+    username=EMAIL_ADDRESS,
+    password=EMAIL_PASSWORD,
+    use_tls=SMTP_USE_TLS,
+    max_sessions=app_config.SMTP_POOL_SIZE,
+    idle_timeout=app_config.SMTP_POOL_IDLE_TIMEOUT
+)
+
+# Outgoing email is queued in Postgres and delivered by background workers
+email_outbox = OutboxWorkerPool(
+    workers=app_config.EMAIL_OUTBOX_WORKERS,
+    max_attempts=app_config.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    poll_interval=app_config.EMAIL_OUTBOX_POLL_INTERVAL,
+    backoff_base=app_config.EMAIL_OUTBOX_BACKOFF_BASE,
+    backoff_max=app_config.EMAIL_OUTBOX_BACKOFF_MAX
+)
+
+def create_db_pool():
+    """Build the connection pool for the current worker process"""
+    connect_kwargs = {'cursor_factory': timed_cursor_factory(metrics.observe_query, query_tracer.observe)}
+    if not DATABASE_URL:
+        connect_kwargs.update({
+            'host': DB_HOST,
+            'database': DB_NAME,
+            'user': DB_USER,
+            'password': DB_PASS,
+            'port': DB_PORT,
+        })
+    pool = ConnectionPool(
+        dsn=DATABASE_URL,
+        min_size=app_config.DB_POOL_MIN_SIZE,
+        max_size=app_config.DB_POOL_MAX_SIZE,
+        timeout=app_config.DB_POOL_TIMEOUT,
+        healthcheck_interval=app_config.DB_POOL_HEALTHCHECK_INTERVAL,
+        **connect_kwargs
+    )
+    logger.info('Database pool ready', extra={'max_connections': pool.max_size})
+    return pool
+
+configure_pool(create_db_pool)
 
 def get_db_connection():
-    """Create and return a database connection"""
+    """Check out a database connection from this worker's pool"""
+    started = time.perf_counter()
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        print("✅ Successfully connected to database!")
+        conn = get_pool().getconn()
+        metrics.POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
         return conn
+    except PoolTimeout as e:
+        metrics.POOL_CHECKOUT_FAILURES.inc()
+        logger.error('Database pool exhausted', extra={'error': str(e)})
+        return None
     except OperationalError as e:
-        print(f"❌ Database connection failed: {e}")
-        print("Please check:")
-        print("1. Is PostgreSQL running?")
-        print("2. Is the database name correct?")
-        print("3. Are the username and password correct?")
+        metrics.POOL_CHECKOUT_FAILURES.inc()
+        logger.error('Database connection failed; check that PostgreSQL is running and '
+                     'the database name and credentials are correct', extra={'error': str(e)})
         return None
 
-def create_tables():
-    """Create the necessary tables if they don't exist"""
+def release_db_connection(conn):
+    """Return a connection to the pool (rolling back any open transaction)"""
+    try:
+        get_pool().putconn(conn)
+    except Exception:
+        logger.warning('Failed to return connection to pool', exc_info=True)
+
+def run_migrations():
+    """Apply pending transactional migrations (a single query when the schema is current).
+
+    Concurrent index builds are left to the deploy step (python migrations.py)
+    unless the tables are still empty, and nothing is applied while another
+    process holds the migration lock, so a booting worker never waits on it.
+    Returns False if the schema is still behind; /health then answers 503.
+    """
     conn = get_db_connection()
     if conn is None:
-        print("❌ Cannot create tables - no database connection")
+        logger.error('Cannot run migrations - no database connection')
         return False
     
     try:
-        cur = conn.cursor()
-        
-        # Create Customers table if it doesn't exist
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(100),
-                email VARCHAR(100) UNIQUE NOT NULL,
-                phone VARCHAR(20),
-                newsletter BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create Reservations table if it doesn't exist
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS reservations (
-                id SERIAL PRIMARY KEY,
-                customer_id INTEGER REFERENCES customers(id),
-                time_slot TIMESTAMP NOT NULL,
-                table_number INTEGER NOT NULL,
-                guests INTEGER NOT NULL,
-                special_requests TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Check if created_at column exists in customers table, if not add it
-        cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='customers' and column_name='created_at'
-        ''')
-        
-        if not cur.fetchone():
-            print("➡️ Adding 'created_at' column to customers table...")
-            cur.execute('ALTER TABLE customers ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;')
-            print("✅ Added 'created_at' column to customers table!")
-        
-        # Check if created_at column exists in reservations table, if not add it
-        cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='reservations' and column_name='created_at'
-        ''')
-        
-        if not cur.fetchone():
-            print("➡️ Adding 'created_at' column to reservations table...")
-            cur.execute('ALTER TABLE reservations ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;')
-            print("✅ Added 'created_at' column to reservations table!")
-        
-        # Check if guests column exists in reservations table, if not add it
-        cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='reservations' and column_name='guests'
-        ''')
-        
-        if not cur.fetchone():
-            print("➡️ Adding 'guests' column to reservations table...")
-            cur.execute('ALTER TABLE reservations ADD COLUMN guests INTEGER NOT NULL DEFAULT 2;')
-            print("✅ Added 'guests' column to reservations table!")
-            
-        # Check if special_requests column exists in reservations table, if not add it
-        cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='reservations' and column_name='special_requests'
-        ''')
-        
-        if not cur.fetchone():
-            print("➡️ Adding 'special_requests' column to reservations table...")
-            cur.execute('ALTER TABLE reservations ADD COLUMN special_requests TEXT;')
-            print("✅ Added 'special_requests' column to reservations table!")
-        
-        # Check if status column exists in reservations table, if not add it
-        cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='reservations' and column_name='status'
-        ''')
-        
-        if not cur.fetchone():
-            print("➡️ Adding 'status' column to reservations table...")
-            cur.execute("ALTER TABLE reservations ADD COLUMN status VARCHAR(20) DEFAULT 'pending';")
-            print("✅ Added 'status' column to reservations table!")
-        
-        # Check if fulfilled_at column exists in reservations table, if not add it
-        cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='reservations' and column_name='fulfilled_at'
-        ''')
-        
-        if not cur.fetchone():
-            print("➡️ Adding 'fulfilled_at' column to reservations table...")
-            cur.execute('ALTER TABLE reservations ADD COLUMN fulfilled_at TIMESTAMP;')
-            print("✅ Added 'fulfilled_at' column to reservations table!")
-        
-        # Check if revenue column exists in reservations table, if not add it
-        cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='reservations' and column_name='revenue'
-        ''')
-        
-        if not cur.fetchone():
-            print("➡️ Adding 'revenue' column to reservations table...")
-            cur.execute('ALTER TABLE reservations ADD COLUMN revenue DECIMAL(10, 2);')
-            print("✅ Added 'revenue' column to reservations table!")
-        
-        conn.commit()
-        print("✅ Database tables are ready!")
+        applied = migrate(conn, concurrent=False, wait=False)
+        if applied:
+            logger.info('Applied migrations', extra={'versions': applied})
+        version = current_schema_version(conn)
+        if version < LATEST_SCHEMA_VERSION:
+            logger.warning('Database schema is behind; run python migrations.py',
+                           extra={'version': version, 'latest': LATEST_SCHEMA_VERSION})
+            return False
+        logger.info('Database tables are ready')
         return True
-        
-    except Exception as e:
-        print(f"❌ Error creating tables: {e}")
-        conn.rollback()
+    except Exception:
+        logger.exception('Error running migrations')
         return False
     finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+        release_db_connection(conn)
 
 # Test route to check database status
 @app.route('/api/db-status')
@@ -198,14 +286,41 @@ def db_status():
     """Check if database is working"""
     conn = get_db_connection()
     if conn:
-        conn.close()
-        return jsonify({'status': '✅ Database is connected and working!'})
+        release_db_connection(conn)
+        return jsonify({
+            'status': '✅ Database is connected and working!',
+            'pool': get_pool().stats()
+        })
     else:
         return jsonify({'status': '❌ Database connection failed!'}), 500
 
-# Create tables when the app starts
-print("🚀 Starting Café Fausse Backend...")
-create_tables()
+# Bring the database schema up to date when the app starts
+logger.info('Starting Café Fausse Backend')
+schema_ready = run_migrations()
+
+@app.route('/health')
+def health():
+    """Platform health check: 503 until the database is reachable and fully migrated.
+
+    A worker that booted with the schema behind (the deploy step hasn't run
+    python migrations.py yet) rechecks the version on each call.
+    """
+    global schema_ready
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({'status': 'unavailable', 'database': 'unreachable'}), 503
+    try:
+        version = LATEST_SCHEMA_VERSION if schema_ready else current_schema_version(conn)
+    except psycopg2.Error:
+        logger.exception('Error checking schema version')
+        return jsonify({'status': 'unavailable', 'database': 'error'}), 503
+    finally:
+        release_db_connection(conn)
+    schema_ready = version >= LATEST_SCHEMA_VERSION
+    if not schema_ready:
+        return jsonify({'status': 'unavailable', 'schema_version': version,
+                        'latest_schema_version': LATEST_SCHEMA_VERSION}), 503
+    return jsonify({'status': 'ok', 'schema_version': version})
 
 @app.route('/')
 def home():
@@ -226,356 +341,94 @@ def sanitize_input(text):
     text = re.sub(r'<[^>]+>', '', str(text))
     return escape(text).strip()
 
+# Email templates are compiled once at startup; only per-booking values are rendered per message
+EMAIL_TEMPLATE_CONSTANTS = {
+    'cafe_name': CAFE_NAME,
+    'cafe_phone': CAFE_PHONE,
+    'cafe_address': CAFE_ADDRESS,
+    'cafe_email': EMAIL_ADDRESS,
+}
+booking_confirmation_template = EmailTemplate(
+    'booking_confirmation', '🎉 Reservation Confirmed at {{cafe_name}}', EMAIL_TEMPLATE_CONSTANTS
+)
+admin_notification_template = EmailTemplate(
+    'admin_notification', '🔔 New Reservation - {{cafe_name}}', EMAIL_TEMPLATE_CONSTANTS
+)
+
 def send_booking_confirmation(customer_name, customer_email, booking_details):
     """Send booking confirmation email to customer"""
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"🎉 Reservation Confirmed at {CAFE_NAME}"
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = customer_email
-
-        # Create HTML email template
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    font-family: Arial, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    border-radius: 15px;
-                    padding: 30px;
-                }}
-                .header {{
-                    text-align: center;
-                    margin-bottom: 30px;
-                }}
-                .logo {{
-                    font-size: 2.5em;
-                    margin-bottom: 10px;
-                }}
-                .details-box {{
-                    background: rgba(255, 255, 255, 0.1);
-                    border-radius: 10px;
-                    padding: 20px;
-                    margin: 20px 0;
-                    border-left: 5px solid #ffd700;
-                }}
-                .detail-item {{
-                    margin: 10px 0;
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                }}
-                .label {{
-                    color: #ffd700;
-                    font-weight: bold;
-                }}
-                .value {{
-                    color: white;
-                }}
-                .special-requests {{
-                    background: rgba(255, 215, 0, 0.1);
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin: 15px 0;
-                    border-left: 3px solid #ffd700;
-                }}
-                .footer {{
-                    text-align: center;
-                    margin-top: 30px;
-                    color: rgba(255, 255, 255, 0.8);
-                }}
-                .contact-info {{
-                    background: rgba(255, 255, 255, 0.05);
-                    border-radius: 8px;
-                    padding: 15px;
-                    margin-top: 20px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <div class="logo">🍰 {CAFE_NAME}</div>
-                    <h2>Your Reservation is Confirmed!</h2>
-                    <p>Dear {customer_name}, thank you for choosing our digital dining experience.</p>
-                </div>
-
-                <div class="details-box">
-                    <h3 style="color: #ffd700; text-align: center; margin-bottom: 20px;">📋 Reservation Details</h3>
-                    
-                    <div class="detail-item">
-                        <span class="label">📅 Date & Time:</span>
-                        <span class="value">{booking_details['formatted_datetime']}</span>
-                    </div>
-                    
-                    <div class="detail-item">
-                        <span class="label">🍽️ Table Number:</span>
-                        <span class="value">#{booking_details['table_number']}</span>
-                    </div>
-                    
-                    <div class="detail-item">
-                        <span class="label">👥 Number of Guests:</span>
-                        <span class="value">{booking_details['guests']}</span>
-                    </div>
-                    
-                    <div class="detail-item">
-                        <span class="label">🆔 Reservation ID:</span>
-                        <span class="value">#{booking_details['reservation_id']}</span>
-                    </div>
-                    
-                    <div class="detail-item">
-                        <span class="label">👤 Customer ID:</span>
-                        <span class="value">#{booking_details['customer_id']}</span>
-                    </div>
-                </div>
-
-                {f'''
-                <div class="special-requests">
-                    <h4 style="color: #ffd700; margin: 0 0 10px 0;">📝 Special Requests</h4>
-                    <p style="margin: 0; line-height: 1.5;">{booking_details['special_requests']}</p>
-                </div>
-                ''' if booking_details.get('special_requests') else ''}
-
-                <div class="contact-info">
-                    <h4 style="color: #ffd700; margin: 0 0 10px 0;">📞 Contact Information</h4>
-                    <p style="margin: 5px 0;"><strong>Phone:</strong> {CAFE_PHONE}</p>
-                    <p style="margin: 5px 0;"><strong>Address:</strong> {CAFE_ADDRESS}</p>
-                    <p style="margin: 5px 0;"><strong>Email:</strong> {EMAIL_ADDRESS}</p>
-                </div>
-
-                <div class="footer">
-                    <h4 style="color: #ffd700;">🎊 What to Expect</h4>
-                    <p>• Please arrive 10 minutes before your reservation time</p>
-                    <p>• Your table will be held for 15 minutes past reservation time</p>
-                    <p>• Experience our quantum-inspired digital menu</p>
-                    <p>• Enjoy our immersive cyber atmosphere</p>
-                    
-                    <p style="margin-top: 20px;">
-                        <strong>Need to modify or cancel?</strong><br>
-                        Call us at {CAFE_PHONE} at least 2 hours in advance.
-                    </p>
-                    
-                    <p style="margin-top: 30px; color: rgba(255, 255, 255, 0.6);">
-                        Thank you for choosing {CAFE_NAME}!<br>
-                        We look forward to serving you.
-                    </p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        # Create plain text version
-        text_content = f"""
-        🍰 {CAFE_NAME} - Reservation Confirmed!
-        
-        Dear {customer_name},
-        
-        Your reservation has been confirmed! Here are the details:
-        
-        📋 RESERVATION DETAILS:
-        📅 Date & Time: {booking_details['formatted_datetime']}
-        🍽️ Table Number: #{booking_details['table_number']}
-        👥 Number of Guests: {booking_details['guests']}
-        🆔 Reservation ID: #{booking_details['reservation_id']}
-        👤 Customer ID: #{booking_details['customer_id']}
-        
-        {f"📝 Special Requests: {booking_details['special_requests']}" if booking_details.get('special_requests') else ''}
-        
-        📞 CONTACT INFORMATION:
-        Phone: {CAFE_PHONE}
-        Address: {CAFE_ADDRESS}
-        Email: {EMAIL_ADDRESS}
-        
-        🎊 WHAT TO EXPECT:
-        • Please arrive 10 minutes before your reservation time
-        • Your table will be held for 15 minutes past reservation time
-        • Experience our quantum-inspired digital menu
-        • Enjoy our immersive cyber atmosphere
-        
-        Need to modify or cancel? Call us at {CAFE_PHONE} at least 2 hours in advance.
-        
-        Thank you for choosing {CAFE_NAME}!
-        We look forward to serving you.
-        """
-
-        # Attach parts
-        part1 = MIMEText(text_content, 'plain')
-        part2 = MIMEText(html_content, 'html')
-        
-        msg.attach(part1)
-        msg.attach(part2)
-
-        # Send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
+        message = booking_confirmation_template.build_message(
+            {**booking_details, 'customer_name': customer_name},
+            EMAIL_ADDRESS,
+            customer_email
+        )
+        smtp_pool.sendmail(EMAIL_ADDRESS, [customer_email], message)
         
         return True
-    except Exception as e:
-        print(f"❌ Failed to send email: {e}")
+    except Exception:
+        logger.exception('Failed to send email')
         return False
 
 def send_admin_notification(booking_details, customer_details):
     """Send email notification to admin about new reservation"""
-    if not ADMIN_EMAIL or not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        print("⚠️ Admin email not configured, skipping admin notification")
+    if not ADMIN_EMAIL or not EMAIL_ADDRESS:
+        logger.warning('Admin email not configured, skipping admin notification')
         return False
     
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"🔔 New Reservation - {CAFE_NAME}"
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = ADMIN_EMAIL
-
-        # HTML content for admin
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; background: #f5f5f5; padding: 20px; }}
-                .container {{ max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; padding: 30px; box-shadow: 0 4px 15px rgba(0,0,0,0.1); }}
-                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px; }}
-                .alert {{ background: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; border-radius: 5px; }}
-                .details {{ background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 15px 0; }}
-                .detail-row {{ padding: 10px 0; border-bottom: 1px solid #e0e0e0; }}
-                .detail-row:last-child {{ border-bottom: none; }}
-                .label {{ font-weight: bold; color: #764ba2; min-width: 150px; display: inline-block; }}
-                .value {{ color: #333; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1 style="margin: 0;">🔔 New Reservation Alert</h1>
-                    <p style="margin: 10px 0 0 0;">A new reservation has been made</p>
-                </div>
-
-                <div class="alert">
-                    <strong>⏰ Action Required:</strong> New reservation needs your attention
-                </div>
-
-                <div class="details">
-                    <h3 style="margin-top: 0; color: #764ba2;">👤 Customer Information</h3>
-                    <div class="detail-row">
-                        <span class="label">Name:</span>
-                        <span class="value">{customer_details['name']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">Email:</span>
-                        <span class="value">{customer_details['email']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">Phone:</span>
-                        <span class="value">{customer_details.get('phone', 'Not provided')}</span>
-                    </div>
-                </div>
-
-                <div class="details">
-                    <h3 style="margin-top: 0; color: #764ba2;">📋 Reservation Details</h3>
-                    <div class="detail-row">
-                        <span class="label">📅 Date & Time:</span>
-                        <span class="value">{booking_details['formatted_datetime']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">🍽️ Table Number:</span>
-                        <span class="value">#{booking_details['table_number']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">👥 Guests:</span>
-                        <span class="value">{booking_details['guests']}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">🆔 Reservation ID:</span>
-                        <span class="value">#{booking_details['reservation_id']}</span>
-                    </div>
-                    {f'''
-                    <div class="detail-row">
-                        <span class="label">📝 Special Requests:</span>
-                        <span class="value">{booking_details['special_requests']}</span>
-                    </div>
-                    ''' if booking_details.get('special_requests') else ''}
-                </div>
-
-                <div style="text-align: center; margin-top: 30px; padding-top: 20px; border-top: 2px solid #e0e0e0;">
-                    <p style="color: #666; margin: 0;">
-                        This is an automated notification from {CAFE_NAME}
-                    </p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        # Plain text version
-        text_content = f"""
-        🔔 NEW RESERVATION ALERT - {CAFE_NAME}
-        
-        A new reservation has been made!
-        
-        CUSTOMER INFORMATION:
-        Name: {customer_details['name']}
-        Email: {customer_details['email']}
-        Phone: {customer_details.get('phone', 'Not provided')}
-        
-        RESERVATION DETAILS:
-        Date & Time: {booking_details['formatted_datetime']}
-        Table Number: #{booking_details['table_number']}
-        Guests: {booking_details['guests']}
-        Reservation ID: #{booking_details['reservation_id']}
-        {f"Special Requests: {booking_details['special_requests']}" if booking_details.get('special_requests') else ''}
-        
-        ---
-        This is an automated notification from {CAFE_NAME}
-        """
-
-        # Attach parts
-        part1 = MIMEText(text_content, 'plain')
-        part2 = MIMEText(html_content, 'html')
-        
-        msg.attach(part1)
-        msg.attach(part2)
-
-        # Send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
+        message = admin_notification_template.build_message(
+            {
+                **booking_details,
+                'customer_name': customer_details['name'],
+                'customer_email': customer_details['email'],
+                'customer_phone': customer_details.get('phone') or 'Not provided'
+            },
+            EMAIL_ADDRESS,
+            ADMIN_EMAIL
+        )
+        smtp_pool.sendmail(EMAIL_ADDRESS, [ADMIN_EMAIL], message)
         
-        print(f"✅ Admin notification sent to {ADMIN_EMAIL}")
+        logger.info('Admin notification sent')
         return True
-    except Exception as e:
-        print(f"❌ Failed to send admin notification: {e}")
+    except Exception:
+        logger.exception('Failed to send admin notification')
         return False
 
-def log_notification(notification_data):
-    """Store notification for admin portal display"""
-    global recent_notifications
-    
-    notification_data['timestamp'] = datetime.now().isoformat()
-    notification_data['id'] = len(recent_notifications) + 1
-    notification_data['read'] = False
-    
-    recent_notifications.append(notification_data)
-    
-    # Keep only last 100 notifications
-    if len(recent_notifications) > 100:
-        recent_notifications = recent_notifications[-100:]
-    
-    print(f"📝 Logged notification #{notification_data['id']} for admin portal")
+def deliver_booking_confirmation(payload):
+    """Outbox handler for queued customer confirmations"""
+    if not send_booking_confirmation(payload['customer_name'], payload['customer_email'], payload['booking_details']):
+        raise RuntimeError(f"Could not send confirmation to {payload['customer_email']}")
+
+def deliver_admin_notification(payload):
+    """Outbox handler for queued admin alerts"""
+    if not send_admin_notification(payload['booking_details'], payload['customer_details']):
+        raise RuntimeError("Could not send admin notification")
+
+email_outbox.register_handler('booking_confirmation',
+                              metrics.timed_email_handler('booking_confirmation', deliver_booking_confirmation))
+email_outbox.register_handler('admin_notification',
+                              metrics.timed_email_handler('admin_notification', deliver_admin_notification))
+
+# Only now that every kind has a handler may the workers start claiming
+# messages (a backlog left from before a restart is claimed straight away)
+email_outbox.start()
+
+def record_notification(conn, cur, payload):
+    """Add an admin notification after the change it describes committed; returns its id or None"""
+    try:
+        notification_id = notifications.add(cur, payload, keep=app_config.NOTIFICATION_HISTORY)
+        conn.commit()
+        return notification_id
+    except Exception:
+        conn.rollback()
+        logger.exception('Failed to record admin notification')
+        return None
 
 @app.route('/api/reservations', methods=['POST'])
 def create_reservation():
     data = request.get_json()
-    print("📨 Received reservation data:", data)
+    logger.info('Reservation request', extra={'reservation': data})
 
     # Sanitize inputs
     name = sanitize_input(data.get('name'))
@@ -589,63 +442,91 @@ def create_reservation():
     if not all([name, email, time_slot, guests]):
         return jsonify({'error': 'Missing required fields'}), 400
 
+    slot = normalize_slot(time_slot)
+    if slot is None:
+        return jsonify({'error': 'Invalid time slot'}), 400
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
 
+    claimed_table = None
     try:
         cur = conn.cursor()
 
-        # 1. Insert or get the customer
+        # 1. Insert or get the customer, counting this visit. Every path that
+        #    doesn't book a table returns without committing, which undoes it.
         cur.execute(
-            """INSERT INTO customers (name, email, phone) 
-               VALUES (%s, %s, %s) 
+            """INSERT INTO customers (name, email, phone, visit_count) 
+               VALUES (%s, %s, %s, 1) 
                ON CONFLICT (email) DO UPDATE 
-               SET name = EXCLUDED.name, phone = EXCLUDED.phone 
+               SET name = EXCLUDED.name, phone = EXCLUDED.phone,
+                   visit_count = customers.visit_count + 1
                RETURNING id;""",
             (name, email, phone)
         )
         customer_id = cur.fetchone()[0]
-        print(f"👤 Customer ID: {customer_id}")
+        logger.debug('Customer upserted', extra={'customer_id': customer_id})
 
-        # 2. Check availability
-        TOTAL_TABLES = 30
-        cur.execute("SELECT COUNT(*) FROM reservations WHERE time_slot = %s;", (time_slot,))
-        reservation_count = cur.fetchone()[0]
-        print(f"📊 Reservations for {time_slot}: {reservation_count}/{TOTAL_TABLES}")
+        # 2. Check availability and pick a preferred free table from the
+        #    occupancy index (only a cold or expired slot is read from the database)
+        def load_booked_tables(slot):
+            cur.execute("SELECT table_number FROM reservations WHERE time_slot = %s;", (slot,))
+            return [row[0] for row in cur.fetchall()]
 
-        if reservation_count >= TOTAL_TABLES:
+        claimed_table = slot_index.claim(slot, load_booked_tables)
+        if claimed_table is None:
             return jsonify({'error': 'Sorry, that time slot is fully booked!'}), 400
 
-        # 3. Assign a random available table
-        all_tables = list(range(1, TOTAL_TABLES + 1))
-        cur.execute("SELECT table_number FROM reservations WHERE time_slot = %s;", (time_slot,))
-        booked_tables = [row[0] for row in cur.fetchall()]
-        available_tables = [t for t in all_tables if t not in booked_tables]
+        # 3. Assign a table and create the reservation in one round trip. The
+        #    per-slot advisory lock serializes only bookings for this slot, and
+        #    the UNIQUE (time_slot, table_number) constraint is the final word:
+        #    a conflicting insert inserts nothing and we try again.
+        row = None
+        for _ in range(RESERVATION_INSERT_ATTEMPTS):
+            cur.execute(ASSIGN_TABLE_SQL, {
+                'lock_namespace': SLOT_LOCK_NAMESPACE,
+                'lock_key': slot_lock_key(slot),
+                'customer_id': customer_id,
+                'time_slot': slot,
+                'guests': guests,
+                'special_requests': special_requests,
+                'total_tables': TOTAL_TABLES,
+                'preferred_table': claimed_table
+            })
+            row = cur.fetchone()
+            if row[0] is None or row[1] is not None:
+                break
+
+        if row[0] is None:
+            # The database knows of bookings this worker's index hadn't seen
+            slot_index.invalidate(slot)
+            claimed_table = None
+            return jsonify({'error': 'Sorry, that time slot is fully booked!'}), 400
 
-        if not available_tables:
-            return jsonify({'error': 'Sorry, no tables available!'}), 400
+        if row[1] is None:
+            slot_index.invalidate(slot)
+            claimed_table = None
+            return jsonify({'error': 'That time slot is in high demand, please try again.'}), 409
 
-        assigned_table = random.choice(available_tables)
-        print(f"🎯 Assigned table: {assigned_table}")
+        if row[2] != claimed_table:
+            slot_index.release(slot, claimed_table)
+            claimed_table = row[2]
+            slot_index.reserve(slot, claimed_table)
+        logger.debug('Table assigned', extra={'table_number': claimed_table})
 
-        # 4. Create the reservation
-        cur.execute(
-            "INSERT INTO reservations (customer_id, time_slot, table_number, guests, special_requests) VALUES (%s, %s, %s, %s, %s) RETURNING id;",
-            (customer_id, time_slot, assigned_table, guests, special_requests)
-        )
-        
-        reservation_id = cur.fetchone()[0]
-        conn.commit()
+        assigned_table = claimed_table
+        reservation_id = row[1]
+        rollup.record_booking(cur, slot, assigned_table, guests)
         
-        # 5. Format datetime for display
+        # 4. Format datetime for display
         try:
             datetime_obj = datetime.fromisoformat(time_slot.replace('Z', '+00:00'))
             formatted_datetime = datetime_obj.strftime("%A, %B %d, %Y at %I:%M %p")
         except:
             formatted_datetime = time_slot
 
-        # 6. Prepare booking details for email
+        # 5. Prepare booking details for email
         booking_details = {
             'reservation_id': reservation_id,
             'customer_id': customer_id,
@@ -661,32 +542,44 @@ def create_reservation():
             'phone': phone
         }
 
-        # 7. Send confirmation email to customer
-        email_sent = send_booking_confirmation(name, email, booking_details)
-        
-        # 8. Send notification to admin (email)
-        try:
-            admin_notified = send_admin_notification(booking_details, customer_details)
-        except Exception as e:
-            print(f"⚠️ Admin email notification failed: {e}")
-            admin_notified = False
-        
-        # 9. Log notification for admin portal
-        try:
-            log_notification({
-                'type': 'new_reservation',
+        # 6. Queue confirmation email to customer (same transaction as the booking)
+        email_queued = False
+        if EMAIL_ADDRESS:
+            email_outbox.enqueue(cur, 'booking_confirmation', {
                 'customer_name': name,
                 'customer_email': email,
-                'table_number': assigned_table,
-                'datetime': formatted_datetime,
-                'guests': guests,
-                'special_requests': special_requests,
-                'reservation_id': reservation_id
+                'booking_details': booking_details
             })
-        except Exception as e:
-            print(f"⚠️ Failed to log notification: {e}")
+            email_queued = True
         
-        # 10. Prepare response message
+        # 7. Queue notification to admin (email)
+        if ADMIN_EMAIL and EMAIL_ADDRESS:
+            email_outbox.enqueue(cur, 'admin_notification', {
+                'booking_details': booking_details,
+                'customer_details': customer_details
+            })
+        
+        conn.commit()
+        claimed_table = None
+        email_outbox.notify()
+        dining_report_cache.invalidate(slot.date())
+
+        # 8. Record notification for admin portal, in a short transaction of
+        #    its own so bookings never queue on the notification lock
+        notification_id = record_notification(conn, cur, {
+            'type': 'new_reservation',
+            'customer_name': name,
+            'customer_email': email,
+            'table_number': assigned_table,
+            'datetime': formatted_datetime,
+            'guests': guests,
+            'special_requests': special_requests,
+            'reservation_id': reservation_id
+        })
+        logger.info('Reservation created',
+                    extra={'reservation_id': reservation_id, 'notification_id': notification_id})
+        
+        # 9. Prepare response message
         confirmation_message = f'🎉 Your reservation for {guests} guests on {formatted_datetime} is confirmed!\n\n'
         confirmation_message += f'📋 Reservation Details:\n'
         confirmation_message += f'• Table Number: #{assigned_table}\n'
@@ -696,8 +589,8 @@ def create_reservation():
         if special_requests:
             confirmation_message += f'📝 Special Requests: {special_requests}\n\n'
         
-        if email_sent:
-            confirmation_message += f'📧 A detailed confirmation has been sent to {email}\n\n'
+        if email_queued:
+            confirmation_message += f'📧 A detailed confirmation is on its way to {email}\n\n'
         else:
             confirmation_message += f'⚠️ Reservation confirmed but email notification failed. Please save these details:\n\n'
         
@@ -709,21 +602,103 @@ def create_reservation():
             'reservation_details': booking_details
         })
 
-    except Exception as e:
+    except Exception:
         conn.rollback()
-        print(f"❌ Database error: {e}")
+        logger.exception('Database error')
         return jsonify({'error': 'A database error occurred.'}), 500
     finally:
+        if claimed_table is not None:
+            # The booking never committed, so hand the table back
+            slot_index.release(slot, claimed_table)
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
+
+@app.route('/api/availability', methods=['GET'])
+def get_availability():
+    """Free-table counts per time slot for ?date= or ?start_date=&end_date=
+
+    Booked tables are counted in one grouped query (answered from the
+    UNIQUE (time_slot, table_number) index) and merged onto the daily slot
+    grid. Responses carry a short Cache-Control max-age and an ETag, so
+    repeat polls from the reservations page are usually a 304.
+    """
+    try:
+        if request.args.get('date'):
+            start = end = date.fromisoformat(request.args['date'])
+        else:
+            start = date.fromisoformat(request.args['start_date'])
+            end = date.fromisoformat(request.args.get('end_date') or request.args['start_date'])
+    except KeyError:
+        return jsonify({'error': 'Provide date, or start_date and end_date (YYYY-MM-DD)'}), 400
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+
+    if end < start:
+        return jsonify({'error': 'end_date must not be before start_date'}), 400
+    if (end - start).days >= app_config.AVAILABILITY_MAX_DAYS:
+        return jsonify({'error': f'Date range is limited to {app_config.AVAILABILITY_MAX_DAYS} days'}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute('''
+            SELECT time_slot, COUNT(*)
+            FROM reservations
+            WHERE time_slot >= %s AND time_slot < %s
+            GROUP BY time_slot
+        ''', (start, end + timedelta(days=1)))
+        booked = dict(cur.fetchall())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        logger.exception('Error fetching availability')
+        return jsonify({'error': 'Failed to fetch availability'}), 500
+    finally:
+        if cur:
+            cur.close()
+        release_db_connection(conn)
+
+    days = []
+    day = start
+    while day <= end:
+        slot_times = {datetime.combine(day, t) for t in SERVICE_SLOTS}
+        # Bookings made outside the usual grid still take up a table
+        slot_times.update(s for s in booked if s.date() == day)
+        slots = []
+        for slot_time in sorted(slot_times):
+            free = max(TOTAL_TABLES - booked.get(slot_time, 0), 0)
+            slots.append({
+                'time_slot': slot_time.isoformat(),
+                'time': slot_time.strftime('%H:%M'),
+                'free_tables': free,
+                'available': free > 0
+            })
+        days.append({'date': day.isoformat(), 'slots': slots})
+        day += timedelta(days=1)
+
+    response = jsonify({
+        'success': True,
+        'total_tables': TOTAL_TABLES,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'days': days
+    })
+    response.set_etag(hashlib.md5(response.get_data()).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = app_config.AVAILABILITY_CACHE_TTL
+    return response.make_conditional(request)
 
 # Newsletter signup endpoint
 @app.route('/api/newsletter', methods=['POST'])
 def newsletter_signup():
     data = request.get_json()
-    print("📧 Newsletter signup:", data)
+    logger.info('Newsletter signup', extra={'signup': data})
 
     email = data.get('email')
 
@@ -741,37 +716,31 @@ def newsletter_signup():
     try:
         cur = conn.cursor()
 
-        # Check if email already exists
-        cur.execute("SELECT id FROM customers WHERE email = %s;", (email,))
-        existing_customer = cur.fetchone()
-
-        if existing_customer:
-            # Update existing customer to subscribe to newsletter
-            cur.execute(
-                "UPDATE customers SET newsletter = TRUE WHERE email = %s;",
-                (email,)
-            )
-            message = "You're already in our system! We've updated your newsletter preference."
-        else:
-            # Create new customer with newsletter subscription
-            cur.execute(
-                "INSERT INTO customers (email, newsletter) VALUES (%s, TRUE);",
-                (email,)
-            )
+        # Subscribe in one statement; xmax = 0 only for a freshly inserted row
+        cur.execute(
+            """INSERT INTO customers (email, newsletter)
+               VALUES (%s, TRUE)
+               ON CONFLICT (email) DO UPDATE SET newsletter = TRUE
+               RETURNING (xmax = 0);""",
+            (email,)
+        )
+        if cur.fetchone()[0]:
             message = "Thank you for subscribing to our newsletter!"
+        else:
+            message = "You're already in our system! We've updated your newsletter preference."
 
         conn.commit()
         return jsonify({'success': True, 'message': message})
 
-    except Exception as e:
+    except Exception:
         conn.rollback()
-        print(f"❌ Newsletter error: {e}")
+        logger.exception('Newsletter error')
         return jsonify({'error': 'Subscription failed. Please try again.'}), 500
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 # Admin credentials (in production, store these securely in environment variables)
 ADMIN_USERNAME = "admin"
@@ -783,20 +752,107 @@ def generate_token(username):
     payload = {
         'username': username,
         'exp': datetime.utcnow() + timedelta(hours=8),  # Token expires in 8 hours
-        'iat': datetime.utcnow()
+        'iat': datetime.utcnow(),
+        'jti': secrets.token_hex(8)  # Tokens issued in the same second stay distinct for revocation
     }
     return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
-def verify_token(token):
-    """Verify JWT token"""
+def decode_token(token):
+    """Check a JWT's signature and claims; returns (username, exp) or None"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return payload['username']
+        if 'purpose' in payload:
+            return None  # A single-purpose ticket, never a bearer token
+        return payload['username'], payload['exp']
     except jwt.ExpiredSignatureError:
         return None
-    except jwt.InvalidTokenError:
+    except (jwt.InvalidTokenError, KeyError):
+        return None
+
+def generate_stream_ticket(username):
+    """Short-lived JWT that only opens a notification stream (it may end up in access logs)"""
+    payload = {
+        'sub': username,
+        'purpose': 'notification_stream',
+        'exp': datetime.utcnow() + timedelta(seconds=app_config.NOTIFICATION_STREAM_TICKET_TTL),
+        'iat': datetime.utcnow()
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+
+def decode_stream_ticket(ticket):
+    """Return the username a stream ticket was issued to, or None if it is invalid or expired"""
+    try:
+        payload = jwt.decode(ticket, SECRET_KEY, algorithms=['HS256'])
+        if payload.get('purpose') != 'notification_stream':
+            return None
+        return payload['sub']
+    except (jwt.InvalidTokenError, KeyError):
         return None
 
+def is_token_revoked(digest):
+    """Look a token up in revoked_tokens; raises psycopg2.Error if the database can't answer"""
+    conn = get_db_connection()
+    if not conn:
+        raise OperationalError('Database connection failed')
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT 1 FROM revoked_tokens WHERE token_digest = %s', (digest,))
+        revoked = cur.fetchone() is not None
+        cur.close()
+        conn.commit()
+        return revoked
+    except Exception:
+        conn.rollback()
+        logger.exception('Error checking token revocation')
+        raise
+    finally:
+        release_db_connection(conn)
+
+def auth_unavailable():
+    """503 for a token that couldn't be checked (it may be fine; the client should retry)"""
+    response = jsonify({'error': 'Authentication is temporarily unavailable, please retry'})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+# Tokens that already passed decode_token, so the dashboard's repeated
+# requests skip the HMAC check and the revocation lookup
+token_cache = TokenCache(
+    decode_token,
+    is_token_revoked,
+    max_entries=app_config.TOKEN_CACHE_SIZE,
+    revalidate_after=app_config.TOKEN_CACHE_REVALIDATE
+)
+
+def verify_token(token):
+    """Verify JWT token; raises psycopg2.Error if its revocation can't be checked"""
+    return token_cache.verify(token)
+
+def revoke_token(token):
+    """Reject a token from now on (logout or rotation); returns False if it was already invalid"""
+    verified = decode_token(token)
+    if verified is None:
+        return False
+    conn = get_db_connection()
+    if not conn:
+        raise OperationalError('Database connection failed')
+    try:
+        cur = conn.cursor()
+        cur.execute('DELETE FROM revoked_tokens WHERE expires_at < %s', (datetime.utcnow(),))
+        cur.execute('''
+            INSERT INTO revoked_tokens (token_digest, expires_at)
+            VALUES (%s, %s)
+            ON CONFLICT (token_digest) DO NOTHING
+        ''', (token_digest(token), datetime.utcfromtimestamp(verified[1])))
+        cur.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+    token_cache.revoke(token)
+    return True
+
 def require_auth(f):
     """Decorator to require authentication for admin endpoints"""
     @wraps(f)
@@ -812,6 +868,8 @@ def require_auth(f):
                 return jsonify({'error': 'Invalid or expired token'}), 401
         except (IndexError, ValueError):
             return jsonify({'error': 'Invalid authorization header format'}), 401
+        except psycopg2.Error:
+            return auth_unavailable()
         
         return f(*args, **kwargs)
     return decorated_function
@@ -840,24 +898,161 @@ def admin_login():
     else:
         return jsonify({'error': 'Invalid credentials'}), 401
 
+def is_admin_request():
+    """True if the request carries a valid admin token (the check require_auth makes)"""
+    parts = request.headers.get('Authorization', '').split(' ')
+    try:
+        return len(parts) == 2 and bool(verify_token(parts[1]))
+    except psycopg2.Error:
+        return False
+
+def bearer_token():
+    """The token from an Authorization: Bearer header (require_auth has checked it)"""
+    return request.headers['Authorization'].split(' ')[1]
+
+@app.route('/api/admin/logout', methods=['POST'])
+@require_auth
+def admin_logout():
+    """Revoke the caller's token on every worker"""
+    try:
+        revoke_token(bearer_token())
+    except Exception:
+        logger.exception('Error revoking token')
+        return jsonify({'error': 'Failed to log out'}), 500
+    return jsonify({'success': True, 'message': 'Logged out'})
+
+@app.route('/api/admin/token/refresh', methods=['POST'])
+@require_auth
+def refresh_admin_token():
+    """Issue a fresh token and revoke the one used to ask for it"""
+    old_token = bearer_token()
+    try:
+        username = verify_token(old_token)
+        revoke_token(old_token)
+    except Exception:
+        logger.exception('Error revoking token')
+        return jsonify({'error': 'Failed to refresh token'}), 500
+    return jsonify({
+        'success': True,
+        'token': generate_token(username),
+        'username': username
+    })
+
+# Bookings are paged newest first by (time_slot, id)
+BOOKINGS_PAGE_SIZE = 50
+BOOKINGS_MAX_PAGE_SIZE = 200
+BOOKING_STATUSES = ('pending', 'fulfilled', 'cancelled')
+
+def encode_booking_cursor(direction, time_slot, booking_id):
+    """Opaque page cursor pointing just past (time_slot, id) in ``direction``"""
+    raw = f"{direction}|{time_slot.isoformat()}|{booking_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_booking_cursor(cursor):
+    """Return (direction, time_slot, id), or None for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direction, time_slot, booking_id = raw.split('|')
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(time_slot), int(booking_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def parse_booking_filters(args):
+    """SQL conditions and params for the start_date/end_date/status/table_number filters.
+
+    Raises ValueError with a user-facing message for invalid values.
+    """
+    conditions = []
+    params = []
+    try:
+        if args.get('start_date'):
+            conditions.append('r.time_slot >= %s')
+            params.append(date.fromisoformat(args['start_date']))
+        if args.get('end_date'):
+            conditions.append('r.time_slot < %s')
+            params.append(date.fromisoformat(args['end_date']) + timedelta(days=1))
+    except ValueError:
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+
+    status = args.get('status')
+    if status:
+        if status not in BOOKING_STATUSES:
+            raise ValueError(f"status must be one of {', '.join(BOOKING_STATUSES)}")
+        conditions.append('r.status = %s')
+        params.append(status)
+
+    if args.get('table_number'):
+        try:
+            params.append(int(args['table_number']))
+        except ValueError:
+            raise ValueError('table_number must be a number')
+        conditions.append('r.table_number = %s')
+
+    return conditions, params
+
 # Update admin endpoints to require authentication
 @app.route('/api/admin/bookings', methods=['GET'])
 @require_auth
 def get_all_bookings():
+    """One page of bookings, newest time slot first.
+
+    Query parameters: limit, cursor (next_cursor/prev_cursor from a previous
+    page), start_date and end_date (YYYY-MM-DD, inclusive), status and
+    table_number. Pages are fetched with a keyset condition on
+    (time_slot, id) rather than OFFSET, so every page costs the same no
+    matter how deep into the history it is.
+    """
+    try:
+        limit = int(request.args.get('limit', BOOKINGS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    limit = max(1, min(limit, BOOKINGS_MAX_PAGE_SIZE))
+
+    try:
+        conditions, params = parse_booking_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    direction = 'next'
+    cursor = request.args.get('cursor')
+    if cursor:
+        decoded = decode_booking_cursor(cursor)
+        if decoded is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        direction, cursor_slot, cursor_id = decoded
+        conditions.append('(r.time_slot, r.id) < (%s, %s)' if direction == 'next'
+                          else '(r.time_slot, r.id) > (%s, %s)')
+        params.extend([cursor_slot, cursor_id])
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    order = 'DESC' if direction == 'next' else 'ASC'
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
 
+    cur = None
     try:
         cur = conn.cursor()
-        cur.execute('''
+        # One extra row tells us whether there is another page
+        cur.execute(f'''
             SELECT r.id, r.customer_id, r.time_slot, r.table_number, r.guests, r.special_requests, r.created_at,
-                   c.name, c.email, c.phone 
+                   c.name, c.email, c.phone, r.status
             FROM reservations r 
             JOIN customers c ON r.customer_id = c.id 
-            ORDER BY r.time_slot DESC
-        ''')
+            {where_clause}
+            ORDER BY r.time_slot {order}, r.id {order}
+            LIMIT %s
+        ''', params + [limit + 1])
         bookings = cur.fetchall()
+        conn.commit()
+
+        has_more = len(bookings) > limit
+        bookings = bookings[:limit]
+        if direction == 'prev':
+            bookings.reverse()
         
         # Convert to list of dictionaries with proper datetime handling
         booking_list = []
@@ -872,119 +1067,264 @@ def get_all_bookings():
                 'created_at': booking[6].isoformat() if hasattr(booking[6], 'isoformat') else str(booking[6]),
                 'name': booking[7],
                 'email': booking[8],
-                'phone': booking[9]
+                'phone': booking[9],
+                'status': booking[10]
             }
             booking_list.append(booking_dict)
+
+        # Following a cursor means there is a page on the side we came from
+        more_after = has_more if direction == 'next' else True
+        more_before = bool(cursor) and (has_more if direction == 'prev' else True)
+        next_cursor = prev_cursor = None
+        if bookings and more_after:
+            next_cursor = encode_booking_cursor('next', bookings[-1][2], bookings[-1][0])
+        if bookings and more_before:
+            prev_cursor = encode_booking_cursor('prev', bookings[0][2], bookings[0][0])
         
-        return jsonify({'bookings': booking_list})
+        return jsonify({
+            'bookings': booking_list,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor
+            }
+        })
         
-    except Exception as e:
-        print(f"Error fetching bookings: {e}")
+    except Exception:
+        conn.rollback()
+        logger.exception('Error fetching bookings')
         return jsonify({'error': 'Failed to fetch bookings'}), 500
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
-
-@app.route('/api/admin/bookings/upcoming', methods=['GET'])
+            release_db_connection(conn)
+
+# Bookings export: rows per server-side cursor round trip (and per chunk sent)
+EXPORT_BATCH_SIZE = 2000
+EXPORT_COLUMNS = (
+    'id', 'customer_id', 'time_slot', 'table_number', 'guests', 'status', 'revenue',
+    'fulfilled_at', 'created_at', 'special_requests', 'name', 'email', 'phone'
+)
+
+def export_json_default(value):
+    """json.dumps fallback for the datetime and Decimal columns"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+@app.route('/api/admin/bookings/export', methods=['GET'])
 @require_auth
-def get_upcoming_bookings():
-    """Get today's and upcoming reservations for quick admin overview"""
+def export_bookings():
+    """Stream all matching bookings as NDJSON (default) or CSV (?format=csv).
+
+    Accepts the same filters as /api/admin/bookings. Rows are read through a
+    named (server-side) cursor EXPORT_BATCH_SIZE at a time and sent as they
+    arrive, so memory use stays flat however large the export is.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    try:
+        conditions, params = parse_booking_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
 
+    released = []
+
+    def release():
+        # Runs from the generator, or on close if the stream never started
+        if not released:
+            released.append(True)
+            release_db_connection(conn)
+
+    def generate():
+        cur = conn.cursor(name='bookings_export')
+        cur.itersize = EXPORT_BATCH_SIZE
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        try:
+            if export_format == 'csv':
+                writer.writerow(EXPORT_COLUMNS)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+            cur.execute(f'''
+                SELECT r.id, r.customer_id, r.time_slot, r.table_number, r.guests, r.status, r.revenue,
+                       r.fulfilled_at, r.created_at, r.special_requests, c.name, c.email, c.phone
+                FROM reservations r
+                JOIN customers c ON r.customer_id = c.id
+                {where_clause}
+                ORDER BY r.time_slot, r.id
+            ''', params)
+
+            pending = 0
+            for row in cur:
+                if export_format == 'csv':
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)),
+                                            default=export_json_default, ensure_ascii=False))
+                    buffer.write('\n')
+                pending += 1
+                if pending == EXPORT_BATCH_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+            if pending:
+                yield buffer.getvalue()
+        except Exception:
+            # Headers are already sent, so all we can do is stop the stream
+            logger.exception('Error exporting bookings')
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+            release()
+
+    filename = f"bookings-{datetime.now():%Y%m%d}.{'csv' if export_format == 'csv' else 'ndjson'}"
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    response.call_on_close(release)
+    return response
+
+# Dashboard polls of the upcoming-bookings overview that arrive together
+# share a single database query
+upcoming_bookings_flight = SingleFlight()
+UPCOMING_PREVIEW_LIMIT = 10
+
+def load_upcoming_bookings():
+    """Build the upcoming-bookings overview with one query.
+
+    Every booking in [today_start, week_end) is classified in SQL: today,
+    imminent (within two hours) and later this week, with window aggregates
+    for the counts. Only today's, the imminent and the first
+    UPCOMING_PREVIEW_LIMIT later bookings are sent back to Python.
+    Returns (body, status).
+    """
+    conn = get_db_connection()
+    if not conn:
+        return {'error': 'Database connection failed'}, 500
+
+    cur = None
     try:
         cur = conn.cursor()
         
-        # Get current time
         now = datetime.now()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow_start = today_start + timedelta(days=1)
+        two_hours_from_now = now + timedelta(hours=2)
         week_end = now + timedelta(days=7)
         
-        # Get today's reservations
-        cur.execute('''
-            SELECT r.id, r.customer_id, r.time_slot, r.table_number, r.guests, r.special_requests, r.created_at,
-                   c.name, c.email, c.phone 
-            FROM reservations r 
-            JOIN customers c ON r.customer_id = c.id 
-            WHERE r.time_slot >= %s AND r.time_slot < %s
-            ORDER BY r.time_slot ASC
-        ''', (today_start, today_start + timedelta(days=1)))
-        
-        today_bookings = cur.fetchall()
-        
-        # Get next 7 days reservations (excluding today)
         cur.execute('''
-            SELECT r.id, r.customer_id, r.time_slot, r.table_number, r.guests, r.special_requests, r.created_at,
-                   c.name, c.email, c.phone 
-            FROM reservations r 
-            JOIN customers c ON r.customer_id = c.id 
-            WHERE r.time_slot >= %s AND r.time_slot < %s
-            ORDER BY r.time_slot ASC
-        ''', (today_start + timedelta(days=1), week_end))
-        
-        upcoming_bookings = cur.fetchall()
-        
-        # Get reservations happening in next 2 hours
-        two_hours_from_now = now + timedelta(hours=2)
-        cur.execute('''
-            SELECT r.id, r.customer_id, r.time_slot, r.table_number, r.guests, r.special_requests, r.created_at,
-                   c.name, c.email, c.phone 
-            FROM reservations r 
-            JOIN customers c ON r.customer_id = c.id 
-            WHERE r.time_slot >= %s AND r.time_slot <= %s
-            ORDER BY r.time_slot ASC
-        ''', (now, two_hours_from_now))
-        
-        imminent_bookings = cur.fetchall()
+            SELECT * FROM (
+                SELECT r.id, r.customer_id, r.time_slot, r.table_number, r.guests, r.special_requests, r.created_at,
+                       c.name, c.email, c.phone,
+                       r.time_slot < %(tomorrow_start)s AS is_today,
+                       r.time_slot BETWEEN %(now)s AND %(soon)s AS is_imminent,
+                       row_number() OVER (
+                           PARTITION BY r.time_slot >= %(tomorrow_start)s ORDER BY r.time_slot, r.id
+                       ) AS position,
+                       COUNT(*) FILTER (WHERE r.time_slot < %(tomorrow_start)s) OVER () AS today_count,
+                       COUNT(*) FILTER (WHERE r.time_slot >= %(tomorrow_start)s) OVER () AS upcoming_count,
+                       COUNT(*) FILTER (WHERE r.time_slot BETWEEN %(now)s AND %(soon)s) OVER () AS imminent_count
+                FROM reservations r 
+                JOIN customers c ON r.customer_id = c.id 
+                WHERE r.time_slot >= %(today_start)s AND r.time_slot < %(week_end)s
+            ) AS week
+            WHERE is_today OR is_imminent OR position <= %(preview_limit)s
+            ORDER BY time_slot, id
+        ''', {
+            'now': now,
+            'soon': two_hours_from_now,
+            'today_start': today_start,
+            'tomorrow_start': tomorrow_start,
+            'week_end': week_end,
+            'preview_limit': UPCOMING_PREVIEW_LIMIT
+        })
+        rows = cur.fetchall()
+        conn.commit()
         
-        def format_booking(booking):
-            return {
-                'id': booking[0],
-                'customer_id': booking[1],
-                'time_slot': booking[2].isoformat() if hasattr(booking[2], 'isoformat') else str(booking[2]),
-                'table_number': booking[3],
-                'guests': booking[4],
-                'special_requests': booking[5],
-                'created_at': booking[6].isoformat() if hasattr(booking[6], 'isoformat') else str(booking[6]),
-                'name': booking[7],
-                'email': booking[8],
-                'phone': booking[9],
-                'is_soon': booking[2] <= two_hours_from_now if hasattr(booking[2], '__le__') else False
+        today_bookings = []
+        upcoming_bookings = []
+        imminent_bookings = []
+        for row in rows:
+            booking = {
+                'id': row[0],
+                'customer_id': row[1],
+                'time_slot': row[2].isoformat(),
+                'table_number': row[3],
+                'guests': row[4],
+                'special_requests': row[5],
+                'created_at': row[6].isoformat() if row[6] else None,
+                'name': row[7],
+                'email': row[8],
+                'phone': row[9],
+                'is_soon': row[2] <= two_hours_from_now
             }
+            if row[10]:
+                today_bookings.append(booking)
+            elif row[12] <= UPCOMING_PREVIEW_LIMIT:
+                upcoming_bookings.append(booking)
+            if row[11]:
+                imminent_bookings.append(booking)
         
-        return jsonify({
+        today_count, upcoming_count, imminent_count = rows[0][13:16] if rows else (0, 0, 0)
+        
+        return {
             'success': True,
             'today': {
-                'count': len(today_bookings),
-                'bookings': [format_booking(b) for b in today_bookings]
+                'count': today_count,
+                'bookings': today_bookings
             },
             'upcoming': {
-                'count': len(upcoming_bookings),
-                'bookings': [format_booking(b) for b in upcoming_bookings[:10]]  # Limit to 10 for overview
+                'count': upcoming_count,
+                'bookings': upcoming_bookings  # First few only, for the overview
             },
             'imminent': {
-                'count': len(imminent_bookings),
-                'bookings': [format_booking(b) for b in imminent_bookings]
+                'count': imminent_count,
+                'bookings': imminent_bookings
             },
             'stats': {
-                'today_count': len(today_bookings),
-                'upcoming_week_count': len(upcoming_bookings),
-                'imminent_count': len(imminent_bookings),
-                'total_upcoming': len(today_bookings) + len(upcoming_bookings)
+                'today_count': today_count,
+                'upcoming_week_count': upcoming_count,
+                'imminent_count': imminent_count,
+                'total_upcoming': today_count + upcoming_count
             }
-        })
+        }, 200
         
-    except Exception as e:
-        print(f"Error fetching upcoming bookings: {e}")
-        return jsonify({'error': 'Failed to fetch upcoming bookings'}), 500
+    except Exception:
+        conn.rollback()
+        logger.exception('Error fetching upcoming bookings')
+        return {'error': 'Failed to fetch upcoming bookings'}, 500
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+@app.route('/api/admin/bookings/upcoming', methods=['GET'])
+@require_auth
+def get_upcoming_bookings():
+    """Get today's and upcoming reservations for quick admin overview"""
+    body, status = upcoming_bookings_flight.do('upcoming', load_upcoming_bookings)
+    return jsonify(body), status
 
 @app.route('/api/admin/subscribers', methods=['GET'])
 @require_auth
@@ -996,29 +1336,12 @@ def get_all_subscribers():
     try:
         cur = conn.cursor()
         
-        # First check if created_at column exists
         cur.execute('''
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='customers' and column_name='created_at'
+            SELECT id, name, email, created_at 
+            FROM customers 
+            WHERE newsletter = TRUE 
+            ORDER BY created_at DESC
         ''')
-        
-        has_created_at = cur.fetchone() is not None
-        
-        if has_created_at:
-            cur.execute('''
-                SELECT id, name, email, created_at 
-                FROM customers 
-                WHERE newsletter = TRUE 
-                ORDER BY created_at DESC
-            ''')
-        else:
-            cur.execute('''
-                SELECT id, name, email, NULL as created_at 
-                FROM customers 
-                WHERE newsletter = TRUE 
-                ORDER BY id DESC
-            ''')
             
         subscribers = cur.fetchall()
         
@@ -1034,14 +1357,140 @@ def get_all_subscribers():
         
         return jsonify({'subscribers': subscriber_list})
         
-    except Exception as e:
-        print(f"Error fetching subscribers: {e}")
+    except Exception:
+        logger.exception('Error fetching subscribers')
         return jsonify({'error': 'Failed to fetch subscribers'}), 500
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
+
+@app.route('/api/admin/subscribers/export', methods=['GET'])
+@require_auth
+def export_subscribers():
+    """Stream newsletter subscribers as CSV straight out of COPY ... TO STDOUT"""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            release_db_connection(conn)
+
+    def generate():
+        try:
+            yield from stream_copy(conn, '''
+                COPY (
+                    SELECT id, name, email, created_at
+                    FROM customers
+                    WHERE newsletter = TRUE
+                    ORDER BY created_at DESC
+                ) TO STDOUT WITH (FORMAT csv, HEADER true)
+            ''')
+        except Exception:
+            logger.exception('Error exporting subscribers')
+        finally:
+            release()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename="subscribers-{datetime.now():%Y%m%d}.csv"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    response.call_on_close(release)
+    return response
+
+@app.route('/api/admin/subscribers/import', methods=['POST'])
+@require_auth
+def import_subscribers():
+    """Bulk-subscribe addresses from an uploaded CSV (multipart field 'file').
+
+    The first row must be a header with an 'email' column and optionally a
+    'name' column; other columns are ignored. The file is COPYed as-is into
+    a temporary staging table and merged into customers with one
+    INSERT ... ON CONFLICT (email), so existing customers are opted in and
+    keep their name, and new addresses become subscribers.
+    """
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'Upload a CSV file in the "file" field'}), 400
+
+    stream = upload.stream
+    try:
+        header_line = stream.readline().decode('utf-8-sig').strip()
+    except UnicodeDecodeError:
+        return jsonify({'error': 'Could not read the CSV file: it must be UTF-8 encoded'}), 400
+    header = [column.strip().lower() for column in next(csv.reader([header_line]), [])]
+    if 'email' not in header:
+        return jsonify({'error': 'The CSV header must include an "email" column'}), 400
+    email_column = f"c{header.index('email')}"
+    name_column = f"c{header.index('name')}" if 'name' in header else 'NULL'
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    cur = None
+    try:
+        cur = conn.cursor()
+        columns = ', '.join(f'c{i} TEXT' for i in range(len(header)))
+        cur.execute(f'CREATE TEMP TABLE newsletter_import ({columns}) ON COMMIT DROP')
+        cur.copy_expert('COPY newsletter_import FROM STDIN WITH (FORMAT csv)', stream)
+        cur.execute('SELECT COUNT(*) FROM newsletter_import')
+        total_rows = cur.fetchone()[0]
+
+        cur.execute(f'''
+            WITH merged AS (
+                INSERT INTO customers (email, name, newsletter)
+                SELECT DISTINCT ON (email) email, name, TRUE
+                FROM (
+                    SELECT trim({email_column}) AS email,
+                           left(NULLIF(trim({name_column}), ''), 100) AS name
+                    FROM newsletter_import
+                ) AS rows
+                WHERE email ~ '^[^@[:space:]]+@[^@[:space:]]+[.][^@[:space:]]+$'
+                  AND length(email) <= 100
+                ORDER BY email, name NULLS LAST
+                ON CONFLICT (email) DO UPDATE
+                SET newsletter = TRUE, name = COALESCE(customers.name, EXCLUDED.name)
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+            FROM merged
+        ''')
+        added, updated = cur.fetchone()
+        conn.commit()
+
+        logger.info('Imported newsletter subscribers', extra={
+            'added': added, 'updated': updated, 'skipped': total_rows - added - updated
+        })
+        return jsonify({
+            'success': True,
+            'rows': total_rows,
+            'added': added,
+            'updated': updated,
+            'skipped': total_rows - added - updated
+        })
+
+    except psycopg2.DataError as e:
+        conn.rollback()
+        return jsonify({'error': f'Could not read the CSV file: {str(e).splitlines()[0]}'}), 400
+    except Exception:
+        conn.rollback()
+        logger.exception('Error importing subscribers')
+        return jsonify({'error': 'Failed to import subscribers'}), 500
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
 
 @app.route('/api/admin/bookings/<int:booking_id>', methods=['DELETE'])
 @require_auth
@@ -1053,94 +1502,231 @@ def cancel_booking(booking_id):
     try:
         cur = conn.cursor()
         
-        # Check if booking exists
-        cur.execute('SELECT id FROM reservations WHERE id = %s', (booking_id,))
+        # Delete the booking, if it exists
+        cur.execute('DELETE FROM reservations WHERE id = %s RETURNING time_slot, table_number, customer_id', (booking_id,))
         booking = cur.fetchone()
         
         if not booking:
             return jsonify({'error': 'Booking not found'}), 404
         
-        # Delete the booking
-        cur.execute('DELETE FROM reservations WHERE id = %s', (booking_id,))
+        rollup.refresh_cell(cur, booking[0], booking[1])
+        customer_stats.refresh(cur, booking[2])
         conn.commit()
         
+        # Free the table in this worker's occupancy index
+        slot_index.release(booking[0], booking[1])
+        dining_report_cache.invalidate(booking[0].date())
+        
         return jsonify({'message': 'Booking cancelled successfully'})
         
-    except Exception as e:
+    except Exception:
         conn.rollback()
-        print(f"Error cancelling booking: {e}")
+        logger.exception('Error cancelling booking')
         return jsonify({'error': 'Failed to cancel booking'}), 500
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 @app.route('/api/admin/notifications', methods=['GET'])
 @require_auth
 def get_notifications():
-    """Get all notifications for admin portal"""
-    global recent_notifications
-    
+    """Get the notification feed for admin portal, most recent first"""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    cur = None
     try:
-        # Sort by timestamp, most recent first
-        sorted_notifications = sorted(
-            recent_notifications, 
-            key=lambda x: x['timestamp'], 
-            reverse=True
+        cur = conn.cursor()
+        feed, unread_count = notifications.feed(
+            cur,
+            limit=app_config.NOTIFICATION_HISTORY,
+            unread_only=request.args.get('unread') in ('1', 'true')
         )
-        
-        # Count unread notifications
-        unread_count = len([n for n in recent_notifications if not n['read']])
+        conn.commit()
         
         return jsonify({
             'success': True,
-            'notifications': sorted_notifications,
+            'notifications': feed,
             'unread_count': unread_count
         })
-    except Exception as e:
-        print(f"❌ Error fetching notifications: {e}")
+    except Exception:
+        conn.rollback()
+        logger.exception('Error fetching notifications')
         return jsonify({'error': 'Failed to fetch notifications'}), 500
+    finally:
+        if cur:
+            cur.close()
+        release_db_connection(conn)
 
 @app.route('/api/admin/notifications/<int:notification_id>/read', methods=['POST'])
 @require_auth
 def mark_notification_read(notification_id):
     """Mark a notification as read"""
-    global recent_notifications
-    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    cur = None
     try:
-        for notification in recent_notifications:
-            if notification['id'] == notification_id:
-                notification['read'] = True
-                print(f"✅ Marked notification #{notification_id} as read")
-                return jsonify({
-                    'success': True,
-                    'message': 'Notification marked as read'
-                })
+        cur = conn.cursor()
+        found = notifications.mark_read(cur, notification_id)
+        conn.commit()
+        
+        if not found:
+            return jsonify({'error': 'Notification not found'}), 404
         
-        return jsonify({'error': 'Notification not found'}), 404
-    except Exception as e:
-        print(f"❌ Error marking notification as read: {e}")
+        logger.info('Marked notification as read', extra={'notification_id': notification_id})
+        return jsonify({
+            'success': True,
+            'message': 'Notification marked as read'
+        })
+    except Exception:
+        conn.rollback()
+        logger.exception('Error marking notification as read')
         return jsonify({'error': 'Failed to mark notification'}), 500
+    finally:
+        if cur:
+            cur.close()
+        release_db_connection(conn)
 
 @app.route('/api/admin/notifications/read-all', methods=['POST'])
 @require_auth
 def mark_all_notifications_read():
     """Mark all notifications as read"""
-    global recent_notifications
-    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    cur = None
     try:
-        for notification in recent_notifications:
-            notification['read'] = True
+        cur = conn.cursor()
+        marked = notifications.mark_all_read(cur)
+        conn.commit()
         
-        print(f"✅ Marked all {len(recent_notifications)} notifications as read")
+        logger.info('Marked all notifications as read', extra={'marked': marked})
         return jsonify({
             'success': True,
             'message': 'All notifications marked as read'
         })
-    except Exception as e:
-        print(f"❌ Error marking all notifications as read: {e}")
+    except Exception:
+        conn.rollback()
+        logger.exception('Error marking all notifications as read')
         return jsonify({'error': 'Failed to mark notifications'}), 500
+    finally:
+        if cur:
+            cur.close()
+        release_db_connection(conn)
+
+# Live notification streams share one LISTEN connection per worker, and
+# each stream holds a request thread, so only a few may be open at once
+notification_broker = NotificationBroker(
+    connect_database,
+    max_streams=app_config.NOTIFICATION_STREAM_MAX,
+    queue_size=app_config.NOTIFICATION_HISTORY
+)
+
+def format_sse(notification):
+    """Encode a notification as a Server-Sent Events message"""
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+
+@app.route('/api/admin/notifications/stream-ticket', methods=['POST'])
+@require_auth
+def create_stream_ticket():
+    """Exchange the admin token for a ticket to pass as ?ticket= to the notification stream"""
+    username, _ = decode_token(bearer_token())  # require_auth has verified it
+    ticket = generate_stream_ticket(username)
+    return jsonify({
+        'ticket': ticket,
+        'expires_in': app_config.NOTIFICATION_STREAM_TICKET_TTL
+    })
+
+@app.route('/api/admin/notifications/stream', methods=['GET'])
+def stream_notifications():
+    """Push new notifications to the admin portal as Server-Sent Events.
+
+    EventSource can't send headers, so browsers connect with ?ticket= from
+    POST /api/admin/notifications/stream-ticket rather than putting the
+    admin token in the URL; other clients may send Authorization: Bearer.
+    The ticket is checked only when the stream opens. Reconnecting clients
+    send Last-Event-ID and first receive everything they missed. Streams
+    end after NOTIFICATION_STREAM_MAX_AGE seconds (or when the client falls
+    too far behind); EventSource then reconnects, and once the ticket has
+    expired that gets a 401 and the portal fetches a new ticket.
+    """
+    auth_header = request.headers.get('Authorization')
+    try:
+        if auth_header:
+            username = verify_token(auth_header.split(' ')[-1])
+        else:
+            username = decode_stream_ticket(request.args.get('ticket', ''))
+        if not username:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+    except psycopg2.Error:
+        return auth_unavailable()
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    
+    subscription = notification_broker.subscribe()
+    if subscription is None:
+        response = jsonify({'error': 'Too many open notification streams, poll /api/admin/notifications instead'})
+        response.headers['Retry-After'] = str(app_config.NOTIFICATION_STREAM_HEARTBEAT)
+        return response, 503
+    released = []
+    
+    def release():
+        if not released:
+            released.append(True)
+            notification_broker.unsubscribe(subscription)
+    
+    # Subscribed first, so nothing committed from here on is missed; the
+    # backlog query only borrows a pooled connection briefly
+    missed = []
+    if last_id:
+        conn = get_db_connection()
+        if not conn:
+            release()
+            return jsonify({'error': 'Database connection failed'}), 500
+        try:
+            cur = conn.cursor()
+            missed = notifications.since(cur, last_id, limit=app_config.NOTIFICATION_HISTORY)
+            cur.close()
+            conn.commit()
+        except Exception:
+            release()
+            logger.exception('Error fetching missed notifications')
+            return jsonify({'error': 'Failed to fetch notifications'}), 500
+        finally:
+            release_db_connection(conn)
+    
+    def generate():
+        sent_id = last_id
+        deadline = time.monotonic() + app_config.NOTIFICATION_STREAM_MAX_AGE
+        try:
+            yield f"retry: {app_config.NOTIFICATION_STREAM_RETRY_MS}\n\n"
+            for notification in missed:
+                sent_id = notification['id']
+                yield format_sse(notification)
+            while time.monotonic() < deadline and not subscription.lagging:
+                notification = subscription.get(timeout=app_config.NOTIFICATION_STREAM_HEARTBEAT)
+                if notification is None:
+                    yield ": keepalive\n\n"
+                elif notification['id'] > sent_id:
+                    sent_id = notification['id']
+                    yield format_sse(notification)
+        finally:
+            release()
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(release)
+    return response
 
 @app.route('/api/admin/bookings/<int:booking_id>/fulfill', methods=['POST'])
 @require_auth
@@ -1168,7 +1754,7 @@ def fulfill_booking(booking_id):
         cur = conn.cursor()
         
         # Check if reservation exists
-        cur.execute('SELECT id, time_slot FROM reservations WHERE id = %s', (booking_id,))
+        cur.execute('SELECT id, time_slot, table_number, customer_id FROM reservations WHERE id = %s', (booking_id,))
         reservation = cur.fetchone()
         
         if not reservation:
@@ -1182,10 +1768,13 @@ def fulfill_booking(booking_id):
                 revenue = %s
             WHERE id = %s
         ''', (revenue, booking_id))
+        rollup.refresh_cell(cur, reservation[1], reservation[2])
+        customer_stats.refresh(cur, reservation[3])
         
         conn.commit()
+        dining_report_cache.invalidate(reservation[1].date())
         
-        print(f"✅ Reservation #{booking_id} marked as fulfilled with revenue ${revenue}")
+        logger.info('Reservation fulfilled', extra={'reservation_id': booking_id, 'revenue': revenue})
         
         return jsonify({
             'success': True,
@@ -1194,128 +1783,130 @@ def fulfill_booking(booking_id):
             'revenue': revenue
         })
         
-    except Exception as e:
-        print(f"❌ Error fulfilling reservation: {e}")
+    except Exception:
+        logger.exception('Error fulfilling reservation')
         conn.rollback()
         return jsonify({'error': 'Failed to fulfill reservation'}), 500
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
-@app.route('/api/admin/reports/dining', methods=['GET'])
-@require_auth
-def get_dining_report():
-    """Get comprehensive dining report with revenue analytics"""
+# Dining reports by (period, first day, last day), reused for
+# REPORT_CACHE_TTL seconds and dropped when a booking inside the range changes
+dining_report_cache = ReportCache(ttl=app_config.REPORT_CACHE_TTL)
+
+def dining_report_range(period, start_date, end_date):
+    """Return the (first, last) day a report covers, both None for all time.
+
+    Totals come from the daily rollup, so ranges cover whole days (both
+    ends inclusive). Raises ValueError for malformed custom dates.
+    """
+    today = date.today()
+    
+    if period == 'today':
+        return today, today
+    elif period == 'week':
+        return today - timedelta(days=7), today
+    elif period == 'month':
+        return today - timedelta(days=30), today
+    elif period == 'year':
+        return today - timedelta(days=365), today
+    elif start_date and end_date:
+        # Convert string dates to days
+        return (datetime.fromisoformat(start_date.replace('Z', '+00:00')).date(),
+                datetime.fromisoformat(end_date.replace('Z', '+00:00')).date())
+    # All time - no date filter
+    return None, None
+
+def load_dining_report(period, start_date, end_date):
+    """Run the report queries for [start_date, end_date] and build the response body"""
     conn = get_db_connection()
     if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+        raise OperationalError('Database connection failed')
 
+    cur = None
     try:
         cur = conn.cursor()
         
-        # Get query parameters for date filtering
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        period = request.args.get('period', 'all')  # all, today, week, month, year
-        
-        # Calculate date range based on period
-        now = datetime.now()
-        
-        if period == 'today':
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        elif period == 'week':
-            start_date = now - timedelta(days=7)
-            end_date = now
-        elif period == 'month':
-            start_date = now - timedelta(days=30)
-            end_date = now
-        elif period == 'year':
-            start_date = now - timedelta(days=365)
-            end_date = now
-        elif start_date and end_date:
-            # Convert string dates to datetime
-            start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        else:
-            # All time - no date filter
-            start_date = None
-            end_date = None
-        
-        # Build WHERE clause
+        # Build WHERE clauses for the rollup and for reservations
+        rollup_where = ""
         where_clause = ""
         params = []
         
         if start_date and end_date:
-            where_clause = "WHERE r.time_slot >= %s AND r.time_slot <= %s"
-            params = [start_date, end_date]
+            rollup_where = "WHERE day >= %s AND day <= %s"
+            where_clause = "WHERE r.time_slot >= %s AND r.time_slot < %s"
+            params = [start_date, end_date + timedelta(days=1)]
         
-        # Get overall statistics
+        # Overall, per-day and per-table totals in one pass over the rollup
         cur.execute(f'''
             SELECT 
-                COUNT(*) as total_reservations,
-                COUNT(CASE WHEN status = 'fulfilled' THEN 1 END) as fulfilled_count,
-                COUNT(CASE WHEN status = 'cancelled' THEN 1 END) as cancelled_count,
-                COUNT(CASE WHEN status = 'pending' THEN 1 END) as pending_count,
-                COALESCE(SUM(CASE WHEN status = 'fulfilled' THEN revenue END), 0) as total_revenue,
-                COALESCE(AVG(CASE WHEN status = 'fulfilled' THEN revenue END), 0) as average_revenue,
-                COALESCE(MAX(CASE WHEN status = 'fulfilled' THEN revenue END), 0) as highest_revenue,
-                SUM(guests) as total_guests
-            FROM reservations r
-            {where_clause}
-        ''', params)
-        
-        stats = cur.fetchone()
-        
-        # Get revenue by day
-        cur.execute(f'''
-            SELECT 
-                DATE(r.time_slot) as date,
-                COUNT(*) as reservations,
-                COUNT(CASE WHEN status = 'fulfilled' THEN 1 END) as fulfilled,
-                COALESCE(SUM(CASE WHEN status = 'fulfilled' THEN revenue END), 0) as daily_revenue,
-                SUM(guests) as guests
-            FROM reservations r
-            {where_clause}
-            GROUP BY DATE(r.time_slot)
-            ORDER BY date DESC
-            LIMIT 30
-        ''', params)
-        
-        daily_breakdown = cur.fetchall()
-        
-        # Get revenue by table
-        cur.execute(f'''
-            SELECT 
-                r.table_number,
-                COUNT(*) as reservations,
-                COUNT(CASE WHEN status = 'fulfilled' THEN 1 END) as fulfilled,
-                COALESCE(SUM(CASE WHEN status = 'fulfilled' THEN revenue END), 0) as revenue
-            FROM reservations r
-            {where_clause}
-            GROUP BY r.table_number
-            ORDER BY revenue DESC
-        ''', params)
-        
-        table_performance = cur.fetchall()
-        
-        # Get top customers by revenue
-        cur.execute(f'''
-            SELECT 
-                c.name,
-                c.email,
-                COUNT(*) as visit_count,
-                COUNT(CASE WHEN r.status = 'fulfilled' THEN 1 END) as fulfilled_visits,
-                COALESCE(SUM(CASE WHEN r.status = 'fulfilled' THEN r.revenue END), 0) as total_spent
-            FROM customers c
-            JOIN reservations r ON c.id = r.customer_id
-            {where_clause}
-            GROUP BY c.id, c.name, c.email
-            ORDER BY total_spent DESC
-            LIMIT 10
-        ''', params)
+                GROUPING(day) AS all_days,
+                GROUPING(table_number) AS all_tables,
+                day,
+                table_number,
+                SUM(reservations),
+                SUM(fulfilled),
+                SUM(cancelled),
+                SUM(pending),
+                COALESCE(SUM(revenue), 0),
+                COALESCE(MAX(max_revenue), 0),
+                SUM(guests)
+            FROM daily_rollup
+            {rollup_where}
+            GROUP BY GROUPING SETS ((), (day), (table_number))
+        ''', [start_date, end_date] if rollup_where else [])
+        
+        stats = None
+        daily_breakdown = []
+        table_performance = []
+        for row in cur.fetchall():
+            all_days, all_tables, day, table_number = row[:4]
+            reservations, fulfilled, cancelled, pending, revenue, highest, guests = row[4:]
+            if all_days and all_tables:
+                average = revenue / fulfilled if fulfilled else 0
+                stats = (reservations or 0, fulfilled or 0, cancelled or 0, pending or 0,
+                         revenue, average, highest, guests)
+            elif not reservations:
+                # Cells emptied by cancellations
+                continue
+            elif all_tables:
+                daily_breakdown.append((day, reservations, fulfilled, revenue, guests))
+            else:
+                table_performance.append((table_number, reservations, fulfilled, revenue))
+        
+        # Most recent 30 days, and best-earning tables first
+        daily_breakdown.sort(key=lambda d: d[0], reverse=True)
+        daily_breakdown = daily_breakdown[:30]
+        table_performance.sort(key=lambda t: (-t[3], t[0]))
+        
+        # Get top customers by revenue: all-time totals are kept on customers
+        # (read in total_spent index order), a date range needs the join
+        if where_clause:
+            cur.execute(f'''
+                SELECT 
+                    c.name,
+                    c.email,
+                    COUNT(*) as visit_count,
+                    COUNT(CASE WHEN r.status = 'fulfilled' THEN 1 END) as fulfilled_visits,
+                    COALESCE(SUM(CASE WHEN r.status = 'fulfilled' THEN r.revenue END), 0) as total_spent
+                FROM customers c
+                JOIN reservations r ON c.id = r.customer_id
+                {where_clause}
+                GROUP BY c.id, c.name, c.email
+                ORDER BY total_spent DESC
+                LIMIT 10
+            ''', params)
+        else:
+            cur.execute('''
+                SELECT name, email, visit_count, fulfilled_visits, total_spent
+                FROM customers
+                WHERE visit_count > 0
+                ORDER BY total_spent DESC
+                LIMIT 10
+            ''')
         
         top_customers = cur.fetchall()
         
@@ -1402,17 +1993,113 @@ def get_dining_report():
             ]
         }
         
-        return jsonify(report)
-        
-    except Exception as e:
-        print(f"❌ Error generating dining report: {e}")
-        return jsonify({'error': 'Failed to generate report'}), 500
+        conn.commit()
+        return report
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
+        release_db_connection(conn)
+
+@app.route('/api/admin/reports/dining', methods=['GET'])
+@require_auth
+def get_dining_report():
+    """Get comprehensive dining report with revenue analytics"""
+    period = request.args.get('period', 'all')  # all, today, week, month, year
+    try:
+        start_date, end_date = dining_report_range(
+            period, request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError:
+        return jsonify({'error': 'Invalid start_date or end_date'}), 400
+    
+    # The resolved days are part of the key, so 'today' rolls over at midnight
+    try:
+        report = dining_report_cache.get_or_compute(
+            (period, start_date, end_date), start_date, end_date,
+            lambda: load_dining_report(period, start_date, end_date))
+    except Exception:
+        logger.exception('Error generating dining report')
+        return jsonify({'error': 'Failed to generate report'}), 500
+    
+    return jsonify(report)
+
+def load_store_sizes():
+    """Outbox backlog and notification feed size for the /metrics gauges"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        cur.execute('''
+            SELECT status, COUNT(*) FROM email_outbox
+            WHERE status IN ('pending', 'sending')
+            GROUP BY status
+        ''')
+        outbox = {'pending': 0, 'sending': 0, **dict(cur.fetchall())}
+        cur.execute('''
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE read = FALSE) FROM admin_notifications
+        ''')
+        total, unread = cur.fetchone()
+        cur.close()
+        conn.commit()
+        return {
+            'email_outbox': outbox,
+            'admin_notifications': {'read': total - unread, 'unread': unread}
+        }
+    except Exception:
+        conn.rollback()
+        logger.warning('Failed to read store sizes for metrics', exc_info=True)
+        return None
+    finally:
+        release_db_connection(conn)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@require_auth
+def list_profiles():
+    """Captured request profiles, newest first (every worker writes to PROFILE_DIR)"""
+    return jsonify({
+        'enabled': app_config.PROFILING_ENABLED,
+        'profiles': request_profiler.list()
+    })
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@require_auth
+def download_profile(profile_id):
+    """The .pstats file of one capture, or ?format=text for the top functions"""
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({'error': 'sort must be cumulative, tottime or calls'}), 400
+        report = request_profiler.report(profile_id, sort=sort)
+        if report is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return Response(report, mimetype='text/plain')
+
+    path = request_profiler.pstats_path(profile_id)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.pstats')
+
+@app.route('/api/admin/stats', methods=['GET'])
+@require_auth
+def get_cache_stats():
+    """Hit/miss counters for this worker's in-memory caches and connection pool"""
+    return jsonify({
+        'pid': os.getpid(),
+        'auth_tokens': token_cache.stats(),
+        'rate_limit': rate_limiter.stats(),
+        'query_tracer': query_tracer.stats(),
+        'profiler': request_profiler.stats(),
+        'dining_report_cache': dining_report_cache.stats(),
+        'upcoming_bookings': upcoming_bookings_flight.stats(),
+        'slot_index': slot_index.stats(),
+        'notification_streams': notification_broker.stats(),
+        'pool': get_pool().stats()
+    })
             
 if __name__ == '__main__':
-    print("🌐 Server starting on http://127.0.0.1:5000")
+    logger.info('Server starting on http://127.0.0.1:5000')
     app.run(debug=True)
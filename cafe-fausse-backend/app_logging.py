@@ -0,0 +1,142 @@
+"""
+Structured logging for Café Fausse Backend
+JSON log lines written by a background thread, tagged with the request id
+and scrubbed of customer contact details
+
+Request threads only put records on an in-memory queue (QueueHandler); a
+QueueListener thread formats and writes them, so a slow stdout never
+stalls a request. Fields passed with ``extra=`` become JSON keys.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import time
+import uuid
+
+from flask import request
+
+# Fields whose values are masked wherever they appear in a log record
+PII_FIELDS = {'email', 'customer_email', 'phone', 'customer_phone', 'name', 'customer_name'}
+
+_EMAIL = re.compile(r'[\w.+-]+@([\w-]+\.[\w.-]+)')
+_REQUEST_ID = re.compile(r'^[\w.-]{1,64}$')
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'request_id'}
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+
+
+def redact_text(text):
+    """Mask email addresses in free text, keeping the domain"""
+    return _EMAIL.sub(r'***@\1', text)
+
+
+def redact_value(key, value):
+    """Mask a PII field's value, recursing into dicts and lists"""
+    if isinstance(value, dict):
+        return {k: redact_value(k, v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact_value(key, v) for v in value]
+    if key in PII_FIELDS and value:
+        value = str(value)
+        if key.endswith('email'):
+            return redact_text(value) if '@' in value else '***'
+        if key.endswith('phone'):
+            return '***' + value[-2:]
+        return value[:1] + '***'
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id, extras"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': redact_text(record.getMessage()),
+            'pid': record.process,
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = redact_value(key, value)
+        if record.exc_text:
+            entry['exc'] = redact_text(record.exc_text)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _RequestQueueHandler(logging.handlers.QueueHandler):
+    """Stamps the request id and renders the message on the calling thread.
+
+    The request id lives in a contextvar, so it has to be read here rather
+    than on the listener thread. Exceptions are rendered to text for the
+    same reason: tracebacks can't be formatted once the frames are gone.
+    """
+
+    def prepare(self, record):
+        record.request_id = _request_id.get()
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+_listener = None
+
+
+def setup_logging(level='INFO', stream=None):
+    """Route all logging through a queue to a JSON stdout writer (idempotent per process)"""
+    global _listener
+    if _listener is not None and _listener.pid == os.getpid():
+        return
+
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_RequestQueueHandler(log_queue))
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.pid = os.getpid()
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def init_app(app):
+    """Give every request an id (from X-Request-ID if the client sent a sane one) and echo it back"""
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get('X-Request-ID', '')
+        _request_id.set(incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex)
+
+    @app.after_request
+    def echo_request_id(response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
+
+    @app.teardown_request
+    def clear_request_id(error=None):
+        _request_id.set(None)
@@ -0,0 +1,411 @@
+"""
+Micro-benchmark: email rendering before and after template precompilation
+
+Compares the original f-string builders from send_booking_confirmation and
+send_admin_notification with the precompiled templates in email_templates,
+both for rendering alone and for producing the complete message bytes that
+go over SMTP (MIMEMultipart + flattening before, build_message after).
+
+    python benchmarks/bench_email_templates.py [--iterations 20000]
+"""
+import argparse
+import io
+import os
+import sys
+import timeit
+from email.generator import BytesGenerator
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_templates import EmailTemplate  # noqa: E402
+
+CAFE_NAME = 'Café Fausse'
+CAFE_PHONE = '(202) 555-4567'
+CAFE_ADDRESS = '123 Quantum Street, Digital District'
+EMAIL_ADDRESS = 'reservations@cafefausse.com'
+
+BOOKING_DETAILS = {
+    'reservation_id': 1042,
+    'customer_id': 311,
+    'table_number': 17,
+    'guests': 4,
+    'formatted_datetime': 'Friday, November 20, 2026 at 07:00 PM',
+    'special_requests': 'Window seat please &amp; a high chair',
+}
+CUSTOMER_DETAILS = {
+    'name': 'Ada Lovelace',
+    'email': 'ada@example.com',
+    'phone': '(202) 555-0199',
+}
+
+
+def legacy_booking_confirmation(customer_name, booking_details):
+    """The original per-call f-string rendering"""
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            .container {{
+                max-width: 600px;
+                margin: 0 auto;
+                font-family: Arial, sans-serif;
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                color: white;
+                border-radius: 15px;
+                padding: 30px;
+            }}
+            .header {{
+                text-align: center;
+                margin-bottom: 30px;
+            }}
+            .logo {{
+                font-size: 2.5em;
+                margin-bottom: 10px;
+            }}
+            .details-box {{
+                background: rgba(255, 255, 255, 0.1);
+                border-radius: 10px;
+                padding: 20px;
+                margin: 20px 0;
+                border-left: 5px solid #ffd700;
+            }}
+            .detail-item {{
+                margin: 10px 0;
+                display: flex;
+                justify-content: space-between;
+                align-items: center;
+            }}
+            .label {{
+                color: #ffd700;
+                font-weight: bold;
+            }}
+            .value {{
+                color: white;
+            }}
+            .special-requests {{
+                background: rgba(255, 215, 0, 0.1);
+                border-radius: 8px;
+                padding: 15px;
+                margin: 15px 0;
+                border-left: 3px solid #ffd700;
+            }}
+            .footer {{
+                text-align: center;
+                margin-top: 30px;
+                color: rgba(255, 255, 255, 0.8);
+            }}
+            .contact-info {{
+                background: rgba(255, 255, 255, 0.05);
+                border-radius: 8px;
+                padding: 15px;
+                margin-top: 20px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <div class="logo">🍰 {CAFE_NAME}</div>
+                <h2>Your Reservation is Confirmed!</h2>
+                <p>Dear {customer_name}, thank you for choosing our digital dining experience.</p>
+            </div>
+
+            <div class="details-box">
+                <h3 style="color: #ffd700; text-align: center; margin-bottom: 20px;">📋 Reservation Details</h3>
+                
+                <div class="detail-item">
+                    <span class="label">📅 Date & Time:</span>
+                    <span class="value">{booking_details['formatted_datetime']}</span>
+                </div>
+                
+                <div class="detail-item">
+                    <span class="label">🍽️ Table Number:</span>
+                    <span class="value">#{booking_details['table_number']}</span>
+                </div>
+                
+                <div class="detail-item">
+                    <span class="label">👥 Number of Guests:</span>
+                    <span class="value">{booking_details['guests']}</span>
+                </div>
+                
+                <div class="detail-item">
+                    <span class="label">🆔 Reservation ID:</span>
+                    <span class="value">#{booking_details['reservation_id']}</span>
+                </div>
+                
+                <div class="detail-item">
+                    <span class="label">👤 Customer ID:</span>
+                    <span class="value">#{booking_details['customer_id']}</span>
+                </div>
+            </div>
+
+            {f'''
+            <div class="special-requests">
+                <h4 style="color: #ffd700; margin: 0 0 10px 0;">📝 Special Requests</h4>
+                <p style="margin: 0; line-height: 1.5;">{booking_details['special_requests']}</p>
+            </div>
+            ''' if booking_details.get('special_requests') else ''}
+
+            <div class="contact-info">
+                <h4 style="color: #ffd700; margin: 0 0 10px 0;">📞 Contact Information</h4>
+                <p style="margin: 5px 0;"><strong>Phone:</strong> {CAFE_PHONE}</p>
+                <p style="margin: 5px 0;"><strong>Address:</strong> {CAFE_ADDRESS}</p>
+                <p style="margin: 5px 0;"><strong>Email:</strong> {EMAIL_ADDRESS}</p>
+            </div>
+
+            <div class="footer">
+                <h4 style="color: #ffd700;">🎊 What to Expect</h4>
+                <p>• Please arrive 10 minutes before your reservation time</p>
+                <p>• Your table will be held for 15 minutes past reservation time</p>
+                <p>• Experience our quantum-inspired digital menu</p>
+                <p>• Enjoy our immersive cyber atmosphere</p>
+                
+                <p style="margin-top: 20px;">
+                    <strong>Need to modify or cancel?</strong><br>
+                    Call us at {CAFE_PHONE} at least 2 hours in advance.
+                </p>
+                
+                <p style="margin-top: 30px; color: rgba(255, 255, 255, 0.6);">
+                    Thank you for choosing {CAFE_NAME}!<br>
+                    We look forward to serving you.
+                </p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+    text_content = f"""
+    🍰 {CAFE_NAME} - Reservation Confirmed!
+    
+    Dear {customer_name},
+    
+    Your reservation has been confirmed! Here are the details:
+    
+    📋 RESERVATION DETAILS:
+    📅 Date & Time: {booking_details['formatted_datetime']}
+    🍽️ Table Number: #{booking_details['table_number']}
+    👥 Number of Guests: {booking_details['guests']}
+    🆔 Reservation ID: #{booking_details['reservation_id']}
+    👤 Customer ID: #{booking_details['customer_id']}
+    
+    {f"📝 Special Requests: {booking_details['special_requests']}" if booking_details.get('special_requests') else ''}
+    
+    📞 CONTACT INFORMATION:
+    Phone: {CAFE_PHONE}
+    Address: {CAFE_ADDRESS}
+    Email: {EMAIL_ADDRESS}
+    
+    🎊 WHAT TO EXPECT:
+    • Please arrive 10 minutes before your reservation time
+    • Your table will be held for 15 minutes past reservation time
+    • Experience our quantum-inspired digital menu
+    • Enjoy our immersive cyber atmosphere
+    
+    Need to modify or cancel? Call us at {CAFE_PHONE} at least 2 hours in advance.
+    
+    Thank you for choosing {CAFE_NAME}!
+    We look forward to serving you.
+    """
+
+    return text_content, html_content
+
+
+def legacy_admin_notification(booking_details, customer_details):
+    """The original per-call f-string rendering"""
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; background: #f5f5f5; padding: 20px; }}
+            .container {{ max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; padding: 30px; box-shadow: 0 4px 15px rgba(0,0,0,0.1); }}
+            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; margin-bottom: 20px; }}
+            .alert {{ background: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; border-radius: 5px; }}
+            .details {{ background: #f8f9fa; padding: 20px; border-radius: 8px; margin: 15px 0; }}
+            .detail-row {{ padding: 10px 0; border-bottom: 1px solid #e0e0e0; }}
+            .detail-row:last-child {{ border-bottom: none; }}
+            .label {{ font-weight: bold; color: #764ba2; min-width: 150px; display: inline-block; }}
+            .value {{ color: #333; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1 style="margin: 0;">🔔 New Reservation Alert</h1>
+                <p style="margin: 10px 0 0 0;">A new reservation has been made</p>
+            </div>
+
+            <div class="alert">
+                <strong>⏰ Action Required:</strong> New reservation needs your attention
+            </div>
+
+            <div class="details">
+                <h3 style="margin-top: 0; color: #764ba2;">👤 Customer Information</h3>
+                <div class="detail-row">
+                    <span class="label">Name:</span>
+                    <span class="value">{customer_details['name']}</span>
+                </div>
+                <div class="detail-row">
+                    <span class="label">Email:</span>
+                    <span class="value">{customer_details['email']}</span>
+                </div>
+                <div class="detail-row">
+                    <span class="label">Phone:</span>
+                    <span class="value">{customer_details.get('phone', 'Not provided')}</span>
+                </div>
+            </div>
+
+            <div class="details">
+                <h3 style="margin-top: 0; color: #764ba2;">📋 Reservation Details</h3>
+                <div class="detail-row">
+                    <span class="label">📅 Date & Time:</span>
+                    <span class="value">{booking_details['formatted_datetime']}</span>
+                </div>
+                <div class="detail-row">
+                    <span class="label">🍽️ Table Number:</span>
+                    <span class="value">#{booking_details['table_number']}</span>
+                </div>
+                <div class="detail-row">
+                    <span class="label">👥 Guests:</span>
+                    <span class="value">{booking_details['guests']}</span>
+                </div>
+                <div class="detail-row">
+                    <span class="label">🆔 Reservation ID:</span>
+                    <span class="value">#{booking_details['reservation_id']}</span>
+                </div>
+                {f'''
+                <div class="detail-row">
+                    <span class="label">📝 Special Requests:</span>
+                    <span class="value">{booking_details['special_requests']}</span>
+                </div>
+                ''' if booking_details.get('special_requests') else ''}
+            </div>
+
+            <div style="text-align: center; margin-top: 30px; padding-top: 20px; border-top: 2px solid #e0e0e0;">
+                <p style="color: #666; margin: 0;">
+                    This is an automated notification from {CAFE_NAME}
+                </p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+    text_content = f"""
+    🔔 NEW RESERVATION ALERT - {CAFE_NAME}
+    
+    A new reservation has been made!
+    
+    CUSTOMER INFORMATION:
+    Name: {customer_details['name']}
+    Email: {customer_details['email']}
+    Phone: {customer_details.get('phone', 'Not provided')}
+    
+    RESERVATION DETAILS:
+    Date & Time: {booking_details['formatted_datetime']}
+    Table Number: #{booking_details['table_number']}
+    Guests: {booking_details['guests']}
+    Reservation ID: #{booking_details['reservation_id']}
+    {f"Special Requests: {booking_details['special_requests']}" if booking_details.get('special_requests') else ''}
+    
+    ---
+    This is an automated notification from {CAFE_NAME}
+    """
+
+    return text_content, html_content
+
+
+CONSTANTS = {
+    'cafe_name': CAFE_NAME,
+    'cafe_phone': CAFE_PHONE,
+    'cafe_address': CAFE_ADDRESS,
+    'cafe_email': EMAIL_ADDRESS,
+}
+CONFIRMATION = EmailTemplate('booking_confirmation', '🎉 Reservation Confirmed at {{cafe_name}}', CONSTANTS)
+ADMIN_NOTIFICATION = EmailTemplate('admin_notification', '🔔 New Reservation - {{cafe_name}}', CONSTANTS)
+
+
+def admin_context(booking_details, customer_details):
+    return {
+        **booking_details,
+        'customer_name': customer_details['name'],
+        'customer_email': customer_details['email'],
+        'customer_phone': customer_details.get('phone') or 'Not provided',
+    }
+
+
+def compiled_booking_confirmation(customer_name, booking_details):
+    return CONFIRMATION.render({**booking_details, 'customer_name': customer_name})
+
+
+def compiled_admin_notification(booking_details, customer_details):
+    return ADMIN_NOTIFICATION.render(admin_context(booking_details, customer_details))
+
+
+def legacy_message(subject, recipient, text_content, html_content):
+    """What send_message() used to build and flatten for every email"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = EMAIL_ADDRESS
+    msg['To'] = recipient
+    msg.attach(MIMEText(text_content, 'plain'))
+    msg.attach(MIMEText(html_content, 'html'))
+    out = io.BytesIO()
+    BytesGenerator(out, policy=msg.policy.clone(linesep='\r\n')).flatten(msg)
+    return out.getvalue()
+
+
+def legacy_confirmation_message(customer_name, booking_details):
+    text_content, html_content = legacy_booking_confirmation(customer_name, booking_details)
+    return legacy_message(f"🎉 Reservation Confirmed at {CAFE_NAME}", 'ada@example.com',
+                          text_content, html_content)
+
+
+def legacy_admin_message(booking_details, customer_details):
+    text_content, html_content = legacy_admin_notification(booking_details, customer_details)
+    return legacy_message(f"🔔 New Reservation - {CAFE_NAME}", 'admin@cafefausse.com',
+                          text_content, html_content)
+
+
+def compiled_confirmation_message(customer_name, booking_details):
+    return CONFIRMATION.build_message({**booking_details, 'customer_name': customer_name},
+                                      EMAIL_ADDRESS, 'ada@example.com')
+
+
+def compiled_admin_message(booking_details, customer_details):
+    return ADMIN_NOTIFICATION.build_message(admin_context(booking_details, customer_details),
+                                            EMAIL_ADDRESS, 'admin@cafefausse.com')
+
+
+def bench(label, func, args, iterations):
+    seconds = min(timeit.repeat(lambda: func(*args), number=iterations, repeat=5))
+    per_call_us = seconds / iterations * 1e6
+    print(f"{label:<48} {per_call_us:9.2f} µs")
+    return per_call_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    confirmation_args = ('Ada Lovelace', BOOKING_DETAILS)
+    admin_args = (BOOKING_DETAILS, CUSTOMER_DETAILS)
+    cases = [
+        ('confirmation render', legacy_booking_confirmation, compiled_booking_confirmation, confirmation_args),
+        ('confirmation message', legacy_confirmation_message, compiled_confirmation_message, confirmation_args),
+        ('admin render', legacy_admin_notification, compiled_admin_notification, admin_args),
+        ('admin message', legacy_admin_message, compiled_admin_message, admin_args),
+    ]
+    for name, legacy, compiled, call_args in cases:
+        before = bench(f"{name} (before)", legacy, call_args, args.iterations)
+        after = bench(f"{name} (after)", compiled, call_args, args.iterations)
+        print(f"{'':<48} {before / after:9.2f}x\n")
+
+
+if __name__ == '__main__':
+    main()
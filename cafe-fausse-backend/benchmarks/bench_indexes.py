@@ -0,0 +1,196 @@
+"""
+Benchmark: endpoint query latency with and without the managed index set
+
+Creates a scratch database, loads a synthetic history (2M reservations and
+200k customers by default), then times the queries behind each endpoint
+twice: with none of the indexes added from migration 3 on, and after
+migrate() has built them again (the UNIQUE (time_slot, table_number)
+index and every query index). Uses the
+DB_* / DATABASE_URL credentials from the environment, which need permission
+to create databases. The scratch database is dropped afterwards unless
+--keep is given.
+
+    python benchmarks/bench_indexes.py [--reservations 2000000] [--customers 200000] [--repeat 15]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_config  # noqa: E402
+import customer_stats  # noqa: E402
+import rollup  # noqa: E402
+from migrations import LATEST_VERSION, migrate  # noqa: E402
+
+TABLES = 30
+
+# Every index created by migrations 3 and later (3's is the unique constraint)
+FIRST_INDEX_MIGRATION = 3
+INDEXES = [
+    'reservations_customer_id_idx',             # 4
+    'reservations_fulfilled_at_idx',            # 4
+    'customers_newsletter_created_at_idx',      # 4
+    'reservations_time_slot_id_idx',            # 5
+    'customers_total_spent_idx',                # 8
+    'admin_notifications_read_created_at_idx',  # 9
+    'revoked_tokens_expires_at_idx',            # 10
+]
+
+
+def connect(database):
+    settings = get_config()
+    if settings.DATABASE_URL:
+        return psycopg2.connect(settings.DATABASE_URL, dbname=database)
+    return psycopg2.connect(
+        host=settings.DB_HOST, database=database, user=settings.DB_USER,
+        password=settings.DB_PASS, port=settings.DB_PORT
+    )
+
+
+def endpoint_queries(today):
+    """(label, sql, params) for the queries the endpoints run"""
+    slot = today + timedelta(hours=19)
+    return [
+        ('POST /api/reservations: booked tables in slot',
+         'SELECT table_number FROM reservations WHERE time_slot = %s', (slot,)),
+        ('GET /api/availability: one day',
+         '''SELECT time_slot, COUNT(*) FROM reservations
+            WHERE time_slot >= %s AND time_slot < %s GROUP BY time_slot''',
+         (today, today + timedelta(days=1))),
+        ('GET /api/admin/bookings/upcoming: next 7 days',
+         '''SELECT r.id, r.time_slot, r.table_number, c.name, c.email
+            FROM reservations r JOIN customers c ON r.customer_id = c.id
+            WHERE r.time_slot >= %s AND r.time_slot < %s ORDER BY r.time_slot''',
+         (today, today + timedelta(days=7))),
+        ('customer history: bookings by customer_id',
+         '''SELECT r.id, r.time_slot, r.status FROM reservations r
+            WHERE r.customer_id = %s ORDER BY r.time_slot DESC''', (4242,)),
+        ('GET /api/admin/reports/dining: recent fulfilled',
+         '''SELECT r.id, r.time_slot, r.fulfilled_at, r.revenue, c.name, c.email
+            FROM reservations r JOIN customers c ON r.customer_id = c.id
+            WHERE r.status = 'fulfilled' ORDER BY r.fulfilled_at DESC LIMIT 20''', ()),
+        ('GET /api/admin/bookings: first page by (time_slot, id)',
+         '''SELECT r.id, r.time_slot, r.table_number, c.name, c.email
+            FROM reservations r JOIN customers c ON r.customer_id = c.id
+            ORDER BY r.time_slot DESC, r.id DESC LIMIT 50''', ()),
+        ('GET /api/admin/reports/dining: top customers',
+         '''SELECT name, email, visit_count, fulfilled_visits, total_spent FROM customers
+            WHERE visit_count > 0 ORDER BY total_spent DESC LIMIT 10''', ()),
+        ('GET /api/admin/subscribers',
+         '''SELECT id, name, email, created_at FROM customers
+            WHERE newsletter = TRUE ORDER BY created_at DESC''', ()),
+    ]
+
+
+def load(cur, reservations, customers, today):
+    cur.execute('''
+        INSERT INTO customers (name, email, phone, newsletter, created_at)
+        SELECT 'Guest ' || i, 'guest' || i || '@example.com', '555-' || lpad(i::text, 7, '0'),
+               i %% 20 = 0, %s - i * interval '3 minutes'
+        FROM generate_series(1, %s) AS i
+    ''', (today, customers))
+
+    # TABLES bookings per 30-minute slot, ending two months from now
+    first_slot = today + timedelta(days=60) - timedelta(minutes=30 * (reservations // TABLES))
+    cur.execute('''
+        INSERT INTO reservations (customer_id, time_slot, table_number, guests, status,
+                                  fulfilled_at, revenue, created_at)
+        SELECT 1 + (i::bigint * 7919) %% %(customers)s, slot, i %% %(tables)s + 1, 1 + i %% 6,
+               CASE WHEN slot < %(today)s AND i %% 5 <> 0 THEN 'fulfilled' ELSE 'pending' END,
+               CASE WHEN slot < %(today)s AND i %% 5 <> 0 THEN slot + interval '2 hours' END,
+               CASE WHEN slot < %(today)s AND i %% 5 <> 0 THEN 20 + i %% 400 END,
+               slot - interval '3 days'
+        FROM generate_series(0, %(reservations)s - 1) AS i,
+             LATERAL (SELECT %(first_slot)s + (i / %(tables)s) * interval '30 minutes' AS slot) s
+    ''', {'customers': customers, 'tables': TABLES, 'today': today,
+          'reservations': reservations, 'first_slot': first_slot})
+
+
+def time_queries(cur, queries, repeat):
+    results = []
+    for label, sql, params in queries:
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        results.append(statistics.median(samples))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reservations', type=int, default=2_000_000)
+    parser.add_argument('--customers', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--database', default='cafe_fausse_index_bench')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+    args = parser.parse_args()
+
+    admin = connect('postgres')
+    admin.autocommit = True
+    admin.cursor().execute(f'DROP DATABASE IF EXISTS {args.database}')
+    admin.cursor().execute(f'CREATE DATABASE {args.database}')
+
+    conn = None
+    try:
+        conn = connect(args.database)
+        cur = conn.cursor()
+        migrate(conn)
+
+        # Start from the pre-index schema: no unique constraint, no query indexes
+        cur.execute('ALTER TABLE reservations DROP CONSTRAINT reservations_time_slot_table_number_key')
+        for name in INDEXES:
+            cur.execute(f'DROP INDEX {name}')
+        cur.execute('DELETE FROM schema_version WHERE version >= %s', (FIRST_INDEX_MIGRATION,))
+        conn.commit()
+
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        started = time.perf_counter()
+        load(cur, args.reservations, args.customers, today)
+        # Fill the rollup and customer stats now, so both timings see the same data
+        rollup.backfill(cur)
+        customer_stats.reconcile(cur)
+        conn.commit()
+        conn.autocommit = True
+        cur.execute('VACUUM ANALYZE')
+        conn.autocommit = False
+        print(f"Loaded {args.reservations:,} reservations and {args.customers:,} customers "
+              f"in {time.perf_counter() - started:.1f}s\n")
+
+        queries = endpoint_queries(today)
+        before = time_queries(cur, queries, args.repeat)
+        conn.commit()
+
+        started = time.perf_counter()
+        migrate(conn)
+        cur.execute('ANALYZE')
+        conn.commit()
+        print(f"Re-applied migrations {FIRST_INDEX_MIGRATION}-{LATEST_VERSION} (indexes, plus the rollup and "
+              f"customer stats backfills) in {time.perf_counter() - started:.1f}s\n")
+
+        after = time_queries(cur, queries, args.repeat)
+        conn.commit()
+
+        print(f"{'query (median ms)':<56} {'no index':>10} {'indexed':>10} {'speedup':>9}")
+        for (label, _, _), slow, fast in zip(queries, before, after):
+            print(f"{label:<56} {slow:10.2f} {fast:10.2f} {slow / fast:8.1f}x")
+    finally:
+        if conn is not None:
+            conn.close()
+        if not args.keep:
+            admin.cursor().execute(f'DROP DATABASE IF EXISTS {args.database}')
+        admin.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: per-request overhead of the rate limiter
+
+Times RateLimiter.check() on its own (one hot client, and many distinct
+clients), from several threads at once, and end to end on a Flask app with
+the same before_request hook, with the limiter off and on. No database is
+needed. Pass --redis-url to also time the shared Redis backend.
+
+    python benchmarks/bench_rate_limit.py [--checks 200000] [--threads 8] [--redis-url redis://localhost:6379/0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+from flask import Flask, jsonify, request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import MemoryBackend, RateLimiter, RedisBackend  # noqa: E402
+
+# High enough that nothing is limited: we measure the bookkeeping, not 429s
+PER_MINUTE = 10 ** 9
+BURST = 10 ** 9
+
+
+def time_checks(limiter, checks, clients, threads):
+    """Return the mean microseconds per check with ``threads`` threads checking at once"""
+    per_thread = checks // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def run(offset):
+        barrier.wait()
+        for i in range(per_thread):
+            limiter.check(f'10.0.{(offset + i) % clients // 256}.{(offset + i) % 256}', 'create_reservation')
+
+    workers = [threading.Thread(target=run, args=(n * 7919,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    barrier.wait()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (per_thread * threads) * 1e6
+
+
+def build_app(limiter, enabled):
+    app = Flask(__name__)
+
+    @app.before_request
+    def enforce_rate_limit():
+        if not enabled or request.endpoint != 'create_reservation':
+            return None
+        allowed, retry_after = limiter.check(request.remote_addr, request.endpoint)
+        if allowed:
+            return None
+        response = jsonify({'error': 'Too many requests'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
+    @app.route('/api/reservations', methods=['POST'])
+    def create_reservation():
+        return jsonify({'success': True})
+
+    return app
+
+
+def time_requests(app, requests, repeat=5):
+    client = app.test_client()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.post('/api/reservations', json={})
+        samples.append((time.perf_counter() - started) / requests * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--checks', type=int, default=200_000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--redis-url', help='Also benchmark the Redis backend')
+    args = parser.parse_args()
+
+    backends = [('memory', MemoryBackend)]
+    if args.redis_url:
+        backends.append(('redis', lambda: RedisBackend(args.redis_url, prefix='ratelimit-bench:')))
+
+    print(f"{'RateLimiter.check (mean us)':<44} {'1 thread':>10} {f'{args.threads} threads':>11}")
+    for name, make_backend in backends:
+        checks = args.checks if name == 'memory' else args.checks // 20
+        for clients in (1, 10_000):
+            limiter = RateLimiter(make_backend(), per_minute=PER_MINUTE, burst=BURST)
+            single = time_checks(limiter, checks, clients, 1)
+            threaded = time_checks(limiter, checks, clients, args.threads)
+            label = f'{name}, {clients:,} client{"s" if clients > 1 else ""}'
+            print(f"{label:<44} {single:10.2f} {threaded:11.2f}")
+
+    limiter = RateLimiter(MemoryBackend(), per_minute=PER_MINUTE, burst=BURST)
+    off = time_requests(build_app(limiter, False), args.requests)
+    on = time_requests(build_app(limiter, True), args.requests)
+    print(f"\nFlask request, limiter off: {off:.1f} us, on: {on:.1f} us "
+          f"(+{on - off:.1f} us, {(on - off) / off * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,527 @@
+"""
+Load test: replay a realistic traffic mix against the whole backend
+
+`run` creates a scratch database, migrates it and seeds --history-days of
+past bookings, starts the app under gunicorn on a free local port (as the
+Procfile does), and replays a schedule built from --seed, so two runs send
+the same requests in the same order:
+
+- bursts of reservations on a few popular Friday/Saturday evening slots;
+- availability lookups;
+- newsletter signups;
+- admin dashboard polling of bookings, upcoming bookings, notifications
+  and dining reports.
+
+Results per endpoint (throughput, p50/p95/p99 latency, error rate and
+status counts) are written as JSON. A full slot's 400/409 counts as an
+answer, not an error. Uses the DB_* / DATABASE_URL credentials from the
+environment, which need permission to create databases. The scratch
+database and server log are removed afterwards unless --keep is given;
+with --url an already running server (and its database) is used instead.
+
+`compare` reads two such files and flags endpoints that got slower, slower
+to serve, or more error-prone by more than the thresholds; it exits with 1
+when it finds a regression.
+
+    python benchmarks/loadtest.py run [--requests 5000] [--concurrency 16] [--output run.json]
+    python benchmarks/loadtest.py compare baseline.json candidate.json [--threshold 10]
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import queue
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import psycopg2
+from psycopg2.extensions import make_dsn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from config import get_config  # noqa: E402
+
+# Endpoint label -> statuses that are a correct answer rather than an error
+EXPECTED_REJECTIONS = {
+    'POST /api/reservations': {400, 409},    # fully booked / in high demand
+}
+
+# Scenario -> relative weight in the schedule (a reservation burst counts once)
+SCENARIOS = {
+    'reservation_burst': 3,
+    'availability': 20,
+    'newsletter': 8,
+    'admin_bookings': 12,
+    'admin_upcoming': 12,
+    'admin_notifications': 15,
+    'admin_report': 6,
+}
+
+def connect(database):
+    settings = get_config()
+    if settings.DATABASE_URL:
+        return psycopg2.connect(settings.DATABASE_URL, dbname=database)
+    return psycopg2.connect(
+        host=settings.DB_HOST, database=database, user=settings.DB_USER,
+        password=settings.DB_PASS, port=settings.DB_PORT
+    )
+
+
+def seed(conn, history_days, customers, today):
+    """Customers plus half-full evenings from ``history_days`` ago to two weeks ahead"""
+    from migrations import migrate
+    import customer_stats
+    import rollup
+
+    migrate(conn)
+    tables = get_config().TOTAL_TABLES
+    cur = conn.cursor()
+    cur.execute('''
+        INSERT INTO customers (name, email, phone, newsletter, created_at)
+        SELECT 'Guest ' || i, 'guest' || i || '@example.com', '555-' || lpad(i::text, 7, '0'),
+               i %% 4 = 0, %s - i * interval '17 minutes'
+        FROM generate_series(1, %s) AS i
+    ''', (today, customers))
+    cur.execute('''
+        INSERT INTO reservations (customer_id, time_slot, table_number, guests, status,
+                                  fulfilled_at, revenue, created_at)
+        SELECT 1 + (n::bigint * 7919) %% %(customers)s, slot, t, 1 + n %% 6,
+               CASE WHEN slot < %(today)s AND n %% 5 <> 0 THEN 'fulfilled' ELSE 'pending' END,
+               CASE WHEN slot < %(today)s AND n %% 5 <> 0 THEN slot + interval '2 hours' END,
+               CASE WHEN slot < %(today)s AND n %% 5 <> 0 THEN 20 + n %% 400 END,
+               slot - interval '3 days'
+        FROM generate_series(-%(history_days)s, 13) AS d,
+             generate_series(0, 9) AS s,
+             generate_series(1, %(tables)s) AS t,
+             LATERAL (SELECT %(today)s + d * interval '1 day' + interval '17 hours'
+                             + s * interval '30 minutes' AS slot,
+                             (d + 1000) * 1000 + s * 100 + t AS n) k
+        WHERE (d * 31 + s * 7 + t * 13) %% 10 < 5
+    ''', {'customers': customers, 'today': today, 'history_days': history_days, 'tables': tables})
+    reservations = cur.rowcount
+    rollup.backfill(cur)
+    customer_stats.reconcile(cur)
+    conn.commit()
+    conn.autocommit = True
+    cur.execute('VACUUM ANALYZE')
+    conn.autocommit = False
+    return reservations
+
+
+def build_schedule(count, seed, burst_size, today):
+    """(label, method, path, body, admin) tuples; the same for the same arguments"""
+    rng = random.Random(seed)
+    # Three weeks out, so seeded bookings never fill them in advance
+    weekends = [today + timedelta(days=d) for d in range(21, 49) if (today + timedelta(days=d)).weekday() in (4, 5)]
+    popular = [day.replace(hour=hour, minute=minute) for day in weekends[:4] for hour, minute in ((19, 0), (19, 30))]
+    days_ahead = [today + timedelta(days=d) for d in range(0, 42)]
+    names, weights = zip(*SCENARIOS.items())
+
+    schedule = []
+    guest = 0
+    while len(schedule) < count:
+        scenario = rng.choices(names, weights)[0]
+        if scenario == 'reservation_burst':
+            slot = rng.choice(popular)
+            for _ in range(burst_size):
+                guest += 1
+                schedule.append(('POST /api/reservations', 'POST', '/api/reservations', {
+                    'name': f'Load Guest {guest}',
+                    'email': f'load-{seed}-{guest}@example.com',
+                    'phone': f'555-{guest:07d}',
+                    'time_slot': slot.isoformat(),
+                    'guests': rng.randint(1, 6),
+                }, False))
+        elif scenario == 'availability':
+            day = rng.choice(days_ahead)
+            schedule.append(('GET /api/availability', 'GET', f'/api/availability?date={day:%Y-%m-%d}', None, False))
+        elif scenario == 'newsletter':
+            guest += 1
+            schedule.append(('POST /api/newsletter', 'POST', '/api/newsletter',
+                             {'email': f'news-{seed}-{guest}@example.com'}, False))
+        elif scenario == 'admin_bookings':
+            schedule.append(('GET /api/admin/bookings', 'GET', '/api/admin/bookings?limit=50', None, True))
+        elif scenario == 'admin_upcoming':
+            schedule.append(('GET /api/admin/bookings/upcoming', 'GET', '/api/admin/bookings/upcoming', None, True))
+        elif scenario == 'admin_notifications':
+            schedule.append(('GET /api/admin/notifications', 'GET', '/api/admin/notifications', None, True))
+        else:
+            period = rng.choice(['week', 'month', 'year'])
+            schedule.append(('GET /api/admin/reports/dining', 'GET',
+                             f'/api/admin/reports/dining?period={period}', None, True))
+    return schedule[:count]
+
+
+class Client:
+    """One keep-alive HTTP connection, reopened after errors"""
+
+    def __init__(self, url, token):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.token = token
+        self.conn = None
+
+    def send(self, method, path, body, admin):
+        headers = {'Content-Type': 'application/json'}
+        if admin:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = json.dumps(body) if body is not None else None
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def admin_token(url, username, password):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    conn.request('POST', '/api/admin/login', body=json.dumps({'username': username, 'password': password}),
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    body = json.loads(response.read() or b'{}')
+    conn.close()
+    if response.status != 200 or 'token' not in body:
+        raise RuntimeError(f'admin login failed ({response.status}): {body}')
+    return body['token']
+
+
+def replay(url, token, schedule, concurrency, warmup):
+    """Send the schedule from ``concurrency`` threads; returns (samples, measured seconds)"""
+    work = queue.Queue()
+    for index, item in enumerate(schedule):
+        work.put((index, item))
+    samples = []           # (label, status or None, seconds) for the measured part
+    lock = threading.Lock()
+    measuring = threading.Event()
+    window = {}
+
+    def worker():
+        client = Client(url, token)
+        while True:
+            try:
+                index, (label, method, path, body, admin) = work.get_nowait()
+            except queue.Empty:
+                break
+            if index == warmup and not measuring.is_set():
+                window['start'] = time.perf_counter()
+                measuring.set()
+            started = time.perf_counter()
+            try:
+                status = client.send(method, path, body, admin)
+            except (OSError, http.client.HTTPException):
+                status = None
+            elapsed = time.perf_counter() - started
+            if index >= warmup:
+                with lock:
+                    samples.append((label, status, elapsed))
+        client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - window.get('start', time.perf_counter())
+    return samples, duration
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples, duration, label=None):
+    latencies = sorted(seconds * 1000 for _, _, seconds in samples)
+    statuses = {}
+    errors = 0
+    for sample_label, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status is None or not (200 <= status < 300 or status in EXPECTED_REJECTIONS.get(sample_label, ())):
+            errors += 1
+    count = len(samples)
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'throughput_rps': round(count / duration, 2) if duration else None,
+        'statuses': dict(sorted(statuses.items())),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2) if latencies else None,
+            'p95': round(percentile(latencies, 95), 2) if latencies else None,
+            'p99': round(percentile(latencies, 99), 2) if latencies else None,
+            'mean': round(sum(latencies) / count, 2) if count else None,
+            'max': round(latencies[-1], 2) if latencies else None,
+        },
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database, workers, threads, scratch_dir):
+    """Run the app under gunicorn against ``database``; returns (process, url, log path)"""
+    settings = get_config()
+    env = dict(os.environ)
+    if settings.DATABASE_URL:
+        env['DATABASE_URL'] = make_dsn(settings.DATABASE_URL, dbname=database)
+    env['DB_NAME'] = database
+    env['EMAIL_OUTBOX_WORKERS'] = '0'            # queue emails, never send them
+    env['RATE_LIMIT_ENABLED'] = 'False'          # every request comes from one address
+    env['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(scratch_dir, 'metrics')
+    env['PROFILE_DIR'] = os.path.join(scratch_dir, 'profiles')
+
+    port = free_port()
+    log_path = os.path.join(scratch_dir, 'server.log')
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--timeout', '60'],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    log.close()
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/db-status')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process, url, log_path
+            conn.close()
+        except OSError:
+            pass
+        time.sleep(0.25)
+    stop_server(process)
+    with open(log_path) as f:
+        tail = f.read()[-2000:]
+    raise RuntimeError(f'server did not become ready; last log lines:\n{tail}')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    settings = get_config()
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    schedule = build_schedule(args.requests + args.warmup, args.seed, args.burst_size, today)
+
+    admin = process = None
+    scratch_dir = tempfile.mkdtemp(prefix='cafe-fausse-loadtest-')
+    meta = {
+        'started_at': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'burst_size': args.burst_size,
+    }
+    try:
+        url = args.url
+        if url:
+            meta['url'] = url
+        else:
+            admin = connect('postgres')
+            admin.autocommit = True
+            admin.cursor().execute(f'DROP DATABASE IF EXISTS {args.database}')
+            admin.cursor().execute(f'CREATE DATABASE {args.database}')
+            conn = connect(args.database)
+            try:
+                started = time.perf_counter()
+                reservations = seed(conn, args.history_days, args.customers, today)
+            finally:
+                conn.close()
+            print(f"Seeded {reservations:,} reservations and {args.customers:,} customers "
+                  f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+            process, url, log_path = start_server(args.database, args.workers, args.threads, scratch_dir)
+            print(f"Server ready at {url} (log: {log_path})", file=sys.stderr)
+            meta.update({'server': 'gunicorn', 'workers': args.workers, 'threads': args.threads,
+                         'history_days': args.history_days, 'customers': args.customers})
+
+        token = admin_token(url, args.admin_user, args.admin_password or settings.ADMIN_PASSWORD)
+        print(f"Replaying {len(schedule):,} requests ({args.warmup} warm-up) "
+              f"from {args.concurrency} clients...", file=sys.stderr)
+        samples, duration = replay(url, token, schedule, args.concurrency, args.warmup)
+    finally:
+        if process is not None:
+            stop_server(process)
+        if admin is not None:
+            if not args.keep:
+                admin.cursor().execute(f'DROP DATABASE IF EXISTS {args.database}')
+            admin.close()
+        if not args.keep:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    by_label = {}
+    for sample in samples:
+        by_label.setdefault(sample[0], []).append(sample)
+    meta['duration_s'] = round(duration, 3)
+    report = {
+        'meta': meta,
+        'total': summarize(samples, duration),
+        'endpoints': {label: summarize(group, duration) for label, group in sorted(by_label.items())},
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print_report(report)
+    else:
+        print(output)
+    return 1 if report['total']['errors'] else 0
+
+
+def print_report(report):
+    print(f"{'endpoint':<36} {'req':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>6}", file=sys.stderr)
+    rows = list(report['endpoints'].items()) + [('total', report['total'])]
+    for label, stats in rows:
+        latency = stats['latency_ms']
+        print(f"{label:<36} {stats['requests']:>6} {stats['throughput_rps']:>8} {latency['p50']:>8} "
+              f"{latency['p95']:>8} {latency['p99']:>8} {stats['error_rate'] * 100:>6.2f}", file=sys.stderr)
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    settings = ('requests', 'concurrency', 'seed', 'burst_size', 'workers', 'threads', 'history_days', 'url')
+    differing = [key for key in settings if baseline['meta'].get(key) != candidate['meta'].get(key)]
+    if differing:
+        print(f"⚠️ The runs used different settings ({', '.join(differing)}); "
+              f"the comparison measures those too", file=sys.stderr)
+
+    threshold = args.threshold / 100
+    findings = []
+    rows = [('total', baseline['total'], candidate['total'])]
+    rows += [(label, stats, candidate['endpoints'][label])
+             for label, stats in baseline['endpoints'].items() if label in candidate['endpoints']]
+    for label, before, after in rows:
+        for key in ('p50', 'p95', 'p99'):
+            old, new = before['latency_ms'][key], after['latency_ms'][key]
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            findings.append({
+                'endpoint': label, 'metric': f'{key}_ms', 'baseline': old, 'candidate': new,
+                'change_pct': round(change * 100, 1),
+                'regression': change > threshold and new - old >= args.min_delta_ms,
+            })
+        old, new = before['throughput_rps'], after['throughput_rps']
+        if old and new is not None:
+            change = (new - old) / old
+            findings.append({
+                'endpoint': label, 'metric': 'throughput_rps', 'baseline': old, 'candidate': new,
+                'change_pct': round(change * 100, 1), 'regression': change < -threshold,
+            })
+        old, new = before['error_rate'], after['error_rate']
+        findings.append({
+            'endpoint': label, 'metric': 'error_rate', 'baseline': old, 'candidate': new,
+            'change_pct': None, 'regression': new - old > args.error_threshold / 100,
+        })
+
+    regressions = [finding for finding in findings if finding['regression']]
+    if args.json:
+        print(json.dumps({'threshold_pct': args.threshold, 'regressions': regressions, 'findings': findings}, indent=2))
+    else:
+        print(f"{'endpoint':<36} {'metric':<15} {'baseline':>10} {'candidate':>10} {'change':>8}")
+        for finding in findings:
+            change = '' if finding['change_pct'] is None else f"{finding['change_pct']:+.1f}%"
+            flag = '  ❌ regression' if finding['regression'] else ''
+            print(f"{finding['endpoint']:<36} {finding['metric']:<15} {finding['baseline']:>10} "
+                  f"{finding['candidate']:>10} {change:>8}{flag}")
+        print(f"\n{'❌' if regressions else '✅'} {len(regressions)} regression(s) "
+              f"beyond {args.threshold:g}% (latency also needs +{args.min_delta_ms:g}ms)")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = commands.add_parser('run', help='Replay the traffic mix and report per-endpoint stats')
+    replay_parser.add_argument('--requests', type=int, default=5000, help='Measured requests')
+    replay_parser.add_argument('--warmup', type=int, default=200, help='Requests sent first and not measured')
+    replay_parser.add_argument('--concurrency', type=int, default=16)
+    replay_parser.add_argument('--seed', type=int, default=1)
+    replay_parser.add_argument('--burst-size', type=int, default=12, help='Reservations per burst on one slot')
+    replay_parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    replay_parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    replay_parser.add_argument('--history-days', type=int, default=180)
+    replay_parser.add_argument('--customers', type=int, default=5000)
+    replay_parser.add_argument('--database', default='cafe_fausse_loadtest')
+    replay_parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+    replay_parser.add_argument('--url', help='Target a running server instead of starting one')
+    replay_parser.add_argument('--admin-user', default='admin')
+    replay_parser.add_argument('--admin-password', help='Defaults to ADMIN_PASSWORD')
+    replay_parser.add_argument('--output', help='Write the JSON report here (a table goes to stderr)')
+
+    compare_parser = commands.add_parser('compare', help='Flag regressions between two run reports')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=10,
+                                help='Percent change in latency or throughput counted as a regression')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                                help='Ignore latency changes smaller than this, however large in percent')
+    compare_parser.add_argument('--error-threshold', type=float, default=0.5,
+                                help='Error-rate increase (percentage points) counted as a regression')
+    compare_parser.add_argument('--json', action='store_true', help='Print the comparison as JSON')
+
+    args = parser.parse_args()
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Concurrency check: hundreds of parallel bookings for one time slot
+
+Starts the app on a local threaded server (or targets --url), fires
+--requests simultaneous POST /api/reservations for the same slot and then
+verifies in Postgres that no table was assigned twice and that exactly
+TOTAL_TABLES bookings succeeded. Uses the DB_* / DATABASE_URL settings from
+the environment, and deletes the bookings it made afterwards (recounting the
+daily rollup and customer stats they touched).
+
+    python benchmarks/stress_table_assignment.py [--requests 300] [--url http://127.0.0.1:8000]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Enough connections and senders that the pool, not the test, is never the bottleneck
+os.environ.setdefault('DB_POOL_MAX_SIZE', '16')
+os.environ.setdefault('EMAIL_OUTBOX_WORKERS', '0')
+# Every request comes from one address, so the per-IP limiter would answer most with 429
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'False')
+
+
+def post_reservation(url, index, time_slot, barrier):
+    body = json.dumps({
+        'name': f'Stress Guest {index}',
+        'email': f'stress-{index}@example.com',
+        'time_slot': time_slot,
+        'guests': 2,
+    }).encode()
+    req = urllib.request.Request(f'{url}/api/reservations', data=body,
+                                 headers={'Content-Type': 'application/json'})
+    barrier.wait()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def clear_slot(cur, time_slot):
+    """Delete every booking in the slot and recount the rollup cells and customers they counted in"""
+    import customer_stats
+    import rollup
+
+    cur.execute("DELETE FROM reservations WHERE time_slot = %s RETURNING time_slot, table_number, customer_id",
+                (time_slot,))
+    deleted = cur.fetchall()
+    for slot, table_number in {(slot, table_number) for slot, table_number, _ in deleted}:
+        rollup.refresh_cell(cur, slot, table_number)
+    for customer_id in sorted({customer_id for _, _, customer_id in deleted}):
+        customer_stats.refresh(cur, customer_id)
+
+
+def start_local_server():
+    from werkzeug.serving import make_server
+    import app as backend
+
+    server = make_server('127.0.0.1', 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--url', help='Target a running server instead of starting one')
+    parser.add_argument('--time-slot', default='2099-12-31T19:00:00')
+    args = parser.parse_args()
+
+    from config import get_config
+    from db import ConnectionPool
+    settings = get_config()
+    total_tables = settings.TOTAL_TABLES
+
+    server = None
+    url = args.url
+    if not url:
+        server, url = start_local_server()
+
+    pool = ConnectionPool(
+        dsn=settings.DATABASE_URL, min_size=1, max_size=1,
+        **({} if settings.DATABASE_URL else {
+            'host': settings.DB_HOST, 'database': settings.DB_NAME, 'user': settings.DB_USER,
+            'password': settings.DB_PASS, 'port': settings.DB_PORT,
+        })
+    )
+    conn = pool.getconn()
+    cur = conn.cursor()
+    clear_slot(cur, args.time_slot)
+    conn.commit()
+
+    barrier = threading.Barrier(args.requests)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.requests) as executor:
+        futures = [executor.submit(post_reservation, url, i, args.time_slot, barrier)
+                   for i in range(args.requests)]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in results)
+    assigned = Counter(body['reservation_details']['table_number']
+                       for status, body in results if status == 200)
+
+    cur.execute('''
+        SELECT table_number, COUNT(*) FROM reservations
+        WHERE time_slot = %s GROUP BY table_number HAVING COUNT(*) > 1
+    ''', (args.time_slot,))
+    duplicates = cur.fetchall()
+    cur.execute("SELECT COUNT(*) FROM reservations WHERE time_slot = %s", (args.time_slot,))
+    stored = cur.fetchone()[0]
+
+    clear_slot(cur, args.time_slot)
+    conn.commit()
+    pool.putconn(conn)
+    pool.closeall()
+    if server:
+        server.shutdown()
+
+    print(f"{args.requests} concurrent bookings in {elapsed:.2f}s: {dict(statuses)}")
+    print(f"stored reservations: {stored} (TOTAL_TABLES={total_tables})")
+
+    failures = []
+    if duplicates:
+        failures.append(f"tables assigned more than once in the database: {duplicates}")
+    if any(count > 1 for count in assigned.values()):
+        failures.append(f"tables handed out more than once: {[t for t, c in assigned.items() if c > 1]}")
+    if stored != min(total_tables, args.requests):
+        failures.append(f"expected {min(total_tables, args.requests)} bookings, found {stored}")
+    if set(statuses) - {200, 400}:
+        failures.append(f"unexpected statuses: {dict(statuses)}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ No double assignments")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@ Configuration management for Café Fausse Backend
 Handles environment variables and application settings
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,10 +24,20 @@ class Config:
     DB_USER = os.getenv('DB_USER', 'postgres')
     DB_PASS = os.getenv('DB_PASS', 'Pass123')
     DB_PORT = os.getenv('DB_PORT', '5432')
-    
+
+    # Connection pool (per gunicorn worker)
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '4'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+    DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+
     # JWT
     JWT_SECRET = os.getenv('JWT_SECRET', 'cafe-fausse-jwt-secret-change-in-production')
     JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', '24'))
+    # Verified tokens remembered per worker, and how many seconds one is
+    # trusted before the revocation list is checked again
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '1024'))
+    TOKEN_CACHE_REVALIDATE = float(os.getenv('TOKEN_CACHE_REVALIDATE', '60'))
     
     # Email
     SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -34,6 +45,16 @@ class Config:
     EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
     EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
     EMAIL_ENABLED = EMAIL_ADDRESS and EMAIL_PASSWORD
+    SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'True').lower() == 'true'
+    SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+    SMTP_POOL_IDLE_TIMEOUT = float(os.getenv('SMTP_POOL_IDLE_TIMEOUT', '60'))
+
+    # Email outbox (background delivery with retries)
+    EMAIL_OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', '2'))
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+    EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '5'))
+    EMAIL_OUTBOX_BACKOFF_BASE = float(os.getenv('EMAIL_OUTBOX_BACKOFF_BASE', '30'))
+    EMAIL_OUTBOX_BACKOFF_MAX = float(os.getenv('EMAIL_OUTBOX_BACKOFF_MAX', '3600'))
     
     # Café Information
     CAFE_NAME = os.getenv('CAFE_NAME', 'Café Fausse')
@@ -44,11 +65,32 @@ class Config:
     # Admin
     ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', EMAIL_ADDRESS)
     ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'CafeFausse2025!')
+    # Admin portal notifications kept in the database (older ones are pruned)
+    NOTIFICATION_HISTORY = int(os.getenv('NOTIFICATION_HISTORY', '100'))
+    # GET /api/admin/notifications/stream: open streams per worker (each holds a
+    # request thread), keepalive interval, lifetime and client reconnect delay
+    NOTIFICATION_STREAM_MAX = int(os.getenv('NOTIFICATION_STREAM_MAX', '2'))
+    NOTIFICATION_STREAM_HEARTBEAT = int(os.getenv('NOTIFICATION_STREAM_HEARTBEAT', '15'))
+    NOTIFICATION_STREAM_MAX_AGE = int(os.getenv('NOTIFICATION_STREAM_MAX_AGE', '300'))
+    NOTIFICATION_STREAM_RETRY_MS = int(os.getenv('NOTIFICATION_STREAM_RETRY_MS', '3000'))
+    # Seconds a stream ticket (POST /api/admin/notifications/stream-ticket) can be used to connect
+    NOTIFICATION_STREAM_TICKET_TTL = int(os.getenv('NOTIFICATION_STREAM_TICKET_TTL', '60'))
     
     # Reservations
     TOTAL_TABLES = int(os.getenv('TOTAL_TABLES', '30'))
     MAX_GUESTS_PER_RESERVATION = int(os.getenv('MAX_GUESTS_PER_RESERVATION', '10'))
     MIN_GUESTS_PER_RESERVATION = int(os.getenv('MIN_GUESTS_PER_RESERVATION', '1'))
+    # Seconds a worker trusts its cached table occupancy before re-reading a slot
+    SLOT_INDEX_TTL = float(os.getenv('SLOT_INDEX_TTL', '30'))
+    # Bookable slots each day (must match the times offered by ReservationsPage)
+    SERVICE_FIRST_SLOT = os.getenv('SERVICE_FIRST_SLOT', '17:00')
+    SERVICE_LAST_SLOT = os.getenv('SERVICE_LAST_SLOT', '22:30')
+    SLOT_INTERVAL_MINUTES = int(os.getenv('SLOT_INTERVAL_MINUTES', '30'))
+    # GET /api/availability: browser/CDN cache lifetime and widest date range
+    AVAILABILITY_CACHE_TTL = int(os.getenv('AVAILABILITY_CACHE_TTL', '15'))
+    AVAILABILITY_MAX_DAYS = int(os.getenv('AVAILABILITY_MAX_DAYS', '31'))
+    # Seconds a worker reuses a computed dining report (writes clear it sooner)
+    REPORT_CACHE_TTL = float(os.getenv('REPORT_CACHE_TTL', '60'))
     
     # CORS
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
@@ -61,10 +103,30 @@ class Config:
     # Rate Limiting
     RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', '60'))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '10'))
+    # redis://... to share buckets across workers; empty keeps them per worker
+    RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL', '')
+    # Reverse proxies in front of the app that append to X-Forwarded-For
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT') or '0')
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     
+    # Statements slower than this (ms) are logged; above EXPLAIN_SLOW_QUERY_MS
+    # (0 = never) SELECTs are re-run under EXPLAIN ANALYZE for the log
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '250'))
+    EXPLAIN_SLOW_QUERY_MS = float(os.getenv('EXPLAIN_SLOW_QUERY_MS', '0'))
+    
+    # Per-request profiling (admins send X-Profile: 1); captures are .pstats
+    # files shared by every worker on the host, the newest PROFILE_KEEP kept
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True').lower() == 'true'
+    PROFILE_DIR = os.getenv('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'cafe-fausse-profiles')
+    PROFILE_MAX_CONCURRENT = int(os.getenv('PROFILE_MAX_CONCURRENT', '1'))
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+    
+    # Metrics: when set, /metrics requires "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    
     @classmethod
     def validate(cls):
         """Validate required configuration"""
@@ -108,6 +170,9 @@ class ProductionConfig(Config):
     
     # Override with stricter settings
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', '30'))
+    # Railway and Heroku reach the app through one router; without this every
+    # client would share the router's address and its rate limit buckets
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT') or '1')
 
 
 class TestingConfig(Config):
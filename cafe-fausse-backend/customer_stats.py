@@ -0,0 +1,109 @@
+"""
+Per-customer lifetime stats for Café Fausse Backend
+Keeps visit_count, fulfilled_visits, total_spent and last_visit_at on the
+customers row so top-customer lists are an index-ordered LIMIT
+
+create_reservation bumps visit_count in its customer upsert; fulfilling or
+cancelling a booking recounts that customer. To find and repair drift in
+bulk (after manual SQL edits, restores, or bookings made by code that
+predates the counters):
+
+    python customer_stats.py reconcile [--batch-size 5000]
+"""
+import argparse
+import sys
+
+# Recount the customers whose id is in [%(first_id)s, %(last_id)s] and write
+# back only the rows that differ; returns one row per repaired customer
+_RECOUNT_SQL = '''
+    WITH actual AS (
+        SELECT c.id,
+               COALESCE(s.visits, 0) AS visits,
+               COALESCE(s.fulfilled, 0) AS fulfilled,
+               COALESCE(s.spent, 0) AS spent,
+               s.last_visit
+        FROM customers c
+        LEFT JOIN (
+            SELECT customer_id,
+                   COUNT(*) AS visits,
+                   COUNT(*) FILTER (WHERE status = 'fulfilled') AS fulfilled,
+                   SUM(revenue) FILTER (WHERE status = 'fulfilled') AS spent,
+                   MAX(time_slot) FILTER (WHERE status = 'fulfilled') AS last_visit
+            FROM reservations
+            WHERE customer_id BETWEEN %(first_id)s AND %(last_id)s
+            GROUP BY customer_id
+        ) s ON s.customer_id = c.id
+        WHERE c.id BETWEEN %(first_id)s AND %(last_id)s
+    )
+    UPDATE customers c
+    SET visit_count = a.visits,
+        fulfilled_visits = a.fulfilled,
+        total_spent = a.spent,
+        last_visit_at = a.last_visit
+    FROM actual a
+    WHERE c.id = a.id
+      AND (c.visit_count, c.fulfilled_visits, c.total_spent, c.last_visit_at)
+          IS DISTINCT FROM (a.visits, a.fulfilled, a.spent, a.last_visit)
+    RETURNING c.id
+'''
+
+
+def _recount(cur, first_id, last_id):
+    """Lock, then recount, the customers in [first_id, last_id]; returns how many changed.
+
+    Bookings upsert their customer row first, so taking the row locks before
+    counting waits out in-flight bookings, and the count (a new statement,
+    so a new snapshot) includes them.
+    """
+    params = {'first_id': first_id, 'last_id': last_id}
+    cur.execute('SELECT id FROM customers WHERE id BETWEEN %(first_id)s AND %(last_id)s FOR UPDATE', params)
+    cur.execute(_RECOUNT_SQL, params)
+    return cur.rowcount
+
+
+def refresh(cur, customer_id):
+    """Recount one customer after one of their reservations was fulfilled or cancelled"""
+    _recount(cur, customer_id, customer_id)
+
+
+def reconcile(cur, batch_size=5000, commit=None):
+    """Recount every customer in id batches; returns how many rows were repaired.
+
+    ``commit`` is called after each batch, so row locks are held only for
+    one batch at a time; without it everything runs in the caller's
+    transaction.
+    """
+    cur.execute('SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), -1) FROM customers')
+    first_id, max_id = cur.fetchone()
+    repaired = 0
+    while first_id <= max_id:
+        repaired += _recount(cur, first_id, first_id + batch_size - 1)
+        if commit:
+            commit()
+        first_id += batch_size
+    return repaired
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='customer_stats.py', description='Maintain customer lifetime stats')
+    commands = parser.add_subparsers(dest='command', required=True)
+    repair = commands.add_parser('reconcile', help='Recompute stats from reservations and fix drift')
+    repair.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    from migrations import connect
+    conn = connect()
+    try:
+        repaired = reconcile(conn.cursor(), args.batch_size, commit=conn.commit)
+        print(f"✅ Reconciled customer stats, {repaired} customers repaired")
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Reconcile failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
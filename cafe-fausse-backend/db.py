@@ -0,0 +1,345 @@
+"""
+Database connection pooling for Café Fausse Backend
+Keeps a bounded set of open PostgreSQL connections per worker process
+"""
+import os
+import queue
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+# Leading keywords reported by statement_operation(); anything else is OTHER
+_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'COPY', 'LOCK', 'CREATE', 'ALTER', 'DROP'}
+
+
+def statement_operation(query):
+    """The statement's leading keyword (SELECT, INSERT, ...) for grouping timings"""
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    if not isinstance(query, str):
+        return 'OTHER'
+    words = query[:100].split(None, 1)
+    operation = words[0].upper() if words else ''
+    return operation if operation in _OPERATIONS else 'OTHER'
+
+
+def timed_cursor_factory(*observers):
+    """Cursor class that reports every execute to ``observer(cursor, query, vars, seconds)``.
+
+    Pass it as ``cursor_factory`` when connecting; named (server-side)
+    cursors use it too. Observers run after the statement, whether or not
+    it succeeded, and must not raise.
+    """
+    class TimedCursor(extensions.cursor):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                elapsed = time.perf_counter() - started
+                for observe in observers:
+                    observe(self, query, vars, elapsed)
+
+        def executemany(self, query, vars_list):
+            started = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                elapsed = time.perf_counter() - started
+                for observe in observers:
+                    observe(self, query, vars_list, elapsed)
+
+    return TimedCursor
+
+
+class ConnectionPool:
+    """Thread-safe, fork-aware PostgreSQL connection pool.
+
+    Connections are opened lazily up to ``max_size`` and kept open between
+    requests. A connection that has been idle for longer than
+    ``healthcheck_interval`` seconds is pinged with ``SELECT 1`` before it is
+    handed out, and broken connections are replaced transparently.
+    """
+
+    def __init__(self, dsn=None, min_size=1, max_size=4, timeout=5.0,
+                 healthcheck_interval=30.0, **connect_kwargs):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+
+        self.dsn = dsn
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []          # list of (connection, last_used) pairs, LIFO
+        self._in_use = set()
+        self._opening = 0
+        self._closed = False
+
+        self._stats = {
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'checkouts': 0,
+            'checkout_waits': 0,
+            'checkout_timeouts': 0,
+            'healthcheck_failures': 0,
+        }
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        if self.dsn:
+            conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        else:
+            conn = psycopg2.connect(**self.connect_kwargs)
+        with self._lock:
+            self._stats['connections_created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._stats['connections_discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        """Check a connection before handing it out"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            with self._lock:
+                self._stats['healthcheck_failures'] += 1
+            return False
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        if os.getpid() != self._pid:
+            raise RuntimeError("ConnectionPool used across a fork; create a new pool in the child process")
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._available:
+            waited = False
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+
+                if len(self._in_use) + self._opening < self.max_size:
+                    # Reserve a slot, then connect outside the lock
+                    conn, last_used = None, None
+                    self._opening += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['checkout_timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available within {timeout}s")
+                if not waited:
+                    self._stats['checkout_waits'] += 1
+                    waited = True
+                self._available.wait(remaining)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._available:
+                if last_used is None:
+                    self._opening -= 1
+                self._available.notify()
+            raise
+
+        with self._available:
+            if last_used is None:
+                self._opening -= 1
+            self._in_use.add(conn)
+            self._stats['checkouts'] += 1
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool"""
+        if os.getpid() != self._pid:
+            # Never touch sockets inherited from the parent process
+            return
+
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        with self._available:
+            self._in_use.discard(conn)
+            close = close or conn.closed or self._closed
+            if not close:
+                self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+        if close:
+            self._discard(conn)
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Return a snapshot of pool usage counters"""
+        with self._lock:
+            return {
+                'pid': self._pid,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'opening': self._opening,
+                'size': len(self._idle) + len(self._in_use) + self._opening,
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_factory = None
+
+
+def configure_pool(factory):
+    """Register a callable that builds the pool for the current process"""
+    global _pool_factory
+    _pool_factory = factory
+
+
+def get_pool():
+    """Return this process's pool, creating it on first use.
+
+    The pool is created lazily, so under gunicorn every worker builds its own
+    pool after the fork instead of inheriting the master's sockets.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool._pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool._pid != os.getpid():
+            if _pool_factory is None:
+                raise RuntimeError("Connection pool has not been configured")
+            _pool = _pool_factory()
+        return _pool
+
+
+def reset_pool():
+    """Drop the current process's pool (e.g. after a fork)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool._pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
+
+class _CopyCancelled(Exception):
+    """Raised inside COPY when the consumer of stream_copy() went away"""
+
+
+class _QueueWriter:
+    """File-like sink for copy_expert that hands chunks to another thread"""
+
+    def __init__(self, chunks, cancelled):
+        self.chunks = chunks
+        self.cancelled = cancelled
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        while True:
+            if self.cancelled.is_set():
+                raise _CopyCancelled()
+            try:
+                self.chunks.put(data, timeout=0.5)
+                return len(data)
+            except queue.Full:
+                continue
+
+
+def stream_copy(conn, sql, max_chunks=64):
+    """Run ``COPY ... TO STDOUT`` and yield its output as byte chunks.
+
+    copy_expert() only writes into a file, so it runs in a helper thread
+    that feeds a bounded queue; memory use is capped at ``max_chunks``
+    chunks however large the result is. If the consumer stops early, the
+    COPY is aborted and the connection's transaction is left to be rolled
+    back when it is returned to the pool.
+    """
+    chunks = queue.Queue(maxsize=max_chunks)
+    cancelled = threading.Event()
+    done = object()
+    failure = []
+
+    def run():
+        cur = conn.cursor()
+        try:
+            cur.copy_expert(sql, _QueueWriter(chunks, cancelled))
+        except _CopyCancelled:
+            pass
+        except Exception as e:
+            failure.append(e)
+        finally:
+            cur.close()
+            while not cancelled.is_set():
+                try:
+                    chunks.put(done, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    worker = threading.Thread(target=run, name='copy-to-stdout', daemon=True)
+    worker.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is done:
+                break
+            yield chunk
+        if failure:
+            raise failure[0]
+    finally:
+        cancelled.set()
+        worker.join()
@@ -0,0 +1,191 @@
+"""
+Precompiled email templates for Café Fausse Backend
+Templates are parsed once at startup into static text plus named slots
+"""
+import base64
+import os
+import re
+import secrets
+from email.header import Header
+from email.utils import formatdate, make_msgid
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+
+_SECTION = re.compile(r'\{\{#(\w+)\}\}(.*?)\{\{/\1\}\}', re.S)
+_SLOT = re.compile(r'\{\{(\w+)\}\}')
+_BARE_AMPERSAND = re.compile(r'&(?!#?\w+;)')
+
+
+def escape_html(value):
+    """Escape a value for HTML without double-escaping existing entities.
+
+    Form input is already passed through sanitize_input(), which escapes it,
+    so entities such as ``&amp;`` must survive a second pass unchanged.
+    """
+    if value is None:
+        return ''
+    text = value if isinstance(value, str) else str(value)
+    if '&' in text or '<' in text or '>' in text or '"' in text:
+        return (_BARE_AMPERSAND.sub('&amp;', text)
+                .replace('<', '&lt;')
+                .replace('>', '&gt;')
+                .replace('"', '&quot;'))
+    return text
+
+
+def _encode_body(text):
+    """Base64-encode a MIME body in 76-character CRLF-terminated lines"""
+    return base64.encodebytes(text.encode('utf-8')).replace(b'\n', b'\r\n')
+
+
+def _plain(value):
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+
+class CompiledTemplate:
+    """A template split into a static shell and escaped dynamic slots.
+
+    ``{{name}}`` marks a slot filled from the render context, and
+    ``{{#name}}...{{/name}}`` marks a section that is rendered only when
+    ``context[name]`` is truthy. Names found in ``constants`` are substituted
+    once at compile time, so only per-message values cost anything at render.
+    """
+
+    def __init__(self, source, html=False, constants=None):
+        self.escaper = escape_html if html else _plain
+        constants = constants or {}
+
+        tokens = []
+        position = 0
+        for match in _SECTION.finditer(source):
+            tokens.extend(self._tokenize(source[position:match.start()], constants))
+            section = CompiledTemplate(match.group(2), html=html, constants=constants)
+            tokens.append((match.group(1), section))
+            position = match.end()
+        tokens.extend(self._tokenize(source[position:], constants))
+
+        # Merge adjacent static chunks, then generate a single f-string
+        # expression so rendering is one BUILD_STRING, like hand-written code
+        pieces = []
+        namespace = {'_esc': self.escaper}
+        for token in tokens:
+            if isinstance(token, str):
+                if pieces and isinstance(pieces[-1], str):
+                    pieces[-1] += token
+                else:
+                    pieces.append(token)
+            else:
+                pieces.append(token)
+
+        expression = []
+        slot_names = []
+        for i, piece in enumerate(pieces):
+            if isinstance(piece, str):
+                namespace[f'_s{i}'] = piece
+                expression.append(f'{{_s{i}}}')
+            else:
+                name, section = piece
+                slot_names.append(name)
+                if section is None:
+                    expression.append(f"{{_esc(_get('{name}'))}}")
+                else:
+                    namespace[f'_t{i}'] = section.render
+                    expression.append(f"{{_t{i}(context) if _get('{name}') else ''}}")
+
+        code = (
+            'def render(context):\n'
+            '    _get = context.get\n'
+            f'    return f"""{"".join(expression)}"""\n'
+        )
+        exec(compile(code, '<email template>', 'exec'), namespace)
+        self._render = namespace['render']
+        self.slot_names = tuple(slot_names)
+
+    def _tokenize(self, text, constants):
+        position = 0
+        for match in _SLOT.finditer(text):
+            name = match.group(1)
+            yield text[position:match.start()]
+            if name in constants:
+                yield self.escaper(constants[name])
+            else:
+                yield (name, None)
+            position = match.end()
+        yield text[position:]
+
+    def render(self, context):
+        """Fill the slots from ``context`` and return the finished text"""
+        return self._render(context)
+
+
+class EmailTemplate:
+    """Subject, plain-text and HTML templates for one kind of email.
+
+    ``build_message`` renders both MIME parts from one context dict and
+    assembles the multipart/alternative message directly as bytes, skipping
+    the email package's object model and generator.
+    """
+
+    def __init__(self, name, subject, constants=None, template_dir=TEMPLATE_DIR):
+        self.name = name
+        self.subject = CompiledTemplate(subject, constants=constants)
+        self.text = CompiledTemplate(self._load(template_dir, f'{name}.txt'), constants=constants)
+        self.html = CompiledTemplate(self._load(template_dir, f'{name}.html'), html=True, constants=constants)
+
+        # Subjects without slots are RFC 2047-encoded once, here
+        self._encoded_subject = None
+        if not self.subject.slot_names:
+            self._encoded_subject = self._encode_subject(self.subject.render({}))
+
+    @staticmethod
+    def _load(template_dir, filename):
+        with open(os.path.join(template_dir, filename), encoding='utf-8') as f:
+            return f.read()
+
+    @staticmethod
+    def _encode_subject(subject):
+        return Header(subject, 'utf-8').encode().encode('ascii')
+
+    @staticmethod
+    def _header_value(value):
+        if '\r' in value or '\n' in value:
+            raise ValueError("Email header values may not contain line breaks")
+        return value.encode('ascii')
+
+    def render(self, context):
+        """Return (subject, text, html) rendered from a single context dict"""
+        return (
+            self.subject.render(context),
+            self.text.render(context),
+            self.html.render(context),
+        )
+
+    def build_message(self, context, sender, recipient):
+        """Render and assemble a complete multipart/alternative message"""
+        subject = self._encoded_subject or self._encode_subject(self.subject.render(context))
+        boundary = f'==============={secrets.token_hex(12)}=='.encode('ascii')
+        return b''.join((
+            b'Content-Type: multipart/alternative; boundary="', boundary, b'"\r\n'
+            b'MIME-Version: 1.0\r\n'
+            b'Subject: ', subject, b'\r\n'
+            b'From: ', self._header_value(sender), b'\r\n'
+            b'To: ', self._header_value(recipient), b'\r\n'
+            b'Date: ', formatdate(localtime=True).encode('ascii'), b'\r\n'
+            b'Message-ID: ', make_msgid(domain=sender.rpartition('@')[2] or None).encode('ascii'), b'\r\n'
+            b'\r\n'
+            b'--', boundary, b'\r\n'
+            b'Content-Type: text/plain; charset="utf-8"\r\n'
+            b'MIME-Version: 1.0\r\n'
+            b'Content-Transfer-Encoding: base64\r\n'
+            b'\r\n',
+            _encode_body(self.text.render(context)),
+            b'\r\n--', boundary, b'\r\n'
+            b'Content-Type: text/html; charset="utf-8"\r\n'
+            b'MIME-Version: 1.0\r\n'
+            b'Content-Transfer-Encoding: base64\r\n'
+            b'\r\n',
+            _encode_body(self.html.render(context)),
+            b'\r\n--', boundary, b'--\r\n',
+        ))
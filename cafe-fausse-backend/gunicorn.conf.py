@@ -0,0 +1,25 @@
+"""
+Gunicorn settings for Café Fausse Backend
+Loaded automatically from the working directory; worker counts and the bind
+address stay on the command line (Procfile, railway.toml)
+
+Points prometheus_client at a shared directory so /metrics sums every
+worker (see metrics.py), starts each deploy with it empty, and drops a
+worker's live gauges when it exits.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'cafe-fausse-metrics'))
+
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
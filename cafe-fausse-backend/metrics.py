@@ -0,0 +1,130 @@
+"""
+Prometheus metrics for Café Fausse Backend
+Request, database and email timings, exposed at /metrics for every
+gunicorn worker at once
+
+Under gunicorn, gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR before the
+workers start: each worker then writes its samples to files there and a
+scrape of any worker reports the sum over all of them. Without it (flask
+run, scripts) metrics live in this process only.
+"""
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter,
+                               Histogram, generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+
+from db import statement_operation
+
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+# Bucket bounds in seconds
+REQUEST_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 5)
+WAIT_BUCKETS = (.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5)
+EMAIL_BUCKETS = (.1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+    'cafe_http_request_duration_seconds', 'Time to produce a response, by route',
+    ['method', 'route'], buckets=REQUEST_BUCKETS
+)
+REQUESTS = Counter(
+    'cafe_http_requests_total', 'Responses by route and status code',
+    ['method', 'route', 'status']
+)
+DB_QUERY_LATENCY = Histogram(
+    'cafe_db_query_duration_seconds', 'Statement execution time, by leading keyword',
+    ['operation'], buckets=QUERY_BUCKETS
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'cafe_db_pool_checkout_seconds', 'Time to check a connection out of the pool',
+    buckets=WAIT_BUCKETS
+)
+POOL_CHECKOUT_FAILURES = Counter(
+    'cafe_db_pool_checkout_failures_total', 'Checkouts that timed out or could not connect'
+)
+EMAIL_SEND_LATENCY = Histogram(
+    'cafe_email_send_duration_seconds', 'Outbox delivery time, by message kind and result',
+    ['kind', 'result'], buckets=EMAIL_BUCKETS
+)
+
+
+def observe_query(cursor, query, vars, seconds):
+    """Observer for db.timed_cursor_factory"""
+    DB_QUERY_LATENCY.labels(statement_operation(query)).observe(seconds)
+
+
+def timed_email_handler(kind, handler):
+    """Wrap an outbox handler so each delivery attempt is timed"""
+    def deliver(payload):
+        started = time.perf_counter()
+        result = 'error'
+        try:
+            handler(payload)
+            result = 'sent'
+        finally:
+            EMAIL_SEND_LATENCY.labels(kind, result).observe(time.perf_counter() - started)
+    return deliver
+
+
+class StoreSizeCollector:
+    """Gauges read from Postgres at scrape time (the same for every worker).
+
+    ``load()`` returns {'email_outbox': {status: count},
+    'admin_notifications': {'read': n, 'unread': n}}, or None if the
+    database is unavailable, in which case the gauges are left out.
+    """
+
+    def __init__(self, load):
+        self.load = load
+
+    def describe(self):
+        # Registering must not query the database
+        return []
+
+    def collect(self):
+        sizes = self.load()
+        if sizes is None:
+            return
+        outbox = GaugeMetricFamily('cafe_email_outbox_messages', 'Emails waiting in the outbox', labels=['status'])
+        for status, count in sorted(sizes['email_outbox'].items()):
+            outbox.add_metric([status], count)
+        yield outbox
+        stored = GaugeMetricFamily('cafe_admin_notifications', 'Notifications in the admin feed', labels=['state'])
+        for state, count in sorted(sizes['admin_notifications'].items()):
+            stored.add_metric([state], count)
+        yield stored
+
+
+def init_app(app, load_store_sizes, token=None):
+    """Time every request and serve /metrics (with a bearer ``token`` if given)"""
+    store_sizes = StoreSizeCollector(load_store_sizes)
+    if not MULTIPROCESS:
+        REGISTRY.register(store_sizes)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        if MULTIPROCESS:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(store_sizes)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
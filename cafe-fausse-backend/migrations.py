@@ -0,0 +1,429 @@
+"""
+Schema migrations for Café Fausse Backend
+Applies numbered schema changes once and records them in schema_version
+
+Run as part of each deploy:
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show applied and pending versions
+
+Workers also call migrate() at startup. When the schema is current this is a
+single SELECT. Otherwise a worker applies pending transactional migrations
+only if no other process holds the migration lock, and stops before any
+@concurrently one: CREATE INDEX CONCURRENTLY waits for every open snapshot,
+including those of workers still booting, so those run only from the deploy
+step above. The exception is a database with no customers or reservations
+yet, where a worker builds those indexes with a plain CREATE INDEX (instant
+on empty tables), so a fresh database comes up fully migrated without the
+deploy step.
+"""
+import logging
+import sys
+import time
+
+import psycopg2
+
+import customer_stats
+import rollup
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock(namespace, key); namespace 1 is used for time slot locks
+MIGRATION_LOCK_NAMESPACE = 2
+MIGRATION_LOCK_KEY = 0
+
+
+def baseline(cur):
+    """Tables and columns that create_tables() used to check for on every boot.
+
+    Uses IF NOT EXISTS throughout so databases created by any earlier version
+    of the app converge on the same schema.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100),
+            email VARCHAR(100) UNIQUE NOT NULL,
+            phone VARCHAR(20),
+            newsletter BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS reservations (
+            id SERIAL PRIMARY KEY,
+            customer_id INTEGER REFERENCES customers(id),
+            time_slot TIMESTAMP NOT NULL,
+            table_number INTEGER NOT NULL,
+            guests INTEGER NOT NULL,
+            special_requests TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        ALTER TABLE customers
+            ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ''')
+    cur.execute('''
+        ALTER TABLE reservations
+            ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS guests INTEGER NOT NULL DEFAULT 2,
+            ADD COLUMN IF NOT EXISTS special_requests TEXT,
+            ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'pending',
+            ADD COLUMN IF NOT EXISTS fulfilled_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS revenue DECIMAL(10, 2)
+    ''')
+
+
+def email_outbox(cur):
+    """Queue for background email delivery (see outbox.py)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            payload JSONB NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            locked_until TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS email_outbox_due_idx
+        ON email_outbox (next_attempt_at)
+        WHERE status IN ('pending', 'sending')
+    ''')
+
+
+def unique_table_per_slot(cur):
+    """A table can only be booked once per time slot.
+
+    Fails (and is retried on the next deploy) while double bookings exist.
+    """
+    cur.execute("SELECT 1 FROM pg_constraint WHERE conname = 'reservations_time_slot_table_number_key'")
+    if cur.fetchone():
+        return
+    cur.execute('''
+        SELECT time_slot, table_number FROM reservations
+        GROUP BY time_slot, table_number HAVING COUNT(*) > 1
+        LIMIT 5
+    ''')
+    duplicates = cur.fetchall()
+    if duplicates:
+        raise RuntimeError(
+            "Some tables are double-booked, resolve these (time_slot, table_number) "
+            f"pairs first: {duplicates}"
+        )
+    cur.execute('''
+        ALTER TABLE reservations
+        ADD CONSTRAINT reservations_time_slot_table_number_key UNIQUE (time_slot, table_number)
+    ''')
+
+
+def concurrently(apply):
+    """Mark a migration to run outside a transaction (for CREATE INDEX CONCURRENTLY)"""
+    apply.transactional = False
+    return apply
+
+
+def create_index_concurrently(cur, name, definition):
+    """CREATE INDEX CONCURRENTLY without blocking writes, replacing an invalid leftover.
+
+    An interrupted concurrent build leaves an INVALID index behind that
+    IF NOT EXISTS would silently keep, so that case is dropped and rebuilt.
+    Inside a transaction (migrate() on empty tables) it builds a plain index.
+    """
+    if not cur.connection.autocommit:
+        cur.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+        return
+    cur.execute('''
+        SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+    ''', (name,))
+    row = cur.fetchone()
+    if row and row[0]:
+        return
+    if row:
+        cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    cur.execute(f'CREATE INDEX CONCURRENTLY {name} ON {definition}')
+
+
+@concurrently
+def query_indexes(cur):
+    """Secondary indexes for the booking, report and subscriber queries.
+
+    Lookups and range scans on reservations.time_slot are already served by
+    the UNIQUE (time_slot, table_number) index from migration 3.
+    """
+    create_index_concurrently(cur, 'reservations_customer_id_idx',
+                              'reservations (customer_id)')
+    create_index_concurrently(cur, 'reservations_fulfilled_at_idx',
+                              "reservations (fulfilled_at DESC) WHERE status = 'fulfilled'")
+    create_index_concurrently(cur, 'customers_newsletter_created_at_idx',
+                              'customers (created_at DESC) WHERE newsletter = TRUE')
+
+
+@concurrently
+def booking_list_index(cur):
+    """Keyset pagination of /api/admin/bookings walks (time_slot, id)"""
+    create_index_concurrently(cur, 'reservations_time_slot_id_idx',
+                              'reservations (time_slot, id)')
+
+
+def daily_rollup(cur):
+    """Per-day, per-table booking totals for the dining report (see rollup.py)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day DATE NOT NULL,
+            table_number INTEGER NOT NULL,
+            reservations INTEGER NOT NULL DEFAULT 0,
+            fulfilled INTEGER NOT NULL DEFAULT 0,
+            cancelled INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            max_revenue NUMERIC(10, 2) NOT NULL DEFAULT 0,
+            guests INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, table_number)
+        )
+    ''')
+    rollup.backfill(cur)
+
+
+def customer_lifetime_stats(cur):
+    """Lifetime counters on customers, filled in from reservations (see customer_stats.py)"""
+    cur.execute('''
+        ALTER TABLE customers
+            ADD COLUMN IF NOT EXISTS visit_count INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS fulfilled_visits INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS total_spent NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS last_visit_at TIMESTAMP
+    ''')
+    customer_stats.reconcile(cur)
+
+
+@concurrently
+def customer_spend_index(cur):
+    """Top customers by lifetime spend are read straight off this index"""
+    create_index_concurrently(cur, 'customers_total_spent_idx',
+                              'customers (total_spent DESC)')
+
+
+def admin_notifications(cur):
+    """Notification feed shared by all workers (see notifications.py).
+
+    The feed is pruned to NOTIFICATION_HISTORY rows, so the unread count is a
+    bounded COUNT(*) off the (read, created_at) index rather than a counter row
+    every booking would have to lock.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS admin_notifications (
+            id BIGSERIAL PRIMARY KEY,
+            payload JSONB NOT NULL,
+            read BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS admin_notifications_read_created_at_idx
+        ON admin_notifications (read, created_at)
+    ''')
+
+
+def revoked_tokens(cur):
+    """Admin tokens revoked before their exp, by SHA-256 digest (see token_cache.py)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            token_digest BYTEA PRIMARY KEY,
+            expires_at TIMESTAMP NOT NULL,
+            revoked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at_idx ON revoked_tokens (expires_at)')
+
+
+# Ordered list of (version, description, apply). Never edit or renumber an
+# entry once it has shipped; add a new one instead.
+MIGRATIONS = [
+    (1, 'Customers and reservations tables', baseline),
+    (2, 'Email outbox', email_outbox),
+    (3, 'Unique (time_slot, table_number) on reservations', unique_table_per_slot),
+    (4, 'Indexes for customer joins, fulfilled reports and newsletter listing', query_indexes),
+    (5, 'Index for paging bookings by (time_slot, id)', booking_list_index),
+    (6, 'Daily revenue rollup', daily_rollup),
+    (7, 'Customer lifetime stats', customer_lifetime_stats),
+    (8, 'Index customers by total_spent', customer_spend_index),
+    (9, 'Admin notification feed', admin_notifications),
+    (10, 'Revoked admin tokens', revoked_tokens),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Highest applied migration, or 0 for a database that has never been migrated"""
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT MAX(version) FROM schema_version')
+        version = cur.fetchone()[0] or 0
+    except psycopg2.errors.UndefinedTable:
+        version = 0
+    finally:
+        cur.close()
+    conn.rollback()
+    return version
+
+
+def _tables_empty(cur):
+    """True if there is no customer or reservation data to index yet"""
+    cur.execute('SELECT NOT EXISTS (SELECT 1 FROM customers) AND NOT EXISTS (SELECT 1 FROM reservations)')
+    return cur.fetchone()[0]
+
+
+def _acquire_lock(conn, cur, wait, poll_interval):
+    """Take the session-level migration lock; returns False if busy and not waiting.
+
+    Polls pg_try_advisory_lock in autocommit mode rather than blocking in
+    pg_advisory_lock: a session blocked on the lock holds a snapshot, and a
+    concurrent index build being run by the lock holder would wait for it.
+    """
+    conn.autocommit = True
+    try:
+        while True:
+            cur.execute('SELECT pg_try_advisory_lock(%s, %s)', (MIGRATION_LOCK_NAMESPACE, MIGRATION_LOCK_KEY))
+            if cur.fetchone()[0]:
+                return True
+            if not wait:
+                return False
+            time.sleep(poll_interval)
+    finally:
+        conn.autocommit = False
+
+
+def migrate(conn, concurrent=True, wait=True, poll_interval=1.0):
+    """Apply pending migrations in order; returns the versions applied.
+
+    Each migration runs in its own transaction together with its
+    schema_version row, so a failure leaves the database at the last
+    migration that succeeded. Later migrations wait until it is fixed.
+    Migrations marked @concurrently run in autocommit mode instead and must
+    be safe to re-run; with ``concurrent=False`` migrating stops before the
+    first of them, unless the tables are still empty, in which case they run
+    in a transaction like the rest. With ``wait=False`` nothing is applied
+    if another process is migrating.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    cur = conn.cursor()
+    try:
+        if not _acquire_lock(conn, cur, wait, poll_interval):
+            return []
+        try:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+
+            # Another process may have migrated while we waited for the lock
+            version = current_version(conn)
+            for number, description, apply in MIGRATIONS:
+                if number <= version:
+                    continue
+                transactional = getattr(apply, 'transactional', True)
+                if not transactional and not concurrent:
+                    if not _tables_empty(cur):
+                        break
+                    transactional = True
+                logger.info('Applying migration', extra={'version': number, 'description': description})
+                try:
+                    if transactional:
+                        apply(cur)
+                    else:
+                        conn.autocommit = True
+                        try:
+                            apply(cur)
+                        finally:
+                            conn.autocommit = False
+                    cur.execute(
+                        'INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                        (number, description)
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied.append(number)
+                logger.info('Applied migration', extra={'version': number})
+        finally:
+            conn.rollback()
+            cur.execute('SELECT pg_advisory_unlock(%s, %s)', (MIGRATION_LOCK_NAMESPACE, MIGRATION_LOCK_KEY))
+            conn.commit()
+    finally:
+        cur.close()
+    return applied
+
+
+def status(conn):
+    """Return [(version, description, applied_at or None)] for every migration"""
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT version, applied_at FROM schema_version')
+        applied = dict(cur.fetchall())
+    except psycopg2.errors.UndefinedTable:
+        applied = {}
+    finally:
+        cur.close()
+    conn.rollback()
+    return [(number, description, applied.get(number)) for number, description, _ in MIGRATIONS]
+
+
+def connect():
+    """Open a standalone connection using the app's database settings"""
+    from config import get_config
+    settings = get_config()
+    if settings.DATABASE_URL:
+        return psycopg2.connect(settings.DATABASE_URL)
+    return psycopg2.connect(
+        host=settings.DB_HOST,
+        database=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASS,
+        port=settings.DB_PORT
+    )
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = connect()
+    try:
+        if '--status' in argv:
+            for number, description, applied_at in status(conn):
+                state = f"applied {applied_at:%Y-%m-%d %H:%M}" if applied_at else "pending"
+                print(f"{number:>4}  {state:<22}  {description}")
+            return 0
+
+        try:
+            applied = migrate(conn)
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            return 1
+        if applied:
+            print(f"✅ Database schema is at version {applied[-1]}")
+        else:
+            print(f"✅ Database schema is up to date (version {LATEST_VERSION})")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,162 @@
+"""
+Live admin notifications for Café Fausse Backend
+One LISTEN connection per worker fans new notifications out to the open
+Server-Sent Events streams
+"""
+import logging
+import os
+import queue
+import select
+import threading
+import time
+
+import notifications
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One open stream's view of the broker"""
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize)
+        self.lagging = False
+
+    def get(self, timeout):
+        """Return the next notification, or None if none arrived within ``timeout``"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, notification):
+        try:
+            self._queue.put_nowait(notification)
+        except queue.Full:
+            # The client can't keep up; its stream ends and it resumes from
+            # the database with Last-Event-ID
+            self.lagging = True
+
+
+class NotificationBroker:
+    """Fans committed notifications out to subscribers in this process.
+
+    A single background thread holds a dedicated connection that LISTENs on
+    notifications.CHANNEL. On each NOTIFY it reads every notification newer
+    than the last one it saw and offers them to all subscribers, so open
+    streams cost a thread and a queue each but no database connection. The
+    thread starts with the first subscriber and reconnects (catching up on
+    anything it missed) if the connection drops.
+
+    At most ``max_streams`` subscriptions are open at once, which keeps a few
+    dashboards from tying up every request thread of a worker.
+    """
+
+    def __init__(self, connect, max_streams=2, queue_size=100, poll_interval=5.0, reconnect_delay=5.0):
+        self.connect = connect
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._ready = threading.Event()
+        self._pid = None
+        self._last_id = None
+        self._stats = {'published': 0, 'rejected': 0, 'lagging': 0, 'reconnects': 0}
+
+    def subscribe(self, ready_timeout=5.0):
+        """Open a subscription, or return None when ``max_streams`` are already open.
+
+        Waits (up to ``ready_timeout``) until the listener is running, so
+        anything committed after this returns is delivered.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_streams:
+                self._stats['rejected'] += 1
+                return None
+            subscription = Subscription(self.queue_size)
+            self._subscribers.add(subscription)
+            if self._pid != os.getpid():
+                # First subscriber in this worker (threads don't survive a fork)
+                self._pid = os.getpid()
+                self._last_id = None
+                self._ready.clear()
+                self._thread = threading.Thread(target=self._run, name='notification-listener', daemon=True)
+                self._thread.start()
+        self._ready.wait(ready_timeout)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if subscription.lagging:
+                self._stats['lagging'] += 1
+
+    def _publish(self, batch):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._stats['published'] += len(batch)
+        for notification in batch:
+            for subscription in subscribers:
+                subscription._offer(notification)
+
+    def _catch_up(self, conn):
+        cur = conn.cursor()
+        try:
+            if self._last_id is None:
+                cur.execute('SELECT COALESCE(MAX(id), 0) FROM admin_notifications')
+                self._last_id = cur.fetchone()[0]
+                return
+            while True:
+                batch = notifications.since(cur, self._last_id, limit=self.queue_size)
+                if not batch:
+                    return
+                self._last_id = batch[-1]['id']
+                self._publish(batch)
+        finally:
+            cur.close()
+
+    def _listen(self):
+        conn = self.connect()
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(f'LISTEN {notifications.CHANNEL}')
+            self._catch_up(conn)
+            self._ready.set()
+            while True:
+                # Wake up now and then even without a NOTIFY, so a dead
+                # connection is noticed and replaced
+                if select.select([conn], [], [], self.poll_interval)[0]:
+                    conn.poll()
+                else:
+                    conn.cursor().execute('SELECT 1')
+                if conn.notifies:
+                    conn.notifies.clear()
+                    self._catch_up(conn)
+        finally:
+            conn.close()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.warning('Notification listener error, reconnecting', exc_info=True,
+                               extra={'retry_in': self.reconnect_delay})
+                with self._lock:
+                    self._stats['reconnects'] += 1
+                time.sleep(self.reconnect_delay)
+
+    def stats(self):
+        """Return open stream count and delivery counters"""
+        with self._lock:
+            return {
+                'streams': len(self._subscribers),
+                'max_streams': self.max_streams,
+                'listening': self._thread is not None and self._thread.is_alive(),
+                'last_id': self._last_id,
+                **self._stats,
+            }
@@ -0,0 +1,91 @@
+"""
+Admin portal notifications for Café Fausse Backend
+Stores the notification feed in Postgres so every worker serves the same
+feed, with ids from a sequence handed out in commit order
+"""
+from psycopg2.extras import Json
+
+# LISTEN/NOTIFY channel carrying the id of each committed notification
+CHANNEL = 'admin_notifications'
+
+# pg_advisory_xact_lock(namespace, key); 1 is time slots, 2 migrations.
+# Every write takes it first, so writers queue up in one order and never
+# deadlock on each other's notification rows. It also means ids are handed
+# out in commit order, so "id > last seen" never skips one. Writes are a few
+# statements in a transaction of their own, never part of a booking's.
+LOCK_NAMESPACE = 3
+_LOCK_SQL = 'SELECT pg_advisory_xact_lock(%s, 0)' % LOCK_NAMESPACE
+
+
+def _as_dict(row):
+    notification_id, payload, read, created_at = row
+    return {**payload, 'id': notification_id, 'timestamp': created_at.isoformat(), 'read': read}
+
+
+def add(cur, payload, keep=100):
+    """Store a notification and prune the feed to the newest ``keep``; returns its id.
+
+    Call it once the change it describes has committed, and commit right
+    after: the lock it takes is held until then.
+    """
+    cur.execute(_LOCK_SQL)
+    cur.execute(
+        'INSERT INTO admin_notifications (payload) VALUES (%s) RETURNING id',
+        (Json(payload),)
+    )
+    notification_id = cur.fetchone()[0]
+    cur.execute('SELECT pg_notify(%s, %s)', (CHANNEL, str(notification_id)))
+    cur.execute('DELETE FROM admin_notifications WHERE id <= %s', (notification_id - keep,))
+    return notification_id
+
+
+def feed(cur, limit=100, unread_only=False):
+    """Return (notifications newest first, unread count)"""
+    if unread_only:
+        cur.execute('''
+            SELECT id, payload, read, created_at FROM admin_notifications
+            WHERE read = FALSE ORDER BY created_at DESC, id DESC LIMIT %s
+        ''', (limit,))
+    else:
+        cur.execute('''
+            SELECT id, payload, read, created_at FROM admin_notifications
+            ORDER BY id DESC LIMIT %s
+        ''', (limit,))
+    notifications = [_as_dict(row) for row in cur.fetchall()]
+    return notifications, unread_count(cur)
+
+
+def unread_count(cur):
+    """Unread notifications (the feed holds at most ``keep`` rows, counted off the (read, created_at) index)"""
+    cur.execute('SELECT COUNT(*) FROM admin_notifications WHERE read = FALSE')
+    return cur.fetchone()[0]
+
+
+def since(cur, after_id, limit=100):
+    """Return notifications with an id above ``after_id``, oldest first"""
+    cur.execute('''
+        SELECT id, payload, read, created_at FROM admin_notifications
+        WHERE id > %s ORDER BY id LIMIT %s
+    ''', (after_id, limit))
+    return [_as_dict(row) for row in cur.fetchall()]
+
+
+def mark_read(cur, notification_id):
+    """Mark one notification as read; returns False if it does not exist"""
+    cur.execute(_LOCK_SQL)
+    cur.execute(
+        'UPDATE admin_notifications SET read = TRUE WHERE id = %s AND read = FALSE',
+        (notification_id,)
+    )
+    if cur.rowcount:
+        return True
+    cur.execute('SELECT 1 FROM admin_notifications WHERE id = %s', (notification_id,))
+    return cur.fetchone() is not None
+
+
+def mark_all_read(cur):
+    """Mark every notification as read; returns how many were unread"""
+    cur.execute(_LOCK_SQL)
+    cur.execute('UPDATE admin_notifications SET read = TRUE WHERE read = FALSE')
+    return cur.rowcount
+
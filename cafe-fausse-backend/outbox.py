@@ -0,0 +1,197 @@
+"""
+Durable email outbox for Café Fausse Backend
+Emails are queued in Postgres in the same transaction as the data they
+describe, then delivered by background worker threads with retries
+"""
+import logging
+import random
+import threading
+
+from psycopg2.extras import Json
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorkerPool:
+    """Background threads that drain the email_outbox table.
+
+    Each worker claims one due message at a time with
+    ``FOR UPDATE SKIP LOCKED``, so any number of threads across any number of
+    gunicorn workers can drain the same table without sending duplicates.
+    A message is held in the ``sending`` state for ``lease_seconds``; if the
+    process dies mid-send the lease expires and another worker picks it up.
+    Failed sends are retried with exponential backoff and jitter, and moved
+    to the ``dead`` state after ``max_attempts``.
+    """
+
+    def __init__(self, workers=2, max_attempts=5, poll_interval=5.0,
+                 backoff_base=30.0, backoff_max=3600.0, lease_seconds=300):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+
+        self._handlers = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def register_handler(self, kind, handler):
+        """Register the callable that delivers messages of ``kind``.
+
+        The handler receives the stored payload dict and must raise on
+        failure; its return value is ignored.
+        """
+        self._handlers[kind] = handler
+
+    def enqueue(self, cur, kind, payload):
+        """Queue a message using the caller's cursor (and transaction)"""
+        cur.execute(
+            "INSERT INTO email_outbox (kind, payload, max_attempts) VALUES (%s, %s, %s) RETURNING id;",
+            (kind, Json(payload), self.max_attempts)
+        )
+        return cur.fetchone()[0]
+
+    def notify(self):
+        """Wake idle workers after a transaction with queued mail commits"""
+        self._wakeup.set()
+
+    def start(self):
+        """Start the worker threads for this process"""
+        if self._threads or self.workers <= 0:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                name=f"email-outbox-{i + 1}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info('Email outbox started', extra={'workers': self.workers})
+
+    def stop(self, timeout=5.0):
+        """Signal the workers to exit and wait for them"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def backoff(self, attempts):
+        """Seconds to wait before retry number ``attempts``"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                processed = self.process_one()
+            except Exception:
+                logger.exception('Email outbox worker error')
+                processed = False
+
+            if not processed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self):
+        """Claim the next due message, committing the lease immediately"""
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    UPDATE email_outbox
+                    SET status = 'sending',
+                        attempts = attempts + 1,
+                        locked_until = NOW() + make_interval(secs => %s)
+                    WHERE id = (
+                        SELECT id FROM email_outbox
+                        WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                           OR (status = 'sending' AND locked_until < NOW())
+                        ORDER BY next_attempt_at
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, kind, payload, attempts, max_attempts;
+                ''', (self.lease_seconds,))
+                row = cur.fetchone()
+            conn.commit()
+            return row
+        finally:
+            pool.putconn(conn)
+
+    def _finish(self, message_id, error=None, attempts=0, max_attempts=0):
+        """Record the outcome of a delivery attempt"""
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                if error is None:
+                    cur.execute('''
+                        UPDATE email_outbox
+                        SET status = 'sent', sent_at = NOW(), locked_until = NULL, last_error = NULL
+                        WHERE id = %s;
+                    ''', (message_id,))
+                elif attempts >= max_attempts:
+                    cur.execute('''
+                        UPDATE email_outbox
+                        SET status = 'dead', locked_until = NULL, last_error = %s
+                        WHERE id = %s;
+                    ''', (error, message_id))
+                else:
+                    cur.execute('''
+                        UPDATE email_outbox
+                        SET status = 'pending',
+                            locked_until = NULL,
+                            last_error = %s,
+                            next_attempt_at = NOW() + make_interval(secs => %s)
+                        WHERE id = %s;
+                    ''', (error, self.backoff(attempts), message_id))
+            conn.commit()
+        finally:
+            pool.putconn(conn)
+
+    def process_one(self):
+        """Deliver a single due message. Returns False when the queue is idle."""
+        row = self._claim()
+        if row is None:
+            return False
+
+        message_id, kind, payload, attempts, max_attempts = row
+        handler = self._handlers.get(kind)
+
+        # The database connection is back in the pool while SMTP runs
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for '{kind}'")
+            handler(payload)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            self._finish(message_id, error, attempts, max_attempts)
+            if attempts >= max_attempts:
+                logger.error('Email dead-lettered', extra={'message_id': message_id, 'kind': kind, 'attempts': attempts, 'error': error})
+            else:
+                logger.warning('Email attempt failed, will retry', extra={'message_id': message_id, 'kind': kind, 'attempts': attempts, 'error': error})
+            return True
+
+        self._finish(message_id)
+        logger.info('Email sent', extra={'message_id': message_id, 'kind': kind})
+        return True
+
+    def stats(self):
+        """Return message counts by status"""
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status;")
+                return {status: count for status, count in cur.fetchall()}
+        finally:
+            pool.putconn(conn)
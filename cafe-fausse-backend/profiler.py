@@ -0,0 +1,169 @@
+"""
+Request profiling for Café Fausse Backend
+Runs a single request under cProfile when an admin asks for it and keeps
+the result as a .pstats file for download
+
+A request is profiled when it carries ``X-Profile: 1`` (or ``?profile=1``)
+and a valid admin token; everyone else's flag is ignored. The response
+gets an ``X-Profile-Id`` header naming the capture. Only ``max_concurrent``
+requests per worker are profiled at once; further flagged requests are
+served normally with ``X-Profile-Status: busy``.
+
+The profiler covers the request hooks and the view, not the body of a
+streamed response (CSV exports, notification streams).
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import secrets
+import threading
+import time
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID = re.compile(r'^\d{8}T\d{6}-\d+-[0-9a-f]{8}$')
+
+
+class RequestProfiler:
+    """Captures profiles into ``directory``, keeping the newest ``keep``"""
+
+    def __init__(self, directory, max_concurrent=1, keep=50):
+        self.directory = directory
+        self.max_concurrent = max_concurrent
+        self.keep = keep
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._stats = {'captured': 0, 'busy': 0}
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def start(self):
+        """Begin profiling this thread; returns the capture, or None if every slot is taken"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['busy'] += 1
+            return None
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{secrets.token_hex(4)}"
+        profile = cProfile.Profile()
+        profile.enable()
+        return {'id': profile_id, 'profile': profile, 'started': time.perf_counter()}
+
+    def finish(self, capture, details):
+        """Stop profiling and write ``<id>.pstats`` plus an ``<id>.json`` summary"""
+        capture['profile'].disable()
+        elapsed = time.perf_counter() - capture['started']
+        self._slots.release()
+
+        profile_id = capture['id']
+        os.makedirs(self.directory, exist_ok=True)
+        capture['profile'].dump_stats(self._path(profile_id, '.pstats'))
+        summary = {'id': profile_id, 'pid': os.getpid(), 'created': time.time(),
+                   'ms': round(elapsed * 1000, 2), **details}
+        with open(self._path(profile_id, '.json'), 'w') as f:
+            json.dump(summary, f)
+        with self._lock:
+            self._stats['captured'] += 1
+        self._prune()
+        return summary
+
+    def abandon(self, capture):
+        """Stop a capture without saving it (the request failed before a response)"""
+        capture['profile'].disable()
+        self._slots.release()
+
+    def _prune(self):
+        """Delete the oldest captures beyond ``keep`` (all workers share the directory)"""
+        captures = self.list()
+        for summary in captures[self.keep:]:
+            for suffix in ('.pstats', '.json'):
+                try:
+                    os.remove(self._path(summary['id'], suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Summaries of the stored captures, newest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        captures = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    captures.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        captures.sort(key=lambda summary: summary['created'], reverse=True)
+        return captures
+
+    def pstats_path(self, profile_id):
+        """Path of a stored capture's .pstats file, or None for an unknown or malformed id"""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = self._path(profile_id, '.pstats')
+        return path if os.path.exists(path) else None
+
+    def report(self, profile_id, sort='cumulative', limit=40):
+        """A stored capture as pstats text, or None if it doesn't exist"""
+        path = self.pstats_path(profile_id)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def init_app(self, app, is_admin):
+        """Profile flagged requests whose caller ``is_admin()``"""
+        profiler = self
+
+        @app.before_request
+        def start_profile():
+            flagged = request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+            if not flagged or request.method == 'OPTIONS' or not is_admin():
+                return
+            capture = profiler.start()
+            if capture is None:
+                g.profile_busy = True
+            else:
+                g.profile_capture = capture
+
+        @app.after_request
+        def save_profile(response):
+            capture = g.pop('profile_capture', None)
+            if capture is not None:
+                try:
+                    summary = profiler.finish(capture, {
+                        'method': request.method,
+                        'route': request.url_rule.rule if request.url_rule else request.path,
+                        'status': response.status_code,
+                    })
+                except OSError:
+                    logger.exception('Failed to save request profile')
+                    response.headers['X-Profile-Status'] = 'failed'
+                else:
+                    response.headers['X-Profile-Id'] = summary['id']
+            elif g.pop('profile_busy', False):
+                response.headers['X-Profile-Status'] = 'busy'
+            return response
+
+        @app.teardown_request
+        def release_profile(error=None):
+            capture = g.pop('profile_capture', None)
+            if capture is not None:
+                profiler.abandon(capture)
+
+    def stats(self):
+        with self._lock:
+            return {'directory': self.directory, 'max_concurrent': self.max_concurrent,
+                    'keep': self.keep, **self._stats}
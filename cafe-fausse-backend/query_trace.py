@@ -0,0 +1,218 @@
+"""
+Query tracing for Café Fausse Backend
+Records every statement a request runs, reports the total in a
+Server-Timing header and logs slow statements (optionally with EXPLAIN)
+"""
+import contextvars
+import logging
+import re
+import threading
+import time
+
+from flask import request
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_QUOTED_IDENTIFIER = re.compile(r'"(?:[^"]|"")*"')
+_CALL = re.compile(r'\b(\w+)\s*\(')
+_LOCKING = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b|\bSKIP\s+LOCKED\b|\bNOWAIT\b', re.I)
+
+# Words that may precede "(" in a SELECT that is safe to run twice: SQL
+# keywords, and built-in functions without side effects. Any other call
+# (pg_advisory_lock, pg_notify, nextval, a user function...) could act
+# again when EXPLAIN ANALYZE re-runs the statement, so it isn't explained.
+_SAFE_CALLS = {
+    'select', 'from', 'where', 'and', 'or', 'not', 'in', 'exists', 'any', 'all', 'as', 'on', 'join',
+    'using', 'over', 'partition', 'filter', 'within', 'values', 'lateral', 'then', 'else', 'when',
+    'case', 'is', 'between', 'like', 'ilike', 'union', 'distinct', 'by', 'having', 'limit', 'offset',
+    'count', 'sum', 'min', 'max', 'avg', 'coalesce', 'nullif', 'greatest', 'least', 'cast',
+    'extract', 'date_trunc', 'date_part', 'lower', 'upper', 'length', 'trim', 'round', 'abs',
+    'array_agg', 'string_agg', 'bool_or', 'bool_and', 'json_build_object', 'jsonb_build_object',
+    'json_agg', 'jsonb_agg', 'row_number', 'rank', 'generate_series', 'unnest', 'to_char',
+    'numeric', 'interval', 'timestamp', 'date', 'lpad', 'concat',
+}
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def normalize_sql(query, max_length=500):
+    """Collapse whitespace and replace inline literals with ?, so similar statements group together"""
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    elif not isinstance(query, str):
+        query = str(query)
+    query = ' '.join(query.split())
+    query = _NUMBER_LITERAL.sub('?', _STRING_LITERAL.sub('?', query))
+    return query if len(query) <= max_length else query[:max_length] + '...'
+
+
+def params_shape(vars):
+    """Describe bound parameters without their values: a count, or the sorted names"""
+    if vars is None:
+        return None
+    if isinstance(vars, dict):
+        return sorted(vars)
+    try:
+        return len(vars)
+    except TypeError:
+        return type(vars).__name__
+
+
+class Trace:
+    """Statements run while handling one request"""
+    __slots__ = ('started', 'queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []        # (query, vars, seconds, rowcount), normalized on demand
+
+    @property
+    def db_seconds(self):
+        return sum(query[2] for query in self.queries)
+
+    def server_timing(self):
+        """Server-Timing header value: time in the database and in the whole request"""
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return (f'db;dur={self.db_seconds * 1000:.2f};desc="{len(self.queries)} queries", '
+                f'app;dur={total_ms:.2f}')
+
+    def summary(self):
+        """The trace as JSON-friendly dicts, slowest first"""
+        return [
+            {'sql': normalize_sql(query), 'params': params_shape(vars),
+             'ms': round(seconds * 1000, 2), 'rows': rowcount}
+            for query, vars, seconds, rowcount in sorted(self.queries, key=lambda q: -q[2])
+        ]
+
+
+class QueryTracer:
+    """Cursor observer (see db.timed_cursor_factory) plus request hooks.
+
+    Statements run inside a traced request are added to its Trace; any
+    statement over ``slow_ms`` is logged (fields as extras), wherever it ran,
+    and so is the whole trace of a request whose statements took that long
+    together.
+
+    Above ``explain_ms`` (0 disables) single SELECT statements are run again
+    under EXPLAIN (ANALYZE, BUFFERS), and the plan is logged with the entry.
+    The re-run is always rolled back, and statements that lock rows or call
+    functions that may have side effects are never re-run. It still repeats
+    the query's work, so leave it off unless investigating.
+    """
+
+    def __init__(self, slow_ms=250, explain_ms=0):
+        self.slow_ms = slow_ms
+        self.explain_ms = explain_ms
+
+        self._current = contextvars.ContextVar('query_trace', default=None)
+        self._explaining = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'slow_queries': 0, 'slow_requests': 0, 'explained': 0}
+
+    def observe(self, cursor, query, vars, seconds):
+        if getattr(self._explaining, 'active', False):
+            return
+        trace = self._current.get()
+        if trace is not None:
+            trace.queries.append((query, vars, seconds, cursor.rowcount))
+        if seconds * 1000 >= self.slow_ms:
+            self._log_slow(cursor, query, vars, seconds)
+
+    def _log_slow(self, cursor, query, vars, seconds):
+        entry = {
+            'ms': round(seconds * 1000, 2),
+            'rows': cursor.rowcount,
+            'sql': normalize_sql(query),
+            'params': params_shape(vars),
+        }
+        if self.explain_ms and seconds * 1000 >= self.explain_ms:
+            plan = self._explain(cursor, query, vars)
+            if plan:
+                entry['plan'] = plan
+        with self._lock:
+            self._stats['slow_queries'] += 1
+            self._stats['explained'] += 'plan' in entry
+        logger.warning('Slow query', extra=entry)
+
+    def _log_slow_request(self, trace):
+        entry = {
+            'route': request.url_rule.rule if request.url_rule else request.path,
+            'db_ms': round(trace.db_seconds * 1000, 2),
+            'queries': trace.summary(),
+        }
+        with self._lock:
+            self._stats['slow_requests'] += 1
+        logger.warning('Slow request', extra=entry)
+
+    @staticmethod
+    def explainable(statement):
+        """True for a SELECT without locking clauses or calls outside _SAFE_CALLS"""
+        code = _QUOTED_IDENTIFIER.sub('""', _STRING_LITERAL.sub("''", statement))
+        if _LOCKING.search(code):
+            return False
+        return all(name.lower() in _SAFE_CALLS for name in _CALL.findall(code))
+
+    def _explain(self, cursor, query, vars):
+        """EXPLAIN ANALYZE a plain SELECT, then roll its effects back; returns the plan lines or None"""
+        if cursor.name or not isinstance(query, str):
+            return None
+        statement = query.strip().rstrip(';')
+        if not statement[:6].upper() == 'SELECT' or ';' in statement or not self.explainable(statement):
+            return None
+        conn = cursor.connection
+        if conn.closed or conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR:
+            return None
+
+        self._explaining.active = True
+        explain = extensions.cursor(conn)
+        # Inside the caller's transaction a savepoint scopes the re-run; in
+        # autocommit mode a transaction of its own does. Either way it is
+        # rolled back, so nothing the statement did survives the EXPLAIN.
+        if conn.autocommit:
+            begin, undo, end = 'BEGIN', 'ROLLBACK', None
+        else:
+            begin = 'SAVEPOINT query_trace_explain'
+            undo = 'ROLLBACK TO SAVEPOINT query_trace_explain'
+            end = 'RELEASE SAVEPOINT query_trace_explain'
+        try:
+            explain.execute(begin)
+            try:
+                explain.execute('EXPLAIN (ANALYZE, BUFFERS) ' + statement, vars)
+                return [row[0] for row in explain.fetchall()]
+            except Exception as e:
+                return [f'EXPLAIN failed: {e}']
+            finally:
+                explain.execute(undo)
+                if end:
+                    explain.execute(end)
+        except Exception:
+            return None
+        finally:
+            explain.close()
+            self._explaining.active = False
+
+    def init_app(self, app):
+        """Trace each request and add its Server-Timing header"""
+        tracer = self
+
+        @app.before_request
+        def start_trace():
+            tracer._current.set(Trace())
+
+        @app.after_request
+        def add_server_timing(response):
+            trace = tracer._current.get()
+            if trace is not None:
+                response.headers.add('Server-Timing', trace.server_timing())
+                if len(trace.queries) > 1 and trace.db_seconds * 1000 >= tracer.slow_ms:
+                    tracer._log_slow_request(trace)
+            return response
+
+        @app.teardown_request
+        def end_trace(error=None):
+            tracer._current.set(None)
+
+    def stats(self):
+        with self._lock:
+            return {'slow_ms': self.slow_ms, 'explain_ms': self.explain_ms, **self._stats}
@@ -0,0 +1,151 @@
+"""
+Request rate limiting for Café Fausse Backend
+Token buckets per (client, route), kept in process memory or in Redis so
+every gunicorn worker draws from the same bucket
+"""
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Buckets in this process's memory (development, or a single worker).
+
+    Each gunicorn worker has its own buckets, so a client can get up to
+    ``workers`` times the configured rate. Idle buckets are dropped once
+    ``max_keys`` is reached.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}       # key -> [tokens, updated_at]
+
+    def take(self, key, rate, capacity):
+        """Take one token; returns (allowed, tokens left, seconds until one is available)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now, rate, capacity)
+                bucket = self._buckets[key] = [capacity, now]
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return True, bucket[0], 0.0
+            bucket[0] = tokens
+            return False, tokens, (1 - tokens) / rate
+
+    def _prune(self, now, rate, capacity):
+        """Drop buckets that have refilled completely (lock held); they would start full anyway"""
+        refill_seconds = capacity / rate
+        idle = [key for key, (_, updated_at) in self._buckets.items() if now - updated_at >= refill_seconds]
+        for key in idle:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            # Still full of active clients: forget the least recently seen half
+            by_age = sorted(self._buckets, key=lambda key: self._buckets[key][1])
+            for key in by_age[:len(by_age) // 2]:
+                del self._buckets[key]
+
+
+# Refill and take atomically inside Redis, using the Redis clock so every
+# worker and host agrees on elapsed time. Floats are returned as strings
+# because Redis truncates Lua numbers to integers.
+_REDIS_TAKE_SCRIPT = '''
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens), tostring(wait)}
+'''
+
+
+class RedisBackend:
+    """Buckets in Redis, shared by every worker and host (needs the redis package)"""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL is set but the redis package is not installed") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._take = self._client.register_script(_REDIS_TAKE_SCRIPT)
+
+    def take(self, key, rate, capacity):
+        allowed, tokens, wait = self._take(keys=[self.prefix + key], args=[rate, capacity])
+        return bool(allowed), float(tokens), float(wait)
+
+
+def create_backend(storage_url):
+    """Redis when a redis:// URL is configured, otherwise in-process buckets"""
+    if storage_url:
+        return RedisBackend(storage_url)
+    return MemoryBackend()
+
+
+class RateLimiter:
+    """Token bucket per (client, route): ``per_minute`` sustained, ``burst`` at once.
+
+    If the backend fails (e.g. Redis is unreachable) the request is allowed,
+    so an outage of the limiter's store never takes bookings down with it.
+    """
+
+    def __init__(self, backend, per_minute=60, burst=10):
+        self.backend = backend
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.per_minute = per_minute
+
+        self._lock = threading.Lock()
+        self._stats = {'allowed': 0, 'limited': 0, 'backend_errors': 0}
+        self._seconds = 0.0
+
+    def check(self, client, route):
+        """Return (allowed, Retry-After seconds) for one request"""
+        started = time.perf_counter()
+        try:
+            allowed, _, wait = self.backend.take(f'{route}:{client}', self.rate, self.capacity)
+        except Exception:
+            logger.warning('Rate limiter backend error, allowing request', exc_info=True)
+            allowed, wait, error = True, 0.0, True
+        else:
+            error = False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['allowed' if allowed else 'limited'] += 1
+            self._stats['backend_errors'] += error
+            self._seconds += elapsed
+        return allowed, max(1, math.ceil(wait))
+
+    def stats(self):
+        """Return decision counters and the average time spent per check"""
+        with self._lock:
+            checks = self._stats['allowed'] + self._stats['limited']
+            return {
+                'backend': type(self.backend).__name__,
+                'per_minute': self.per_minute,
+                'burst': self.capacity,
+                **self._stats,
+                'avg_check_us': round(self._seconds / checks * 1e6, 1) if checks else None,
+            }
@@ -0,0 +1,100 @@
+"""
+Dining report cache for Café Fausse Backend
+Keeps computed reports per date range for a short TTL and drops them as
+soon as a booking inside their range changes
+"""
+import threading
+import time
+
+from singleflight import SingleFlight
+
+
+class ReportCache:
+    """TTL cache of report results keyed by their (start_day, end_day) range.
+
+    ``get_or_compute`` serves a fresh entry or computes it, with concurrent
+    misses for the same key sharing one computation. ``invalidate(day)``
+    drops every entry whose range contains ``day`` (and the unbounded
+    all-time entries). A computation that overlaps an invalidation is
+    returned but not stored, so a write can never be masked by a result
+    that was read just before it.
+
+    Each gunicorn worker has its own cache: a write handled by another
+    worker becomes visible here when the entry's TTL runs out.
+    """
+
+    def __init__(self, ttl=60.0, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = {}       # key -> (expires_at, start_day, end_day, value)
+        self._generation = 0
+        self._flight = SingleFlight()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'uncached_results': 0}
+
+    def get_or_compute(self, key, start_day, end_day, compute):
+        """Return the cached value for ``key`` or ``compute()`` it.
+
+        ``start_day``/``end_day`` (inclusive, None for unbounded) are the days
+        whose bookings the value depends on.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._stats['hits'] += 1
+                return entry[3]
+            self._stats['misses'] += 1
+
+        return self._flight.do(key, lambda: self._compute(key, start_day, end_day, compute))
+
+    def _compute(self, key, start_day, end_day, compute):
+        with self._lock:
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            if self._generation != generation:
+                self._stats['uncached_results'] += 1
+                return value
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                self._evict(time.monotonic())
+            self._entries[key] = (time.monotonic() + self.ttl, start_day, end_day, value)
+        return value
+
+    def _evict(self, now):
+        """Drop expired entries, or the one closest to expiry if none are (lock held)"""
+        expired = [key for key, entry in self._entries.items() if entry[0] <= now]
+        for key in expired:
+            del self._entries[key]
+        if not expired and self._entries:
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+
+    def invalidate(self, day):
+        """Forget every report whose range includes ``day``"""
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, (_, start_day, end_day, _) in self._entries.items()
+                if (start_day is None or start_day <= day) and (end_day is None or day <= end_day)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters, plus how many misses shared a computation"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else None,
+                **self._stats,
+                'computations': self._flight.stats(),
+            }
@@ -0,0 +1,123 @@
+"""
+Daily revenue rollup for Café Fausse Backend
+Keeps per-day, per-table booking totals in daily_rollup so reports read
+a few rows per day instead of scanning every reservation
+
+Request handlers update the rollup in the same transaction as the booking
+change. To rebuild it from reservations (after a restore, or if bookings
+were written by code that predates the rollup):
+
+    python rollup.py backfill [--start 2025-01-01] [--end 2025-12-31]
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+# Aggregates for the reservations in one (day, table_number) cell or range
+_CELL_AGGREGATES = '''
+    COUNT(*),
+    COUNT(*) FILTER (WHERE status = 'fulfilled'),
+    COUNT(*) FILTER (WHERE status = 'cancelled'),
+    COUNT(*) FILTER (WHERE status = 'pending'),
+    COALESCE(SUM(revenue) FILTER (WHERE status = 'fulfilled'), 0),
+    COALESCE(MAX(revenue) FILTER (WHERE status = 'fulfilled'), 0),
+    COALESCE(SUM(guests), 0)
+'''
+
+_COLUMNS = 'reservations, fulfilled, cancelled, pending, revenue, max_revenue, guests'
+
+
+def record_booking(cur, time_slot, table_number, guests):
+    """Count a newly created (pending) reservation"""
+    cur.execute(f'''
+        INSERT INTO daily_rollup (day, table_number, {_COLUMNS})
+        VALUES (%s, %s, 1, 0, 0, 1, 0, 0, %s)
+        ON CONFLICT (day, table_number) DO UPDATE SET
+            reservations = daily_rollup.reservations + 1,
+            pending = daily_rollup.pending + 1,
+            guests = daily_rollup.guests + EXCLUDED.guests
+    ''', (time_slot.date(), table_number, guests))
+
+
+def refresh_cell(cur, time_slot, table_number):
+    """Recompute the cell holding ``time_slot`` after a reservation changed or was deleted.
+
+    The first statement locks the cell row, so the recount cannot miss a
+    concurrent record_booking() that committed while we waited. A cell holds
+    at most one reservation per time slot, so the recount is a short range
+    scan of the (time_slot, table_number) index.
+    """
+    day = time_slot.date()
+    params = {'day': day, 'next_day': day + timedelta(days=1), 'table_number': table_number}
+    cur.execute('''
+        INSERT INTO daily_rollup (day, table_number) VALUES (%(day)s, %(table_number)s)
+        ON CONFLICT (day, table_number) DO UPDATE SET day = EXCLUDED.day
+    ''', params)
+    cur.execute(f'''
+        UPDATE daily_rollup SET ({_COLUMNS}) = (
+            SELECT {_CELL_AGGREGATES}
+            FROM reservations
+            WHERE time_slot >= %(day)s AND time_slot < %(next_day)s
+              AND table_number = %(table_number)s
+        )
+        WHERE day = %(day)s AND table_number = %(table_number)s
+    ''', params)
+
+
+def backfill(cur, start=None, end=None):
+    """Rebuild the rollup from reservations for [start, end] (inclusive dates; None = unbounded).
+
+    Runs in the caller's transaction. The rollup is locked against writes
+    for the duration, so bookings made meanwhile wait and then apply their
+    change on top of the rebuilt totals. Returns the number of cells written.
+    """
+    day_conditions = ['TRUE']
+    slot_conditions = ['TRUE']
+    params = {'start': start, 'end': end + timedelta(days=1) if end else None}
+    if start:
+        day_conditions.append('day >= %(start)s')
+        slot_conditions.append('time_slot >= %(start)s')
+    if end:
+        day_conditions.append('day < %(end)s')
+        slot_conditions.append('time_slot < %(end)s')
+    day_filter = ' AND '.join(day_conditions)
+    slot_filter = ' AND '.join(slot_conditions)
+
+    cur.execute('LOCK TABLE daily_rollup IN EXCLUSIVE MODE')
+    cur.execute(f'DELETE FROM daily_rollup WHERE {day_filter}', params)
+    cur.execute(f'''
+        INSERT INTO daily_rollup (day, table_number, {_COLUMNS})
+        SELECT time_slot::date, table_number, {_CELL_AGGREGATES}
+        FROM reservations
+        WHERE {slot_filter}
+        GROUP BY time_slot::date, table_number
+    ''', params)
+    return cur.rowcount
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='rollup.py', description='Maintain the daily_rollup table')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rebuild = commands.add_parser('backfill', help='Rebuild the rollup from reservations')
+    rebuild.add_argument('--start', type=date.fromisoformat, help='First day (YYYY-MM-DD)')
+    rebuild.add_argument('--end', type=date.fromisoformat, help='Last day (YYYY-MM-DD)')
+    args = parser.parse_args(argv)
+
+    from migrations import connect
+    conn = connect()
+    try:
+        cur = conn.cursor()
+        cells = backfill(cur, args.start, args.end)
+        conn.commit()
+        print(f"✅ Rebuilt {cells} daily rollup cells")
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Backfill failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,62 @@
+"""
+Request coalescing for Café Fausse Backend
+Concurrent identical calls share one execution instead of each hitting Postgres
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait and receive the same result (or exception).
+    Nothing is cached: once the call finishes, the next caller runs it
+    again. Results are shared between threads, so treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executions': 0, 'shared': 0}
+
+    def do(self, key, fn):
+        """Return fn(), sharing the execution with concurrent callers of ``key``"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executions'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Return execution and shared-result counters"""
+        with self._lock:
+            return {'in_flight': len(self._calls), **self._stats}
@@ -0,0 +1,123 @@
+"""
+In-memory table occupancy index for Café Fausse Backend
+Tracks which tables are booked in each time slot as a bitmap
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+
+def normalize_slot(value):
+    """Parse a client time slot the way Postgres stores it.
+
+    reservations.time_slot is TIMESTAMP WITHOUT TIME ZONE, and Postgres
+    silently drops any zone suffix on input, so the index does the same.
+    Returns None for values that cannot be parsed.
+    """
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+class SlotOccupancyIndex:
+    """Per-slot bitmap of booked tables, shared by all threads in a worker.
+
+    Bit ``n - 1`` of a slot's mask is set when table ``n`` is booked. Slots
+    are loaded lazily through a caller-supplied loader (so the caller's own
+    connection is reused) and reloaded after ``ttl`` seconds, which bounds
+    how long bookings made by other gunicorn workers stay invisible here.
+    The index only steers table choice; the database stays the authority
+    on whether an insert succeeds.
+
+    Locking is striped by slot, so threads booking different slots never
+    contend with each other.
+    """
+
+    def __init__(self, total_tables, ttl=30.0, max_slots=4096, lock_stripes=64):
+        self.total_tables = total_tables
+        self.full_mask = (1 << total_tables) - 1
+        self.ttl = ttl
+        self.max_slots = max_slots
+
+        self._entries = {}       # time_slot -> [mask, loaded_at]
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._stats = {'hits': 0, 'loads': 0}   # approximate; updated without a lock
+
+    def _lock_for(self, slot):
+        return self._locks[hash(slot) % len(self._locks)]
+
+    def _entry(self, slot, loader):
+        """Return the slot's entry, loading it if missing or expired (lock held)"""
+        entry = self._entries.get(slot)
+        now = time.monotonic()
+        if entry is not None and now - entry[1] < self.ttl:
+            self._stats['hits'] += 1
+            return entry
+
+        mask = 0
+        for table_number in loader(slot):
+            if 1 <= table_number <= self.total_tables:
+                mask |= 1 << (table_number - 1)
+        entry = [mask, now]
+        if len(self._entries) >= self.max_slots:
+            self._evict_expired(now)
+        self._entries[slot] = entry
+        self._stats['loads'] += 1
+        return entry
+
+    def _evict_expired(self, now):
+        """Drop expired slots once the cache grows past max_slots"""
+        for slot, entry in list(self._entries.items()):
+            if now - entry[1] >= self.ttl:
+                self._entries.pop(slot, None)
+
+    def free_count(self, slot, loader):
+        """Number of unbooked tables in ``slot``"""
+        with self._lock_for(slot):
+            mask = self._entry(slot, loader)[0]
+        return self.total_tables - bin(mask).count('1')
+
+    def claim(self, slot, loader):
+        """Pick a free table uniformly at random and mark it booked. Returns None when full.
+
+        Draws k below the number of free tables and takes the k-th set bit
+        of the free-table mask, clearing lower set bits one at a time.
+        """
+        with self._lock_for(slot):
+            entry = self._entry(slot, loader)
+            free = self.full_mask & ~entry[0]
+            if not free:
+                return None
+
+            for _ in range(random.randrange(free.bit_count())):
+                free &= free - 1
+            bit = (free & -free).bit_length() - 1
+            entry[0] |= 1 << bit
+            return bit + 1
+
+    def reserve(self, slot, table_number):
+        """Mark a table booked (no-op if the slot isn't cached)"""
+        with self._lock_for(slot):
+            entry = self._entries.get(slot)
+            if entry is not None and 1 <= table_number <= self.total_tables:
+                entry[0] |= 1 << (table_number - 1)
+
+    def release(self, slot, table_number):
+        """Mark a table free again (no-op if the slot isn't cached)"""
+        with self._lock_for(slot):
+            entry = self._entries.get(slot)
+            if entry is not None and 1 <= table_number <= self.total_tables:
+                entry[0] &= ~(1 << (table_number - 1))
+
+    def invalidate(self, slot):
+        """Forget a slot so the next lookup reloads it from the database"""
+        with self._lock_for(slot):
+            self._entries.pop(slot, None)
+
+    def stats(self):
+        """Return cache counters"""
+        return {'slots_cached': len(self._entries), **self._stats}
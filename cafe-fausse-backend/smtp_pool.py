@@ -0,0 +1,141 @@
+"""
+SMTP session pooling for Café Fausse Backend
+Keeps authenticated SMTP connections open and reuses them across messages
+"""
+import smtplib
+import threading
+import time
+
+
+class SMTPSessionPool:
+    """Bounded pool of logged-in SMTP sessions.
+
+    At most ``max_sessions`` connections exist at once; callers beyond that
+    wait up to ``timeout`` seconds for a free session. Sessions idle for
+    longer than ``idle_timeout`` are closed rather than reused, since most
+    providers drop quiet connections after a minute or two. A session that
+    turns out to be disconnected is replaced and the send retried once.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 max_sessions=2, idle_timeout=60.0, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._lock = threading.Lock()
+        self._idle = []          # list of (smtp, last_used) pairs, LIFO
+
+        self._stats = {
+            'sessions_opened': 0,
+            'sessions_closed': 0,
+            'messages_sent': 0,
+            'reconnects': 0,
+        }
+
+    def _open(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        with self._lock:
+            self._stats['sessions_opened'] += 1
+        return server
+
+    def _close(self, server):
+        with self._lock:
+            self._stats['sessions_closed'] += 1
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        """Take a fresh-enough idle session, or open a new one"""
+        now = time.monotonic()
+        stale = []
+        server = None
+        with self._lock:
+            while self._idle:
+                candidate, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    server = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            self._close(candidate)
+        return server or self._open()
+
+    def _checkin(self, server):
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    def send_message(self, msg):
+        """Send an email.message.Message over a pooled session"""
+        self._send(lambda server: server.send_message(msg))
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        """Send an already-serialized message over a pooled session"""
+        self._send(lambda server: server.sendmail(from_addr, to_addrs, msg))
+
+    def _send(self, deliver):
+        """Run ``deliver(server)`` on a pooled session, reconnecting once if needed"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No SMTP session available within {self.timeout}s")
+        try:
+            server = self._checkout()
+            try:
+                deliver(server)
+            except smtplib.SMTPServerDisconnected:
+                self._close(server)
+                with self._lock:
+                    self._stats['reconnects'] += 1
+                server = self._open()
+                try:
+                    deliver(server)
+                except Exception:
+                    self._close(server)
+                    raise
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                # The session itself is still good; only this message failed
+                self._checkin(server)
+                raise
+            except Exception:
+                self._close(server)
+                raise
+
+            self._checkin(server)
+            with self._lock:
+                self._stats['messages_sent'] += 1
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        """Close every idle session"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+    def stats(self):
+        """Return a snapshot of pool usage counters"""
+        with self._lock:
+            return {
+                'max_sessions': self.max_sessions,
+                'idle': len(self._idle),
+                **self._stats,
+            }
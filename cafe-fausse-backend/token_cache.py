@@ -0,0 +1,90 @@
+"""
+Verified admin token cache for Café Fausse Backend
+Remembers which bearer tokens already passed verification so repeat
+requests skip the JWT decode and revocation lookup
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def token_digest(token):
+    """Key for a token in the cache and in revoked_tokens (never store the token itself)"""
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """Bounded LRU of verified tokens, keyed by their SHA-256 digest.
+
+    ``decode(token)`` must return ``(username, exp)`` for a valid token (exp
+    as a Unix timestamp) or None; ``is_revoked(digest)`` checks the shared
+    revocation list. A cached entry is trusted until the token's own exp, but
+    never for longer than ``revalidate_after`` seconds: that bounds how long
+    a token revoked through another worker stays usable here. ``revoke``
+    evicts immediately in this worker. Invalid tokens are never cached, and
+    if ``is_revoked`` raises, ``verify`` raises too and caches nothing.
+    """
+
+    def __init__(self, decode, is_revoked, max_entries=1024, revalidate_after=60.0):
+        self.decode = decode
+        self.is_revoked = is_revoked
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # digest -> (username, trusted_until)
+        self._stats = {'hits': 0, 'misses': 0, 'rejected': 0, 'evictions': 0, 'revocations': 0}
+        self._seconds = {'hits': 0.0, 'misses': 0.0}
+
+    def verify(self, token):
+        """Return the token's username, or None if it is invalid, expired or revoked"""
+        started = time.perf_counter()
+        digest = token_digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(digest)
+                    self._stats['hits'] += 1
+                    self._seconds['hits'] += time.perf_counter() - started
+                    return entry[0]
+                del self._entries[digest]
+
+        username = None
+        verified = self.decode(token)
+        if verified is not None and not self.is_revoked(digest):
+            username, exp = verified
+            with self._lock:
+                self._entries[digest] = (username, min(exp, now + self.revalidate_after))
+                self._entries.move_to_end(digest)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+
+        with self._lock:
+            self._stats['misses'] += 1
+            if username is None:
+                self._stats['rejected'] += 1
+            self._seconds['misses'] += time.perf_counter() - started
+        return username
+
+    def revoke(self, token):
+        """Forget a token in this worker (the caller records it as revoked)"""
+        with self._lock:
+            self._entries.pop(token_digest(token), None)
+            self._stats['revocations'] += 1
+
+    def stats(self):
+        """Return hit/miss counters and average verify latency in microseconds"""
+        with self._lock:
+            hits, misses = self._stats['hits'], self._stats['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+                **self._stats,
+                'avg_hit_us': round(self._seconds['hits'] / hits * 1e6, 1) if hits else None,
+                'avg_miss_us': round(self._seconds['misses'] / misses * 1e6, 1) if misses else None,
+            }